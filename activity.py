@@ -0,0 +1,129 @@
+from xml.parsers import expat
+
+# the Order children we read, everything else in the message is skipped
+ORDER_FIELDS = ("OrderKey", "OrderType", "OpenClose", "OrderInstructions")
+
+
+class ActivityDecodeError(ValueError):
+    """Raised when an ACCT_ACTIVITY payload is not XML or lacks an order field."""
+
+
+class OrderActivity:
+    """The fields of an ACCT_ACTIVITY order message LiveT acts on."""
+
+    __slots__ = ("activity", "orderkey", "ordertype", "openclose", "orderinstruct", "symbol", "price")
+
+    def __init__(self, activity, orderkey, ordertype, openclose, orderinstruct, symbol, price):
+        self.activity = activity
+        self.orderkey = orderkey
+        self.ordertype = ordertype
+        self.openclose = openclose
+        self.orderinstruct = orderinstruct
+        self.symbol = symbol
+        self.price = price
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"OrderActivity({fields})"
+
+
+class _Done(Exception):
+    """Stops expat once every field has been seen."""
+
+
+def _parse(message: str, fields: dict, pricing: dict) -> None:
+    # path holds the local names below <Order>, empty until it opens
+    path = []
+    text = []
+    inside = [False]
+
+    def start(name, attrs):
+        tag = name.rpartition(" ")[2]
+        if inside[0]:
+            path.append(tag)
+        elif tag == "Order":
+            inside[0] = True
+        text.clear()
+
+    def data(chunk):
+        text.append(chunk)
+
+    def end(name):
+        if not inside[0]:
+            return
+        if not path:
+            # the Order element is over, nothing after it matters
+            raise _Done
+        depth = len(path)
+        tag = path.pop()
+        if depth == 1:
+            if tag in ORDER_FIELDS:
+                fields[tag] = "".join(text)
+        elif depth == 2:
+            if path[0] == "Security" and tag == "Symbol":
+                fields[tag] = "".join(text)
+            elif path[0] == "OrderPricing":
+                pricing[tag] = "".join(text)
+        text.clear()
+        if len(fields) == 5 and fields["OrderType"] in pricing:
+            raise _Done
+
+    parser = expat.ParserCreate(namespace_separator=" ")
+    parser.buffer_text = True
+    parser.StartElementHandler = start
+    parser.CharacterDataHandler = data
+    parser.EndElementHandler = end
+    try:
+        parser.Parse(message, True)
+    except _Done:
+        pass
+
+
+def decode_activity(activity: str, message: str) -> OrderActivity:
+    """Pulls the order fields out of an ACCT_ACTIVITY XML payload in one pass.
+    Only the <Order> element is handed to expat, whose callbacks keep the text
+    of OrderKey, OrderType, OpenClose, OrderInstructions, Security/Symbol and
+    OrderPricing/* and stop parsing as soon as all of them have been seen. If
+    the slice doesn't parse on its own (e.g. a prefix declared on the root),
+    the whole message is parsed instead. No tree or dict is built.
+    Arguments:
+    ----
+    activity {str} -- The message type from field "2", e.g. "OrderFill".
+    message {str} -- The XML from field "3".
+    Raises:
+    ----
+    ActivityDecodeError: If the XML is malformed or an order field is missing.
+    Returns:
+    ----
+    OrderActivity -- price is "MARKET" for market orders.
+    """
+
+    fields = {}
+    pricing = {}
+    begin = message.find("<Order ")
+    if begin == -1:
+        begin = message.find("<Order>")
+    end = message.find("</Order>", begin)
+    try:
+        if begin != -1 and end != -1:
+            try:
+                _parse(message[begin:end + 8], fields, pricing)
+            except expat.ExpatError:
+                fields.clear()
+                pricing.clear()
+                _parse(message, fields, pricing)
+        else:
+            _parse(message, fields, pricing)
+    except expat.ExpatError as e:
+        raise ActivityDecodeError(f"Malformed {activity} XML: {e}")
+
+    try:
+        ordertype = fields["OrderType"]
+        if ordertype != "Market":
+            price = pricing[ordertype]
+        else:
+            price = "MARKET"
+        return OrderActivity(activity, fields["OrderKey"], ordertype, fields["OpenClose"],
+                             fields["OrderInstructions"], fields["Symbol"], price)
+    except KeyError as e:
+        raise ActivityDecodeError(f"{activity} message has no {e.args[0]}")
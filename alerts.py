@@ -0,0 +1,114 @@
+import re
+from datetime import date
+
+# "Option: SPX 4000 C 12/16 ... Entry: @$1.25" in one pass, anchored at the label found with str.find
+OPTION_ALERT_RE = re.compile(r"Option:\s+(\S+)\s+(\d+(?:\.\d+)?)\s+((?i:[cp]|call|put))\s+(\d\d?)/(\d\d?)"
+                             r".*?Entry:\s+@?\$?(\d+(?:\.\d*)?|\.\d+)", re.S)
+# the same fields one at a time, only to say what is wrong with an alert the fast pass rejected
+OPTION_RE = re.compile(r"Option:\s+(\S+)\s+(\d+(?:\.\d+)?)\s+(\S+)\s+(\d\d?)/(\d\d?)")
+ENTRY_RE = re.compile(r"Entry:\s+@?\$?(\d+(?:\.\d*)?|\.\d+)")
+
+CONTRACT_TYPES = {"C": "CALL", "P": "PUT", "CALL": "CALL", "PUT": "PUT"}
+
+
+class AlertParseError(ValueError):
+    """Raised when an alert is missing a field or a field can't be read."""
+
+
+class Signal:
+    """A parsed trade alert. The expiry may be given as (year, "MM", "DD")
+    and is only turned into a date when it is read; a flagged alert is
+    usually dropped before that."""
+
+    __slots__ = ("ticker", "strike", "contract_type", "_expiry", "entry_price", "risky", "swing", "lotto")
+    FIELDS = ("ticker", "strike", "contract_type", "expiry", "entry_price", "risky", "swing", "lotto")
+
+    ticker: str
+    strike: str
+    contract_type: str
+    entry_price: float
+    risky: bool
+    swing: bool
+    lotto: bool
+
+    def __init__(self, ticker, strike, contract_type, expiry=None, entry_price=None, risky=False, swing=False,
+                 lotto=False):
+        self.ticker = ticker
+        self.strike = strike
+        self.contract_type = contract_type
+        self._expiry = expiry
+        self.entry_price = entry_price
+        self.risky = risky
+        self.swing = swing
+        self.lotto = lotto
+
+    @property
+    def expiry(self) -> date:
+        """Raises:
+        ----
+        AlertParseError: If the alert's month and day are no date.
+        """
+
+        expiry = self._expiry
+        if type(expiry) is tuple:
+            try:
+                expiry = self._expiry = date(expiry[0], int(expiry[1]), int(expiry[2]))
+            except ValueError:
+                raise AlertParseError(f"Invalid expiry {expiry[1]}/{expiry[2]} in alert for {self.ticker}")
+        return expiry
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.FIELDS)
+        return f"Signal({fields})"
+
+    def __eq__(self, other):
+        if not isinstance(other, Signal):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.FIELDS)
+
+
+def parse_option_alert(desc: str, year: int = None, skip_flagged: bool = False) -> Signal:
+    """Parses a full entry alert, the format LiveT trades.
+    Arguments:
+    ----
+    desc {str} -- Alert description containing "Option: <ticker> <strike> <C|P> <MM/DD>"
+        and "Entry: @$<price>".
+    year {int} -- Year of the expiry date, the alert only gives month and day.
+        (default: {current year})
+    skip_flagged {bool} -- Return a risky/swing/lotto alert without reading
+        the option, as a Signal with only its flags set, for a caller that
+        drops those plays anyway. (default: {False})
+    Raises:
+    ----
+    AlertParseError: If the option or the entry price is missing or invalid.
+        An expiry that is no date (e.g. 2/30) is only raised when
+        Signal.expiry is read.
+    Returns:
+    ----
+    Signal -- The parsed alert.
+    """
+
+    lower = desc.lower()
+    risky, swing, lotto = "risky" in lower, "swing" in lower, "lotto" in lower
+    if skip_flagged and (risky or swing or lotto):
+        return Signal(None, None, None, None, None, risky, swing, lotto)
+
+    start = desc.find("Option:")
+    match = OPTION_ALERT_RE.match(desc, start) if start >= 0 else None
+    if match is None:
+        _reject_option_alert(desc, start)
+
+    ticker, strike, kind, month, day, entry_price = match.groups()
+    return Signal(ticker, strike, CONTRACT_TYPES[kind.upper()], (year or date.today().year, month, day),
+                  float(entry_price), risky, swing, lotto)
+
+
+def _reject_option_alert(desc: str, start: int) -> None:
+    # off the fast path: find which field made OPTION_ALERT_RE fail
+    option = OPTION_RE.match(desc, start) if start >= 0 else None
+    if option is None:
+        raise AlertParseError(f"No 'Option: <ticker> <strike> <C|P> <MM/DD>' in alert: {desc!r}")
+    kind = option.group(3)
+    if kind.upper() not in CONTRACT_TYPES:
+        raise AlertParseError(f"Unknown contract type {kind!r} in alert: {desc!r}")
+    raise AlertParseError(f"No 'Entry: <price>' after the option in alert: {desc!r}")
@@ -0,0 +1,77 @@
+"""ACCT_ACTIVITY sample messages, one per activity type LiveT sees.
+
+The payloads follow the layout of the XML TD streams in field "3" (namespace,
+OrderGroupID header, xsi-typed Order with Security, OrderPricing and the
+order details, trailing execution and confirm blocks), with account numbers
+and keys replaced. SAMPLES maps the activity name from field "2" to a full
+content entry as it appears in the stream.
+"""
+
+HEADER = ('<?xml version="1.0" encoding="UTF-8"?><{root} xmlns="urn:xmlns:beb.ameritrade.com">'
+          '<OrderGroupID><Firm>150</Firm><Branch>ABC</Branch><ClientKey>123456789</ClientKey>'
+          '<AccountKey>123456789</AccountKey><Segment>ngoms</Segment><SubAccountType>Margin</SubAccountType>'
+          '<CDDomainID>A000000012345678</CDDomainID></OrderGroupID>'
+          '<ActivityTimestamp>2022-12-16T10:15:22.123-06:00</ActivityTimestamp>')
+
+PRICING = {
+    "Limit": '<OrderPricing xsi:type="LimitT"><Limit>{price}</Limit></OrderPricing>',
+    "Stop": '<OrderPricing xsi:type="StopT"><Stop>{price}</Stop></OrderPricing>',
+    "Market": '<OrderPricing xsi:type="MarketT"><Last>{price}</Last></OrderPricing>',
+}
+
+ORDER = ('<Order xsi:type="OptionOrderT" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+         '<OrderKey>{orderkey}</OrderKey><Security><CUSIP>0SPXW.LG20400000</CUSIP><Symbol>{symbol}</Symbol>'
+         '<SecurityType>Call Option</SecurityType></Security>{pricing}<OrderType>{ordertype}</OrderType>'
+         '<OrderDuration>Day</OrderDuration><OrderEnteredDateTime>2022-12-16T10:15:21.987-06:00</OrderEnteredDateTime>'
+         '<OrderInstructions>{instruction}</OrderInstructions><OriginalQuantity>1</OriginalQuantity>'
+         '<AmountIndicator>Contracts</AmountIndicator><Discretionary>false</Discretionary><OrderSource>Web</OrderSource>'
+         '<Solicited>false</Solicited><MarketCode>Normal</MarketCode><Capacity>Agency</Capacity>'
+         '<Charges><Charge><Type>Commission Override</Type><Amount>0</Amount></Charge></Charges>'
+         '<ClearingID>777</ClearingID><SettlementInstructions>Normal</SettlementInstructions>'
+         '<EnteringDevice>AA_ApiUser</EnteringDevice><OpenClose>{openclose}</OpenClose></Order>')
+
+TRAILER = {
+    "OrderFill": ('<OrderCompletionCode>Normal Completion</OrderCompletionCode><ContraInformation><Contra>'
+                  '<AccountKey>123456789</AccountKey><SubAccountType>Margin</SubAccountType><Broker>CBOE</Broker>'
+                  '<Quantity>1</Quantity><BadgeNumber></BadgeNumber><ReportTime>2022-12-16T10:15:23.001-06:00'
+                  '</ReportTime></Contra></ContraInformation><SettlementInformation><Instructions>Normal'
+                  '</Instructions><Currency>USD</Currency></SettlementInformation><ExecutionInformation>'
+                  '<Type>Bought</Type><Timestamp>2022-12-16T10:15:23.001-06:00</Timestamp><Quantity>1</Quantity>'
+                  '<ExecutionPrice>{price}</ExecutionPrice><AveragePriceIndicator>false</AveragePriceIndicator>'
+                  '<LeavesQuantity>0</LeavesQuantity><ID>ABC123</ID><Exchange>CBOE</Exchange><BrokerId>CBOE'
+                  '</BrokerId></ExecutionInformation><MarkupAmount>0</MarkupAmount><MarkdownAmount>0</MarkdownAmount>'
+                  '<TradeCreditAmount>0</TradeCreditAmount><ConfirmTexts><ConfirmText>Filled</ConfirmText>'
+                  '</ConfirmTexts><TrueCommCost>0</TrueCommCost><TradeDate>2022-12-16</TradeDate>'),
+    "OrderCancelRequest": '<LastUpdated>2022-12-16T10:16:02.512-06:00</LastUpdated><ConfirmTexts/>',
+    "UROUT": ('<OrderDestination>CBOE</OrderDestination><InternalExternalRouteInd>False</InternalExternalRouteInd>'
+              '<CancelledQuantity>1</CancelledQuantity>'),
+    "OrderRejection": '<RejectCode>4</RejectCode><RejectReason>Insufficient buying power</RejectReason>',
+}
+
+# (activity, ordertype, instruction, openclose, price, orderkey)
+MESSAGES = [
+    ("OrderEntryRequest", "Limit", "Buy", "Open", "1.25", "9876543210"),
+    ("OrderEntryRequest", "Limit", "Sell", "Close", "1.38", "9876543211"),
+    ("OrderEntryRequest", "Stop", "Sell", "Close", "0.88", "9876543212"),
+    ("OrderFill", "Limit", "Buy", "Open", "1.25", "9876543210"),
+    ("OrderPartialFill", "Limit", "Buy", "Open", "1.25", "9876543210"),
+    ("OrderFill", "Limit", "Sell", "Close", "1.38", "9876543211"),
+    ("OrderFill", "Market", "Sell", "Close", "1.31", "9876543215"),
+    ("UROUT", "Stop", "Sell", "Close", "0.88", "9876543212"),
+    ("OrderCancelRequest", "Limit", "Buy", "Open", "1.25", "9876543213"),
+    ("OrderCancelReplaceRequest", "Stop", "Sell", "Close", "1.20", "9876543214"),
+    ("OrderRejection", "Limit", "Buy", "Open", "1.25", "9876543216"),
+    ("TooLateToCancel", "Limit", "Sell", "Close", "1.38", "9876543211"),
+]
+
+
+def build(activity, ordertype, instruction, openclose, price, orderkey, symbol="SPXW_121622C4000"):
+    root = f"{activity}Message"
+    order = ORDER.format(orderkey=orderkey, symbol=symbol, ordertype=ordertype, instruction=instruction,
+                         openclose=openclose, pricing=PRICING[ordertype].format(price=price))
+    trailer = TRAILER.get("OrderFill" if "Fill" in activity else activity, "").format(price=price)
+    return HEADER.format(root=root) + order + trailer + f"</{root}>"
+
+
+SAMPLES = [{"seq": i, "key": "ab12cd34ef56", "1": "123456789", "2": message[0], "3": build(*message)}
+           for i, message in enumerate(MESSAGES)]
@@ -0,0 +1,74 @@
+"""Deterministic corpus of example alerts in both formats the bots trade.
+
+"option" alerts are the full entry posts LiveT reads ("Option: SPX 4000 C 12/16
+... Entry: @$1.25"), "short" alerts are the "$SPX 4000c" posts PaperT reads.
+About one in ten is malformed on purpose. The same seed always gives the same
+corpus, so benchmark numbers can be compared between runs.
+
+Usage:
+----
+    python benchmarks/alert_corpus.py [--count 5000] [--seed 7] > alerts.tsv
+"""
+import argparse
+import random
+
+TICKERS = ["SPX", "SPY", "QQQ", "TSLA", "AAPL", "NVDA", "AMZN", "META", "IWM", "AMD"]
+CHATTER = ["Small size", "Trim at first target", "Watch VWAP", "Scalp only", "Momentum play", "Gap fill",
+           "Risky", "swing", "LOTTO", "Following the trend", "Tight stop"]
+
+
+def option_alert(rng):
+    ticker = rng.choice(TICKERS)
+    strike = rng.randrange(100, 4500, 5) if ticker == "SPX" else rng.randrange(20, 600)
+    if rng.random() < .1:
+        strike = f"{strike}.5"
+    kind = rng.choice(("C", "P", "c", "p"))
+    expiry = f"{rng.randint(1, 12)}/{rng.randint(1, 28)}"
+    price = f"{rng.uniform(.05, 25):.2f}"
+    entry = rng.choice((f"@${price}", price))
+    chatter = " ".join(rng.sample(CHATTER, rng.randint(0, 3)))
+    return f"New alert! {chatter} Option: {ticker} {strike} {kind} {expiry} Entry: {entry} Good luck!"
+
+
+def short_alert(rng):
+    ticker = rng.choice(TICKERS)
+    ticker = "$SPX" if ticker == "SPX" else ticker
+    strike = rng.randrange(100, 4500, 5)
+    chatter = " ".join(rng.sample(CHATTER, rng.randint(0, 3)))
+    return f"{ticker} {strike}{rng.choice('cp')} @ {rng.uniform(.05, 25):.2f} {chatter}".strip()
+
+
+def malformed(rng, desc):
+    breakage = rng.randrange(4)
+    if breakage == 0:
+        return desc.replace("Option:", "Opt:")
+    if breakage == 1:
+        return desc.replace("Entry:", "")
+    if breakage == 2:
+        return desc.replace(" C ", " X ").replace("c ", "x ", 1)
+    return desc.split(" ", 1)[0]
+
+
+def generate(count: int = 5000, seed: int = 7):
+    """Returns a list of (format, title, desc) tuples, format being 'option' or 'short'."""
+
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        if rng.random() < .5:
+            kind, title, desc = "option", "Entering", option_alert(rng)
+        else:
+            kind, title, desc = "short", "ENTRY", short_alert(rng)
+        if rng.random() < .1:
+            desc = malformed(rng, desc)
+        corpus.append((kind, title, desc))
+    return corpus
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    for kind, title, desc in generate(args.count, args.seed):
+        print(f"{kind}\t{title}\t{desc}")
@@ -0,0 +1,80 @@
+"""ACCT_ACTIVITY decode throughput, xmltodict vs activity.decode_activity.
+
+"old" is what LiveT.process_stream did before activity.py: xmltodict.parse of
+field "3" into nested dicts, then the order fields read out of them. "new" is
+decode_activity. Both run over the samples in acct_activity_samples.py, one of
+each activity type, and must agree on every field. Needs xmltodict installed
+for the "old" column.
+
+Usage:
+----
+    python benchmarks/bench_activity.py [--messages 100000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from activity import decode_activity  # noqa: E402
+from acct_activity_samples import SAMPLES  # noqa: E402
+
+try:
+    import xmltodict
+except ImportError:
+    xmltodict = None
+
+
+def legacy_decode(activity, message):
+    # LiveT.process_stream before activity.py
+    parsed_data = xmltodict.parse(message)[f'{activity}Message']
+    orderkey = parsed_data['Order']['OrderKey']
+    ordertype = parsed_data['Order']['OrderType']
+    openclose = parsed_data['Order']['OpenClose']
+    orderinstruct = parsed_data['Order']['OrderInstructions']
+    symbol = parsed_data['Order']['Security']['Symbol']
+    if ordertype != "Market":
+        price = parsed_data['Order']['OrderPricing'][f'{ordertype}']
+    else:
+        price = "MARKET"
+    return orderkey, ordertype, openclose, orderinstruct, symbol, price
+
+
+def new_decode(activity, message):
+    order = decode_activity(activity, message)
+    return order.orderkey, order.ordertype, order.openclose, order.orderinstruct, order.symbol, order.price
+
+
+def rate(func, messages):
+    start = time.perf_counter()
+    for activity, message in messages:
+        func(activity, message)
+    return len(messages) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=100_000)
+    args = parser.parse_args()
+
+    samples = [(sample["2"], sample["3"]) for sample in SAMPLES]
+    messages = (samples * (args.messages // len(samples) + 1))[:args.messages]
+    print(f"{len(samples)} sample types, {args.messages} messages, "
+          f"{sum(len(m) for _, m in samples) / len(samples):.0f} bytes/message avg")
+
+    new = rate(new_decode, messages)
+    if xmltodict is None:
+        print(f"new: {new:,.0f} messages/s (xmltodict not installed, no comparison)")
+        return
+
+    for activity, message in samples:
+        assert new_decode(activity, message) == legacy_decode(activity, message), activity
+    old = rate(legacy_decode, messages)
+    print(f"old: {old:,.0f} messages/s ({1e6 / old:.1f}us/message)")
+    print(f"new: {new:,.0f} messages/s ({1e6 / new:.1f}us/message), {new / old:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Per-alert parse time of alerts.py against the old LiveT split()-and-scan code.
+
+The parsers of one format take turns within each round, so load on the
+machine hits them alike; the best round of each is reported. The legacy
+LiveT scan returns early on risky/swing/lotto alerts without reading
+them; parse_option_alert is timed the way LiveT calls it now, with
+skip_flagged, which does the same. The option format is also timed on the
+alerts with none of the flags ("plain"), where both sides parse every
+field. PaperT's short "$SPX 4000c" alerts are still read with split(),
+no parser measured faster than that, so they aren't timed here.
+
+Usage:
+----
+    python benchmarks/bench_alerts.py [--count 5000] [--rounds 20]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alerts import parse_option_alert, AlertParseError  # noqa: E402
+from alert_corpus import generate  # noqa: E402
+
+
+def legacy_option(desc):
+    # LiveT.alert_trace before alerts.py
+    if "risky" in desc.lower() or "swing" in desc.lower() or "lotto" in desc.lower():
+        return None
+    arr = desc.split()
+    for i in range(len(arr)):
+        if arr[i] == "Option:":
+            ticker = arr[i + 1]
+            strike = arr[i + 2]
+            contract_type = arr[i + 3]
+            expiry = arr[i + 4]
+        if arr[i] == "Entry:":
+            if arr[i + 1][0] == "@" and arr[i + 1][1] == "$":
+                entry_price = float(arr[i + 1][2:])
+            else:
+                entry_price = float(arr[i + 1])
+    date_parts = expiry.split('/')
+    return ticker, strike, contract_type, int(date_parts[0]), int(date_parts[1]), entry_price
+
+
+def time_parser(parser, descs):
+    errors = 0
+    start = time.perf_counter_ns()
+    for desc in descs:
+        try:
+            parser(desc)
+        except (AlertParseError, UnboundLocalError, IndexError, ValueError):
+            errors += 1
+    return time.perf_counter_ns() - start, errors
+
+
+def time_parsers(parsers, descs, rounds):
+    """Best ns/alert and rejected count of each parser, interleaved round by round."""
+
+    best = [float("inf")] * len(parsers)
+    errors = [0] * len(parsers)
+    for _ in range(rounds):
+        for i, parser in enumerate(parsers):
+            elapsed, errors[i] = time_parser(parser, descs)
+            best[i] = min(best[i], elapsed)
+    return [(elapsed / len(descs), rejected) for elapsed, rejected in zip(best, errors)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    corpus = generate(args.count)
+    option_descs = [desc for kind, _, desc in corpus if kind == "option"]
+    plain_descs = [desc for desc in option_descs if not any(flag in desc.lower() for flag in ("risky", "swing", "lotto"))]
+
+    # the year is passed in so neither side reads the clock
+    option = [("alerts.parse_option_alert", lambda desc: parse_option_alert(desc, 2022, skip_flagged=True)),
+              ("legacy LiveT scan", legacy_option)]
+    for kind, parsers, descs in (("option", option, option_descs), ("plain", option, plain_descs)):
+        results = time_parsers([func for _, func in parsers], descs, args.rounds)
+        for (name, _), (per_alert, errors) in zip(parsers, results):
+            print(f"{kind:>6} {name:<26}: {per_alert:8.0f} ns/alert over {len(descs)} alerts ({errors} rejected)")
+
+
+if __name__ == "__main__":
+    main()
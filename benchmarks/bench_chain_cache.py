@@ -0,0 +1,163 @@
+"""Chain cache hit ratio and latency saved over a replayed alert day.
+
+Serves generated SPX option chains from a local stub of the chains endpoint,
+then replays a day of ENTRY/SCALE/EXIT alerts on a simulated clock through
+PaperT.get_option_data. A strike-filtered call returns one strike and an
+unfiltered one the whole chain (--strikes strikes, contracts carrying every
+field the real endpoint sends). Each call takes --server-ms plus its payload
+at --mbps, so a whole chain costs what its size costs. "old" makes the
+strike-filtered fetch_api_json call for every alert, as alert_trace did;
+the other rows go through the ChainCache with each TTL, fetching one strike
+on a miss (the default), the whole chain (whole_chains), and the whole
+chain with the 0DTE chains prefetched at the open. papertrade needs a
+config.py on the path for the API key it sends.
+
+Usage:
+----
+    python benchmarks/bench_chain_cache.py [--trades 40] [--server-ms 80] [--mbps 20] [--strikes 400] [--seed 5]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import papertrade  # noqa: E402
+
+EXPIRY = "2022-12-16"
+OPEN, CLOSE = 9.5 * 3600, 16 * 3600
+
+
+def contract(strike, contract_type):
+    # every field of a chains endpoint contract, so payload sizes are the real ones
+    side = contract_type[0]
+    bid = round(random.uniform(.5, 20), 2)
+    return {"putCall": contract_type, "symbol": f"SPXW_121622{side}{strike}",
+            "description": f"SPXW Dec 16 2022 {strike} {contract_type.title()} (PM) (Weekly)", "exchangeName": "OPR",
+            "bid": bid, "ask": round(bid + .1, 2), "last": round(bid + .05, 2), "mark": round(bid + .05, 2),
+            "bidSize": 10, "askSize": 12, "bidAskSize": "10X12", "lastSize": 0, "highPrice": round(bid + 1, 2),
+            "lowPrice": round(bid / 2, 2), "openPrice": 0.0, "closePrice": round(bid + .3, 2), "totalVolume": 1000,
+            "tradeDate": None, "tradeTimeInLong": 1671220799838, "quoteTimeInLong": 1671220799953,
+            "netChange": -.3, "volatility": 20.0, "delta": .5, "gamma": .01, "theta": -1.2, "vega": .1, "rho": 0.0,
+            "openInterest": 500, "timeValue": bid, "theoreticalOptionValue": round(bid + .05, 2),
+            "theoreticalVolatility": 29.0, "optionDeliverablesList": None, "strikePrice": float(strike),
+            "expirationDate": 1671224400000, "daysToExpiration": 0, "expirationType": "W",
+            "lastTradingDay": 1671238800000, "multiplier": 100.0, "settlementType": "P",
+            "deliverableNote": "", "isIndexOption": None, "percentChange": -12.5, "markChange": -.25,
+            "markPercentChange": -10.4, "intrinsicValue": 0.0, "pennyPilot": True, "inTheMoney": False,
+            "mini": False, "nonStandard": False}
+
+
+class StubChains(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_delay = 0.0
+    bytes_per_second = 1e9
+    strikes = range(0)
+    sent = 0
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        contract_type = query["contractType"][0]
+        strikes = [int(float(query["strike"][0]))] if "strike" in query else self.strikes
+        by_strike = {f"{strike}.0": [contract(strike, contract_type)] for strike in strikes}
+        key = "callExpDateMap" if contract_type == "CALL" else "putExpDateMap"
+        body = json.dumps({"symbol": "$SPX.X", key: {f"{EXPIRY}:0": by_strike}}).encode()
+        # server time plus the time the payload takes on the wire
+        time.sleep(self.server_delay + len(body) / self.bytes_per_second)
+        StubChains.sent += len(body)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def alert_day(trades, rng):
+    """(seconds since midnight, title, strike, contract_type) for a day of plays."""
+
+    events, spot = [], 4000
+    for _ in range(trades):
+        entry = rng.uniform(OPEN, CLOSE - 1800)
+        spot = min(4150, max(3850, spot + rng.randint(-6, 6) * 5))
+        strike, contract_type = spot + rng.choice((0, 5, 10)) * (1 if rng.random() < .5 else -1), rng.choice(("CALL", "PUT"))
+        events.append((entry, "ENTRY", strike, contract_type))
+        t = entry
+        for _ in range(rng.randint(0, 2)):
+            t += rng.uniform(20, 300)
+            events.append((t, "SCALE", strike, contract_type))
+        events.append((t + rng.uniform(30, 900), "EXIT", strike, contract_type))
+    return sorted(events)
+
+
+def replay(trader, events, clock, cached, prefetch=False):
+    if prefetch:
+        clock[0] = OPEN
+        trader.prefetch()
+    elapsed = 0.0
+    for t, title, strike, contract_type in events:
+        clock[0] = t
+        start = time.perf_counter()
+        if cached:
+            symbol = None if title == "ENTRY" else f"SPXW_121622{contract_type[0]}{strike}"
+            trader.get_option_data("$SPX.X", str(strike), contract_type, EXPIRY, symbol)
+        else:
+            data = trader.fetch_api_json("$SPX.X", str(strike), contract_type, EXPIRY)
+            (data.popitem()[1]).popitem()[1][0]
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trades", type=int, default=40)
+    parser.add_argument("--server-ms", type=float, default=80)
+    parser.add_argument("--mbps", type=float, default=20, help="payload megabits per second")
+    parser.add_argument("--strikes", type=int, default=400, help="strikes in a whole chain, 5 points apart")
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+
+    StubChains.server_delay = args.server_ms / 1000
+    StubChains.bytes_per_second = args.mbps * 1e6 / 8
+    StubChains.strikes = range(4000 - args.strikes // 2 * 5, 4000 + (args.strikes - args.strikes // 2) * 5, 5)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubChains)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    papertrade.OC_ENDPOINT = f"http://127.0.0.1:{server.server_address[1]}/v1/marketdata/chains"
+
+    events = alert_day(args.trades, random.Random(args.seed))
+    print(f"{len(events)} alerts over {args.trades} trades, {args.server_ms:.0f} ms server time per call, "
+          f"payloads at {args.mbps:g} Mbit/s, {args.strikes} strikes per chain")
+    print(f"{'run':<28} {'REST calls':>10} {'MB':>7} {'hit ratio':>10} {'total (s)':>10} {'saved (s)':>10}")
+
+    trader = papertrade.PaperT()
+    baseline = replay(trader, events, [0], cached=False)
+    print(f"{'old (per alert)':<28} {len(events):>10} {StubChains.sent / 1e6:>7.1f} {'-':>10} {baseline:>10.2f} "
+          f"{'-':>10}")
+    trader.sink.close()
+    for whole, prefetch in ((False, False), (True, False), (True, True)):
+        for ttl in (5, 30, 300):
+            trader = papertrade.PaperT()
+            clock = [0.0]
+            trader.chains.ttl = ttl
+            trader.chains.whole_chains = whole
+            trader.chains.clock = lambda: clock[0]
+            StubChains.sent = 0
+            elapsed = replay(trader, events, clock, cached=True, prefetch=prefetch)
+            stats = trader.chains.stats()
+            label = ("whole chain" if whole else "strike") + f" ttl={ttl}s" + (" +prefetch" if prefetch else "")
+            print(f"{label:<28} {trader.rest_fetches:>10} {StubChains.sent / 1e6:>7.1f} {stats['hit_ratio']:>10.2f} "
+                  f"{elapsed:>10.2f} {baseline - elapsed:>10.2f}")
+            trader.sink.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
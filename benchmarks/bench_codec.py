@@ -0,0 +1,95 @@
+"""Decode throughput of TdStreamerClient's JSON codec on a LEVELONE_OPTION firehose.
+
+"old" is _parse_json_message before codec.py: json.loads, and on failure the
+whole frame re-encoded to UTF-8, U+FFFD bytes replaced, decoded and parsed
+again. "new" is JsonCodec.loads for each backend installed. Runs once on
+clean frames and once with every --bad-every'th frame carrying bare U+FFFD
+values, and checks every backend returns what the old path returned. Each
+decoder is timed --rounds times, interleaved with the others, and the best
+round counts. Exits non-zero if the stdlib json codec is more than
+--tolerance slower than the old path, the decoder of every install without
+orjson or ujson.
+
+Usage:
+----
+    python benchmarks/bench_codec.py [--frames 20000] [--bad-every 100] [--rounds 7] [--tolerance 0.05]
+                                     [--file recorded.jsonl]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from codec import JsonCodec, BACKENDS  # noqa: E402
+import firehose  # noqa: E402
+
+
+def legacy_loads(message):
+    try:
+        message_decoded = json.loads(message)
+    except:  # noqa: E722
+        message = message.encode('utf-8').replace(b'\xef\xbf\xbd', bytes('"None"', 'utf-8')).decode('utf-8')
+        message_decoded = json.loads(message)
+    return message_decoded
+
+
+def measure(decoders, frames, rounds):
+    """Best frames/s of each decoder over `rounds`, timed in turn every round."""
+
+    best = [0.0] * len(decoders)
+    for _ in range(rounds):
+        for i, loads in enumerate(decoders):
+            start = time.perf_counter()
+            for frame in frames:
+                loads(frame)
+            best[i] = max(best[i], len(frames) / (time.perf_counter() - start))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=20_000)
+    parser.add_argument("--bad-every", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--tolerance", type=float, default=.05)
+    parser.add_argument("--file", help="recorded frames, one JSON message per line")
+    args = parser.parse_args()
+
+    codecs = []
+    for name in BACKENDS:
+        try:
+            codecs.append(JsonCodec(name))
+        except ImportError:
+            print(f"{name}: not installed")
+
+    if args.file:
+        runs = [(args.file, firehose.load(args.file))]
+    else:
+        runs = [("clean", firehose.generate(args.frames)),
+                (f"1 bad in {args.bad_every}", firehose.generate(args.frames, bad_every=args.bad_every))]
+
+    failures = []
+    for label, frames in runs:
+        expected = [legacy_loads(frame) for frame in frames]
+        for codec in codecs:
+            assert [codec.loads(frame) for frame in frames] == expected, codec.name
+        size = sum(map(len, frames)) / len(frames)
+        print(f"{label}: {len(frames)} frames, {size:.0f} bytes avg, best of {args.rounds}")
+        old, *new = measure([legacy_loads] + [codec.loads for codec in codecs], frames, args.rounds)
+        print(f"  {'old json':<10} {old:>10,.0f} frames/s {old * size / 1e6:7.1f} MB/s")
+        for codec, rate in zip(codecs, new):
+            print(f"  {codec.name:<10} {rate:>10,.0f} frames/s {rate * size / 1e6:7.1f} MB/s  {rate / old:5.2f}x")
+            if codec.name == "json" and rate < old * (1 - args.tolerance):
+                failures.append(f"{label}: stdlib json codec at {rate / old:.2f}x of the old path")
+    if failures:
+        print("FAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("all checks passed")
+
+
+if __name__ == "__main__":
+    main()
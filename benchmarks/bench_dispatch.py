@@ -0,0 +1,112 @@
+"""ACCT_ACTIVITY latency behind a slow quote consumer, per backpressure policy.
+
+Generated OPTION frames, with an ACCT_ACTIVITY frame every --activity-every
+frames, arrive on a fixed schedule (--interval apart) and are read as soon as
+the receive loop gets to them. The OPTION handler is slow (--slow seconds per
+entry, like a journal write), the ACCT_ACTIVITY handler just timestamps.
+"inline" is the old way: each frame's content is handled in the receive loop
+before the next frame is read, so frames wait in the socket. The others go
+through a Dispatcher with the OPTION queue under each policy; "default"
+registers it without one, see dispatch.default_policy. ACCT_ACTIVITY
+opts in to BLOCK, as LiveT does. Reports
+ACCT_ACTIVITY arrival-to-handler latency and the OPTION queue metrics.
+
+Usage:
+----
+    python benchmarks/bench_dispatch.py [--frames 3000] [--slow 0.0005] [--interval 0.0005]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from codec import DEFAULT_CODEC  # noqa: E402
+from dispatch import Dispatcher, BLOCK, DROP_OLDEST, COALESCE_LATEST  # noqa: E402
+from acct_activity_samples import SAMPLES  # noqa: E402
+import firehose  # noqa: E402
+
+
+def frames(count, activity_every):
+    out = []
+    for n, frame in enumerate(firehose.generate(count)):
+        out.append(DEFAULT_CODEC.loads(frame))
+        if n % activity_every == 0:
+            content = dict(SAMPLES[n % len(SAMPLES)], sent=None)
+            out.append({"data": [{"service": "ACCT_ACTIVITY", "timestamp": 0, "command": "SUBS",
+                                  "content": [content]}]})
+    return out
+
+
+async def run(policy, messages, slow, interval):
+    latencies = []
+
+    async def on_option(content):
+        await asyncio.sleep(slow)
+
+    async def on_activity(content):
+        latencies.append(time.perf_counter() - content['sent'])
+
+    async def receive(start, n, message):
+        # frame n arrives at start + n * interval, wait for it if the loop is early
+        arrival = start + n * interval
+        delay = arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            await asyncio.sleep(0)
+        for entry in message['data']:
+            if entry['service'] == 'ACCT_ACTIVITY':
+                entry['content'][0]['sent'] = arrival
+
+    if policy == "inline":
+        start = time.perf_counter()
+        for n, message in enumerate(messages):
+            await receive(start, n, message)
+            for entry in message['data']:
+                for content in entry['content']:
+                    if entry['service'] == 'ACCT_ACTIVITY':
+                        await on_activity(content)
+                    else:
+                        await on_option(content)
+        return latencies, time.perf_counter() - start, None
+
+    dispatcher = Dispatcher()
+    dispatcher.register('ACCT_ACTIVITY', on_activity, policy=BLOCK)
+    options = dispatcher.register('OPTION', on_option, policy=None if policy == "default" else policy, maxsize=500)
+    dispatcher.start()
+    start = time.perf_counter()
+    for n, message in enumerate(messages):
+        await receive(start, n, message)
+        await dispatcher.dispatch(message)
+    elapsed = time.perf_counter() - start
+    await dispatcher.stop(drain=False)
+    return latencies, elapsed, options.metrics()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=3000)
+    parser.add_argument("--activity-every", type=int, default=50)
+    parser.add_argument("--slow", type=float, default=.0005)
+    parser.add_argument("--interval", type=float, default=.0005)
+    args = parser.parse_args()
+
+    print(f"{'policy':<16} {'activity p50':>12} {'p99 (ms)':>9} {'feed (s)':>9}  OPTION queue")
+    for policy in ("inline", BLOCK, DROP_OLDEST, COALESCE_LATEST, "default"):
+        messages = frames(args.frames, args.activity_every)
+        latencies, elapsed, metrics = await run(policy, messages, args.slow, args.interval)
+        latencies.sort()
+        p50 = statistics.median(latencies) * 1e3
+        p99 = latencies[int(len(latencies) * .99) - 1] * 1e3
+        queue = "" if metrics is None else ", ".join(f"{k}={metrics[k]}" for k in
+                                                    ("policy", "high_water", "delivered", "dropped", "coalesced"))
+        print(f"{policy:<16} {p50:>12.3f} {p99:>9.3f} {elapsed:>9.2f}  {queue}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
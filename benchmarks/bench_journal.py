@@ -0,0 +1,86 @@
+"""Cost of recording trades: append-only TradeJournal vs read-concat-rewrite.
+
+Records --trades synthetic rows through TradeJournal for each fsync policy,
+then records --legacy-trades rows the old way (pandas read_csv, concat one row,
+to_csv the whole file). The old approach is O(n) per row, so it is run on a
+shorter journal and its last 100 rows show what a row costs at that size.
+
+Usage:
+----
+    python benchmarks/bench_journal.py [--trades 100000] [--legacy-trades 2000]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from journal import JOURNAL_COLUMNS, TradeJournal, FSYNC_ALWAYS, FSYNC_INTERVAL, FSYNC_NEVER  # noqa: E402
+
+
+def synthetic_rows(count, seed=0):
+    rng = random.Random(seed)
+    for i in range(count):
+        action = ("ENTRY", "SCALE", "EXIT")[i % 3]
+        bid = round(rng.uniform(.5, 10), 2)
+        yield [f"2022-12-16 10:{i % 60:02d}:00", action, "$SPX.X", str(rng.randrange(3800, 4200, 5)),
+               rng.choice(("CALL", "PUT")), bid, round(bid + .1, 2), "10X12", bid, rng.randrange(10000),
+               rng.randrange(5000), math.nan if action == "ENTRY" else round(rng.uniform(-2, 2), 2)]
+
+
+def legacy_record(path, row):
+    df = pd.read_csv(path)
+    row_dd = pd.DataFrame({column: [value] for column, value in zip(JOURNAL_COLUMNS, row)})
+    new_dd = pd.concat([df, row_dd], ignore_index=True)
+    new_dd.to_csv(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trades", type=int, default=100_000)
+    parser.add_argument("--legacy-trades", type=int, default=2_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = list(synthetic_rows(args.trades))
+
+        for policy in (FSYNC_NEVER, FSYNC_INTERVAL, FSYNC_ALWAYS):
+            path = os.path.join(tmp, f"journal-{policy}.csv")
+            journal = TradeJournal(path, fsync=policy)
+            start = time.perf_counter()
+            for row in rows:
+                journal.record(row)
+            journal.close()
+            elapsed = time.perf_counter() - start
+            print(f"TradeJournal fsync={policy:<8}: {args.trades} rows in {elapsed:8.3f}s "
+                  f"({elapsed / args.trades * 1e6:8.2f}us/row)")
+
+        path = os.path.join(tmp, "legacy.csv")
+        pd.DataFrame(columns=JOURNAL_COLUMNS).to_csv(path, index=False)
+        timings = []
+        for row in rows[:args.legacy_trades]:
+            start = time.perf_counter()
+            legacy_record(path, row)
+            timings.append(time.perf_counter() - start)
+        tail = timings[-100:]
+        print(f"read-concat-rewrite      : {len(timings)} rows in {sum(timings):8.3f}s "
+              f"({sum(timings) / len(timings) * 1e6:8.2f}us/row, "
+              f"{sum(tail) / len(tail) * 1e6:8.2f}us/row at {len(timings)} rows)")
+
+        # sanity check that both files parse to the same frame
+        check = TradeJournal(os.path.join(tmp, "check.csv"), fsync=FSYNC_NEVER)
+        for row in rows[:args.legacy_trades]:
+            check.record(row)
+        check.close()
+        same = pd.read_csv(os.path.join(tmp, "check.csv")).equals(pd.read_csv(path))
+        print(f"schema compatible with the pandas journal: {same}")
+
+
+if __name__ == "__main__":
+    main()
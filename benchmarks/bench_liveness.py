@@ -0,0 +1,149 @@
+"""How fast the feed monitor flags a stalled stream, against the local stub streamer.
+
+A TdStreamerClient with monitor_feed() runs dispatch_stream while the stub
+pushes a CHART_EQUITY frame every --interval seconds. Three phases:
+flowing (the monitor must stay healthy; reports ping round trip and data
+lag percentiles), silent (the stub stops pushing, the monitor must flag the
+missing data within --data-deadline) and frozen (the stub stops reading,
+so pings go unanswered while data still flows, the monitor must flag it
+within one ping interval plus --ping-timeout). After each stall the feed
+must be healthy again once it resumes, and no round trip after the frozen
+phase's lost pongs may count more than its own ping's wait (at most
+--ping-timeout). Exits non-zero on a failed check.
+
+Usage:
+----
+    python benchmarks/bench_liveness.py [--seconds 2] [--data-deadline 0.3] [--ping-interval 0.05] [--ping-timeout 0.2]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stream import TdStreamerClient  # noqa: E402
+from ws_stub import StubStreamer, principal_data, credentials  # noqa: E402
+
+# flagging later than the deadline by more than this fails
+TOLERANCE = .05
+
+
+async def pusher(stub, interval, running, stop):
+    seq = 0
+    while not stop.is_set():
+        await running.wait()
+        seq += 1
+        frame = {"data": [{"service": "CHART_EQUITY", "timestamp": int(time.time() * 1000), "command": "SUBS",
+                           "content": [{"seq": seq, "key": "SPY", "1": 400.0, "2": 401.0, "3": 399.0,
+                                        "4": 400.5, "5": 1000, "6": seq}]}]}
+        await stub.push(json.dumps(frame))
+        await asyncio.sleep(interval)
+
+
+async def until(monitor, stalled, limit):
+    """Seconds until monitor.check() turns stalled (or healthy), polled every ms."""
+
+    started = time.monotonic()
+    while bool(monitor.check()) != stalled:
+        if time.monotonic() - started > limit:
+            return None
+        await asyncio.sleep(.001)
+    return time.monotonic() - started
+
+
+def ms(seconds):
+    return "never" if seconds is None else f"{seconds * 1e3:.0f} ms"
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=2)
+    parser.add_argument("--interval", type=float, default=.005)
+    parser.add_argument("--data-deadline", type=float, default=.3)
+    parser.add_argument("--ping-interval", type=float, default=.05)
+    parser.add_argument("--ping-timeout", type=float, default=.2)
+    args = parser.parse_args()
+
+    stub = await StubStreamer().start()
+    client = TdStreamerClient(websocket_url="stub", principal_data=principal_data(), credentials=credentials())
+    client.websocket_url = stub.url
+    monitor = client.monitor_feed(stall_after=1.0, data_deadline=args.data_deadline, interval=args.ping_interval,
+                                  ping_timeout=args.ping_timeout)
+    async def on_chart(content):
+        pass
+
+    client.on('CHART_EQUITY', on_chart)
+    await client._connect()
+    receiving = asyncio.ensure_future(client.dispatch_stream())
+
+    running, stop = asyncio.Event(), asyncio.Event()
+    running.set()
+    pushing = asyncio.ensure_future(pusher(stub, args.interval, running, stop))
+    failures = []
+
+    # flowing
+    await asyncio.sleep(args.seconds)
+    if monitor.check():
+        failures.append(f"flowing feed flagged: {monitor.check()}")
+    rtt, lag = monitor.rtt.percentiles(), monitor.lag.percentiles()
+    print(f"flowing {args.seconds:g}s: {monitor.pings} pings, rtt p50 {rtt['p50'] * 1e3:.2f} ms "
+          f"p99 {rtt['p99'] * 1e3:.2f} ms; {monitor.data_frames} data frames, lag p50 {lag['p50'] * 1e3:.1f} ms "
+          f"p99 {lag['p99'] * 1e3:.1f} ms (ms timestamps)")
+
+    # silent: pings are answered, data stops
+    running.clear()
+    await asyncio.sleep(args.interval)
+    # from the last data frame, as the deadline counts
+    detected = monitor.since_data() if await until(monitor, True, 5) is not None else None
+    reason = monitor.check()
+    running.set()
+    recovered = await until(monitor, False, 5)
+    print(f"silent: flagged {ms(detected)} after the last data frame ({reason}), healthy {ms(recovered)} "
+          f"after data resumed")
+    if detected is None or detected > args.data_deadline + TOLERANCE:
+        failures.append(f"silent feed flagged after {ms(detected)}, deadline {args.data_deadline * 1e3:.0f} ms")
+    if recovered is None:
+        failures.append("no recovery after the silent phase")
+
+    # frozen: data flows, pings go unanswered
+    await asyncio.sleep(.2)
+    stub.freeze()
+    detected = await until(monitor, True, 5)
+    reason = monitor.check()
+    before = monitor.pings
+    stub.thaw()
+    recovered = await until(monitor, False, 5)
+    # a few pings after the lost ones, each must be timed from its own send
+    while monitor.pings < before + 5:
+        await asyncio.sleep(args.ping_interval)
+    worst = max(list(monitor.rtt.samples)[-5:])
+    limit = args.ping_interval + args.ping_timeout
+    print(f"frozen: flagged {ms(detected)} after the freeze ({reason}), healthy {ms(recovered)} after the thaw; "
+          f"{monitor.timeouts} ping timeouts")
+    if detected is None or detected > limit + TOLERANCE:
+        failures.append(f"frozen feed flagged after {ms(detected)}, limit {limit * 1e3:.0f} ms")
+    if recovered is None:
+        failures.append("no recovery after the frozen phase")
+    print(f"after the thaw: worst of the last 5 round trips {ms(worst)}")
+    if worst > args.ping_timeout + TOLERANCE:
+        failures.append(f"round trip of {ms(worst)} after a lost pong, over the {ms(args.ping_timeout)} timeout")
+
+    stop.set()
+    running.set()
+    await pushing
+    await client.connection.close()
+    await receiving
+    await stub.stop()
+    print(f"stalls: {monitor.stalls}")
+    if failures:
+        print("FAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("all checks passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+"""Serialization cost per bracket entry, dict + json.dumps vs OrderTemplate.
+
+"old" builds the nested bracket dict for each contract and serializes it with
+json.dumps, which is what aiohttp's json= did for every order. "new" renders
+the pre-serialized BracketStrategy. Both produce one body per contract.
+
+Usage:
+----
+    python benchmarks/bench_order_json.py [--entries 20000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from orders import BracketStrategy  # noqa: E402
+
+STOP_PRICE = .70
+SCALE = [1.10, 1.20, 1.60, 2.00, 2.50, 3.00]
+SYMBOL = "SPXW_121622C4000"
+
+
+def sell_leg(symbol):
+    return {"instruction": "SELL_TO_CLOSE", "instrument": {"assetType": "OPTION", "symbol": symbol}, "quantity": 1}
+
+
+def legacy_entry(size, symbol, entryprice):
+    # LiveT.enter_position before orders.py, plus the json.dumps aiohttp ran per order
+    stop_price = str(round((entryprice * STOP_PRICE), 2))
+    entry_price = str("%.2f" % entryprice)
+    bodies = []
+    for i in range(size):
+        scale_price = str(round((entryprice * SCALE[i]), 2))
+        order_json = {
+            "orderType": "LIMIT", "session": "NORMAL", "price": entry_price, "duration": "DAY",
+            "orderStrategyType": "TRIGGER",
+            "orderLegCollection": [{"quantity": 1, "instruction": "BUY_TO_OPEN",
+                                    "instrument": {"assetType": "OPTION", "symbol": symbol}}],
+            "childOrderStrategies": [{"orderStrategyType": "OCO", "childOrderStrategies": [
+                {"orderStrategyType": "SINGLE", "session": "NORMAL", "duration": "DAY", "orderType": "LIMIT",
+                 "price": scale_price, "orderLegCollection": [sell_leg(symbol)]},
+                {"orderStrategyType": "SINGLE", "session": "NORMAL", "duration": "DAY", "orderType": "STOP",
+                 "stopPrice": stop_price, "orderLegCollection": [sell_leg(symbol)]}]}]
+        }
+        bodies.append(json.dumps(order_json).encode())
+    return bodies
+
+
+def per_entry(func, entries):
+    prices = [1 + (i % 400) / 100 for i in range(entries)]
+    start = time.perf_counter_ns()
+    for price in prices:
+        func(SYMBOL, price)
+    return (time.perf_counter_ns() - start) / entries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=20_000)
+    args = parser.parse_args()
+
+    print("SIZE   old (ns/entry)   new (ns/entry)   speedup")
+    for size in range(1, 7):
+        strategy = BracketStrategy(size, STOP_PRICE, SCALE)
+        # same orders either way
+        assert [json.loads(body) for body in strategy.render(SYMBOL, 1.25)] == \
+               [json.loads(body) for body in legacy_entry(size, SYMBOL, 1.25)]
+        old = per_entry(lambda symbol, price: legacy_entry(size, symbol, price), args.entries)
+        new = per_entry(strategy.render, args.entries)
+        print(f"{size:>4}   {old:14.0f}   {new:14.0f}   {old / new:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Alert-to-201 latency of LiveT entries over cold and warm connections.
+
+Runs a local stub of the orders endpoint and times LiveT.alert_trace from the
+moment an alert is handed over until every leg of the bracket has come back
+with a 201. "cold" drops the session before every alert (the old behaviour of
+a new ClientSession per entry), "warm" opens and warms it once at startup.
+"idle" and "kept" space --idle-alerts alerts --idle-s apart with KEEPALIVE
+scaled down to half of that, so the pooled connections expire between
+alerts: "idle" only warms at startup (open_session), "kept" runs
+LiveT.start(), which re-warms every quarter of the gap (REWARM_EVERY).
+
+Usage:
+----
+    python benchmarks/bench_order_session.py [--alerts 50] [--handshake-ms 30] [--idle-alerts 10] [--idle-s 1]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import livetrade  # noqa: E402
+
+ALERT_TITLE = "Entering"
+ALERT_DESC = "Option: SPX 4000 C 12/16 Entry: @$1.25"
+
+
+class StubOrders(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    handshake_delay = 0.0
+
+    def setup(self):
+        # runs once per new connection, stands in for the TLS handshake of the real API
+        time.sleep(self.handshake_delay)
+        super().setup()
+
+    def _reply(self, status):
+        length = int(self.headers.get('Content-Length', 0))
+        if length:
+            self.rfile.read(length)
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        self._reply(201)
+
+    def do_GET(self):
+        self._reply(200)
+
+    def do_PUT(self):
+        self._reply(200)
+
+    def do_DELETE(self):
+        self._reply(200)
+
+    def log_message(self, *args):
+        pass
+
+
+async def run(mode, alerts, idle=0.0):
+    trader = livetrade.LiveT()
+    trader.header = {"Authorization": "Bearer stub"}
+    if mode in ("warm", "idle"):
+        await trader.open_session()
+    elif mode == "kept":
+        await trader.start()
+    samples = []
+    for _ in range(alerts):
+        if mode == "cold":
+            await trader.close_session()
+        await asyncio.sleep(idle)
+        start = time.perf_counter()
+        await trader.alert_trace(ALERT_TITLE, ALERT_DESC)
+        samples.append((time.perf_counter() - start) * 1000)
+    await trader.close()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--alerts", type=int, default=50)
+    parser.add_argument("--handshake-ms", type=float, default=30.0)
+    parser.add_argument("--idle-alerts", type=int, default=10)
+    parser.add_argument("--idle-s", type=float, default=1.0)
+    args = parser.parse_args()
+
+    StubOrders.handshake_delay = args.handshake_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOrders)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    livetrade.PO_ENDPOINT = f"http://127.0.0.1:{server.server_address[1]}/orders"
+
+    results = {mode: asyncio.run(run(mode, args.alerts)) for mode in ("cold", "warm")}
+    livetrade.KEEPALIVE = args.idle_s / 2
+    livetrade.REWARM_EVERY = args.idle_s / 4
+    for mode in ("idle", "kept"):
+        results[mode] = asyncio.run(run(mode, args.idle_alerts, args.idle_s))
+    server.shutdown()
+
+    print(f"SIZE={livetrade.SIZE} alerts={args.alerts} simulated handshake={args.handshake_ms}ms")
+    for mode, samples in results.items():
+        samples.sort()
+        print(f"{mode:>5}: p50 {statistics.median(samples):8.2f}ms  "
+              f"p99 {samples[min(len(samples) - 1, int(len(samples) * .99))]:8.2f}ms  "
+              f"mean {statistics.fmean(samples):8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
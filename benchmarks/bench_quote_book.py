@@ -0,0 +1,79 @@
+"""QuoteBook delta-merge throughput and memory per 10k symbols.
+
+Decodes a generated LEVELONE_OPTION firehose over --symbols contracts (the
+first update of each is a full quote, the rest are deltas) and merges every
+content entry into a QuoteBook. Reports merges/s, the book's memory per 10k
+symbols (tracemalloc), what the same updates cost queued as raw dicts, and
+the cost of a snapshot plus the copy the next merge makes.
+
+Usage:
+----
+    python benchmarks/bench_quote_book.py [--symbols 10000] [--frames 50000]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from codec import DEFAULT_CODEC  # noqa: E402
+from quotes import QuoteBook  # noqa: E402
+import firehose  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", type=int, default=10_000)
+    parser.add_argument("--frames", type=int, default=50_000)
+    args = parser.parse_args()
+
+    messages = [DEFAULT_CODEC.loads(frame) for frame in firehose.generate(args.frames, symbols=args.symbols)]
+    entries = [message['data'][0] for message in messages]
+    updates = sum(len(entry['content']) for entry in entries)
+
+    book = QuoteBook("OPTION")
+    start = time.perf_counter()
+    for entry in entries:
+        book.merge_entry(entry)
+    elapsed = time.perf_counter() - start
+    print(f"{updates:,} updates over {len(book):,} symbols: {updates / elapsed:,.0f} merges/s "
+          f"({elapsed / updates * 1e9:.0f} ns/merge)")
+
+    # the book holds the same values as replaying every update into plain dicts
+    latest = {}
+    for entry in entries:
+        for content in entry['content']:
+            latest.setdefault(content['key'], {}).update(content)
+    for symbol, fields in latest.items():
+        quote = book.get(symbol)
+        assert all(quote[int(k)] == v for k, v in fields.items() if k.isdigit()), symbol
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    fresh = QuoteBook("OPTION")
+    for entry in entries:
+        fresh.merge_entry(entry)
+    book_bytes = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    per_10k = book_bytes / len(fresh) * 10_000
+    print(f"book memory: {book_bytes / 1e6:.1f} MB for {len(fresh):,} symbols, {per_10k / 1e6:.1f} MB per 10k symbols")
+    # a queue of the raw updates is what a consumer falling behind would hold instead
+    raw = sum(sys.getsizeof(content) for entry in entries for content in entry['content'])
+    print(f"the same updates queued as dicts: {raw / 1e6:.1f} MB (dict objects alone)")
+
+    start = time.perf_counter_ns()
+    snapshot = fresh.snapshot()
+    taken = time.perf_counter_ns() - start
+    content = entries[-1]['content'][0]
+    start = time.perf_counter_ns()
+    fresh.merge(content)
+    copied = time.perf_counter_ns() - start
+    assert snapshot[content['key']] is not fresh.get(content['key'])
+    print(f"snapshot: {taken / 1e3:.1f} us, first merge after it (copies the index): {copied / 1e3:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Reconnects under random connection drops, against the local stub streamer.
+
+A TdStreamerClient with auto_reconnect() subscribes to CHART_EQUITY and
+TIMESALE_EQUITY and runs dispatch_stream while the stub pushes a frame every
+--interval seconds (a "seq" per symbol, with one in --skip-every skipped on
+purpose) and cuts every connection at random (--drop-every seconds on
+average), sometimes also refusing new connections for a while. Checks that
+every drop is followed by exactly one reconnect that replays the whole
+data_requests, that data keeps flowing afterwards and that every skipped seq
+the client could have seen is reported as a gap. Reports the time from each
+disconnect to the first data frame after it. Exits non-zero on a failed check.
+
+Usage:
+----
+    python benchmarks/bench_reconnect.py [--seconds 20] [--drop-every 1.0] [--interval 0.005] [--seed 4]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from reconnect import Backoff  # noqa: E402
+from stream import TdStreamerClient  # noqa: E402
+from ws_stub import StubStreamer, principal_data, credentials  # noqa: E402
+
+SYMBOLS = ["AAPL", "MSFT", "SPY", "QQQ"]
+
+
+async def pusher(stub, interval, skip_every, rng, stop, skipped):
+    seq = {symbol: 0 for symbol in SYMBOLS}
+    while not stop.is_set():
+        content = []
+        for symbol in SYMBOLS:
+            seq[symbol] += 1
+            if rng.randrange(skip_every) == 0:
+                # this one is never sent
+                skipped.append((symbol, seq[symbol]))
+                seq[symbol] += 1
+            content.append({"seq": seq[symbol], "key": symbol, "1": 100.0, "2": 101.0, "3": 99.0, "4": 100.5,
+                            "5": 1000, "6": seq[symbol]})
+        frame = {"data": [{"service": "CHART_EQUITY", "timestamp": int(time.time() * 1000), "command": "SUBS",
+                           "content": content}]}
+        await stub.push(json.dumps(frame), subscribed_only=True)
+        await asyncio.sleep(interval)
+
+
+async def chaos(stub, drop_every, rng, stop, drops):
+    while not stop.is_set():
+        await asyncio.sleep(rng.expovariate(1 / drop_every))
+        if stop.is_set() or not stub.subscribed:
+            continue
+        drops.append(time.monotonic())
+        if rng.random() < .3:
+            # the server is away for a moment, the first attempts fail
+            stub.accepting = False
+            stub.drop()
+            await asyncio.sleep(rng.uniform(.05, .4))
+            stub.accepting = True
+        else:
+            stub.drop()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--drop-every", type=float, default=1.0)
+    parser.add_argument("--interval", type=float, default=.005)
+    parser.add_argument("--skip-every", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=4)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    stub = await StubStreamer().start()
+    client = TdStreamerClient(websocket_url="stub", principal_data=principal_data(), credentials=credentials())
+    client.websocket_url = stub.url
+    gaps = []
+    client.auto_reconnect(Backoff(base=.05, cap=1.0, rng=random.Random(args.seed).random),
+                          on_gap=lambda service, key, last, seq: gaps.append((key, last, seq)))
+    client.chart(SYMBOLS)
+    client.timesale(SYMBOLS)
+
+    received = []
+    # symbol -> (first, last) seq received
+    seen = {}
+
+    async def on_chart(content):
+        received.append(time.monotonic())
+        first, _ = seen.get(content['key'], (content['seq'], None))
+        seen[content['key']] = (first, content['seq'])
+
+    client.on('CHART_EQUITY', on_chart)
+    await client._connect()
+    await client._send_message(client._build_data_request())
+    receiving = asyncio.ensure_future(client.dispatch_stream())
+
+    stop = asyncio.Event()
+    skipped, drops = [], []
+    tasks = [asyncio.ensure_future(pusher(stub, args.interval, args.skip_every, rng, stop, skipped)),
+             asyncio.ensure_future(chaos(stub, args.drop_every, rng, stop, drops))]
+    await asyncio.sleep(args.seconds)
+    stop.set()
+    await asyncio.gather(*tasks)
+    # let the last reconnect finish and some data through
+    await asyncio.sleep(1.0)
+    last_drop = drops[-1] if drops else 0
+    # a close of our own ends dispatch_stream instead of reconnecting
+    client.backoff = None
+    await client.connection.close()
+    await receiving
+    await stub.stop()
+
+    metrics = client.stream_metrics()
+    recovery = sorted(metrics['recovery_times'])
+    failures = []
+    if metrics['reconnects'] != len(drops) or metrics['disconnects'] != len(drops):
+        failures.append(f"{len(drops)} drops but {metrics['disconnects']} disconnects, "
+                        f"{metrics['reconnects']} reconnects")
+    replayed = [(r['service'], r['command']) for r in stub.session_requests if r['service'] != 'ADMIN']
+    expected = [(r['service'], r['command']) for r in client.data_requests['requests']]
+    if replayed != expected:
+        failures.append(f"last session got {replayed}, data_requests is {expected}")
+    if not received or received[-1] < last_drop:
+        failures.append("no data after the last drop")
+    reported = [(symbol, seq) for symbol, seq in skipped
+                if any(key == symbol and last < seq < new for key, last, new in gaps)]
+    # a skip the client had data on both sides of must be in a reported gap
+    visible = [(symbol, seq) for symbol, seq in skipped if seen[symbol][0] < seq < seen[symbol][1]]
+    for symbol, seq in set(visible) - set(reported):
+        failures.append(f"skipped {symbol} seq {seq} not reported")
+
+    print(f"{len(drops)} drops, {metrics['reconnects']} reconnects over {stub.sessions} sessions, "
+          f"{len(received)} chart entries received")
+    print(f"gaps reported: {metrics['gaps']} ({metrics['missing']} seq missing), "
+          f"skipped on purpose: {len(skipped)}, {len(visible)} while connected, {len(reported)} reported")
+    if recovery:
+        print(f"disconnect -> first data: p50 {statistics.median(recovery) * 1e3:.0f} ms, "
+              f"p95 {recovery[int(len(recovery) * .95)] * 1e3:.0f} ms, max {recovery[-1] * 1e3:.0f} ms")
+    if failures:
+        print("FAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("all checks passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
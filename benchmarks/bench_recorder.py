@@ -0,0 +1,116 @@
+"""Receive latency added by the stream recorder, and how fast a recording reads back.
+
+The local stub streamer pushes --frames OPTION firehose frames on a fixed
+schedule (--interval apart) to a TdStreamerClient running dispatch_stream.
+Latency is from the stub's send to a tap on the OPTION service, which runs
+in the receive loop right after the frame is decoded, with and without
+record() on. Then the recording is read back through FrameReader: raw
+frames (memoryviews, no copy) and decoded messages.
+
+Usage:
+----
+    python benchmarks/bench_recorder.py [--frames 20000] [--interval 0.0002] [--runs 3]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from recorder import FrameRecorder, FrameReader  # noqa: E402
+from stream import TdStreamerClient  # noqa: E402
+from ws_stub import StubStreamer, principal_data, credentials  # noqa: E402
+import firehose  # noqa: E402
+
+
+async def run(stub, frames, interval, path):
+    client = TdStreamerClient(websocket_url="stub", principal_data=principal_data(), credentials=credentials())
+    client.websocket_url = stub.url
+    await client._connect()
+    recorder = client.record(path) if path else None
+
+    sent, latencies = [], []
+    done = asyncio.Event()
+
+    def tap(entry):
+        latencies.append(time.perf_counter() - sent[len(latencies)])
+        if len(latencies) == len(frames):
+            done.set()
+
+    client.dispatcher.tap('OPTION', tap)
+    receiving = asyncio.ensure_future(client.dispatch_stream())
+
+    start = time.perf_counter()
+    for n, frame in enumerate(frames):
+        # frame n goes out at start + n * interval
+        delay = start + n * interval - time.perf_counter()
+        await asyncio.sleep(delay if delay > 0 else 0)
+        sent.append(time.perf_counter())
+        await stub.push(frame)
+    await done.wait()
+    await client.connection.close()
+    await receiving
+    # writes out the last block, so the metrics count every frame
+    client.stop_recording()
+    return latencies, recorder.metrics() if recorder else None
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=20000)
+    parser.add_argument("--interval", type=float, default=.0002)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    frames = firehose.generate(args.frames)
+    stub = await StubStreamer().start()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "firehose.tdrec")
+        results = {"off": [], "record": []}
+        metrics = None
+        for _ in range(args.runs):
+            for mode in results:
+                latencies, run_metrics = await run(stub, frames, args.interval, path if mode == "record" else None)
+                results[mode].extend(latencies)
+                metrics = run_metrics or metrics
+
+        print(f"{'recorder':<9} {'p50 (us)':>9} {'p99 (us)':>9} {'mean (us)':>10}")
+        for mode, latencies in results.items():
+            print(f"{mode:<9} {statistics.median(latencies) * 1e6:>9.1f} {percentile(latencies, .99) * 1e6:>9.1f} "
+                  f"{statistics.mean(latencies) * 1e6:>10.1f}")
+        print(f"recorded {metrics['recorded']} frames, {metrics['raw_bytes'] / 1e6:.1f} MB -> "
+              f"{metrics['written_bytes'] / 1e6:.1f} MB ({metrics['ratio']:.1f}x) in {metrics['blocks']} blocks")
+
+        # record() alone, as the receive loop calls it
+        recorder = FrameRecorder(os.path.join(directory, "calls.tdrec"))
+        started = time.perf_counter()
+        for frame in frames:
+            recorder.record(frame)
+        per_call = (time.perf_counter() - started) / len(frames)
+        recorder.close()
+        print(f"record() {per_call * 1e9:,.0f} ns per frame in the receive loop")
+
+        with FrameReader(path) as reader:
+            started = time.perf_counter()
+            size = sum(len(frame) for _, frame in reader)
+            elapsed = time.perf_counter() - started
+            print(f"read {size / 1e6:.1f} MB of frames at {size / 1e6 / elapsed:,.0f} MB/s "
+                  f"({args.frames / elapsed:,.0f} frames/s)")
+            started = time.perf_counter()
+            count = sum(1 for _ in reader.messages())
+            print(f"decoded {count} messages at {count / (time.perf_counter() - started):,.0f} frames/s")
+    await stub.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,153 @@
+"""Replays a generated trading day through PaperT and checks it's deterministic.
+
+Writes one day of recorded LEVELONE_OPTION frames for the 0DTE SPXW chain
+(--per-second frames a second from 9:30 to 16:00, each with --per-frame
+deltas around a random-walking underlying) and an alert log of
+ENTRY/SCALE/EXIT posts, replays it twice with replay.py and compares the
+two journals byte for byte. Near the close it also enters a contract last
+quoted at the open, which has to come through the chain cache, and one never
+quoted, which has to be skipped. --csv records the quotes as a quote csv
+instead of stream frames.
+
+Usage:
+----
+    python benchmarks/bench_replay.py [--per-second 4] [--per-frame 8] [--trades 40] [--seed 3] [--csv]
+"""
+import argparse
+import csv
+import filecmp
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from replay import ReplayEngine, load, load_alerts, MARKET_TZ  # noqa: E402
+
+DAY = datetime(2022, 12, 16, 9, 30)
+SECONDS = int(6.5 * 3600)
+STRIKES = range(3800, 4205, 5)
+# quoted only in the first frame, then entered near the close: the cold-start path
+STALE_STRIKE = 4300
+# never quoted: the entry is skipped
+UNQUOTED_STRIKE = 4400
+
+
+def symbol(strike, side, day=DAY):
+    return f"SPXW_{day:%m%d%y}{side}{strike}"
+
+
+def generate(directory, per_second, per_frame, trades, seed, as_csv, day=DAY):
+    rng = random.Random(seed)
+    start = day.replace(tzinfo=MARKET_TZ).timestamp() * 1000
+    spot = 4000.0
+
+    quote_path = os.path.join(directory, "quotes.csv" if as_csv else "frames.jsonl")
+    with open(quote_path, "w", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        if as_csv:
+            writer.writerow(["time", "symbol", "bid", "ask", "last", "mark", "bid_size", "ask_size", "total_volume"])
+        for tick in range(SECONDS * per_second):
+            spot += rng.gauss(0, .15)
+            stamp = int(start + tick * 1000 / per_second)
+            content = []
+            for _ in range(per_frame):
+                strike = min(max(5 * round((spot + rng.uniform(-60, 60)) / 5), STRIKES[0]), STRIKES[-1])
+                side = rng.choice("CP")
+                value = max(spot - strike, 0) if side == "C" else max(strike - spot, 0)
+                mark = round(value + rng.uniform(.05, 3), 2)
+                bid, ask = round(mark - .05, 2), round(mark + .05, 2)
+                key = symbol(strike, side, day)
+                if as_csv:
+                    when = (day + timedelta(seconds=tick / per_second)).isoformat()
+                    writer.writerow([when, key, bid, ask, mark, mark, rng.randint(1, 50), rng.randint(1, 50),
+                                     rng.randint(0, 9999)])
+                else:
+                    content.append({"key": key, "2": bid, "3": ask, "4": mark, "41": mark,
+                                    "20": rng.randint(1, 50), "21": rng.randint(1, 50)})
+            if tick == 0:
+                key = symbol(STALE_STRIKE, "C", day)
+                if as_csv:
+                    writer.writerow([day.isoformat(), key, .35, .45, .40, .40, 10, 10, 0])
+                else:
+                    content.append({"key": key, "2": .35, "3": .45, "4": .40, "41": .40, "20": 10, "21": 10})
+            if not as_csv:
+                f.write(json.dumps({"data": [{"service": "OPTION", "timestamp": stamp, "command": "SUBS",
+                                              "content": content}]}) + "\n")
+
+    alert_path = os.path.join(directory, "alerts.jsonl")
+    with open(alert_path, "w") as f:
+        for trade in range(trades):
+            opened = rng.uniform(300, SECONDS - 3600)
+            strike = rng.choice(STRIKES[30:51])
+            side = rng.choice("cp")
+            posts = [(opened, "ENTRY", f"$SPX {strike}{side} @ 2.10")]
+            posts += [(opened + rng.uniform(60, 1200), "SCALE", "$SPX trim here")]
+            posts += [(posts[-1][0] + rng.uniform(60, 1800), "EXIT", "$SPX all out")]
+            for at, title, desc in posts:
+                f.write(json.dumps({"time": (day + timedelta(seconds=at)).isoformat(), "title": title,
+                                    "desc": desc}) + "\n")
+        # after every generated trade has exited
+        for at, strike in ((SECONDS - 300, STALE_STRIKE), (SECONDS - 200, UNQUOTED_STRIKE)):
+            f.write(json.dumps({"time": (day + timedelta(seconds=at)).isoformat(), "title": "ENTRY",
+                                "desc": f"$SPX {strike}c @ 0.40"}) + "\n")
+    # the log is in the order the alerts were posted
+    with open(alert_path) as f:
+        lines = sorted(f, key=lambda line: json.loads(line)["time"])
+    with open(alert_path, "w") as f:
+        f.writelines(lines)
+    return alert_path, quote_path
+
+
+def run(alert_path, quote_path, journal_path):
+    return ReplayEngine(journal_path).run(load(quote_path, 0), load_alerts(alert_path, 1))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--per-second", type=int, default=4)
+    parser.add_argument("--per-frame", type=int, default=8)
+    parser.add_argument("--trades", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=3)
+    parser.add_argument("--csv", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        alert_path, quote_path = generate(directory, args.per_second, args.per_frame, args.trades, args.seed,
+                                          args.csv)
+        print(f"generated {os.path.getsize(quote_path) / 1e6:.1f} MB of quotes in "
+              f"{time.perf_counter() - started:.1f}s")
+
+        journals = [os.path.join(directory, f"replay{i}.csv") for i in (1, 2)]
+        for journal_path in journals:
+            stats = run(alert_path, quote_path, journal_path)
+            print(f"{stats['events']} events ({stats['quotes']} quotes, {stats['alerts']} alerts, "
+                  f"{stats['skipped']} skipped, {stats['chain_fetches']} chain fetches) in {stats['seconds']:.2f}s, "
+                  f"{stats['events'] / stats['seconds']:,.0f} events/s")
+
+        with open(journals[0], newline="") as f:
+            rows = list(csv.reader(f))[1:]
+        same = filecmp.cmp(journals[0], journals[1], shallow=False)
+        print(f"{len(rows)} journal rows, runs identical: {same}")
+        failures = []
+        if not same:
+            failures.append("the two runs wrote different journals")
+        if not any(row[1] == "ENTRY" and float(row[3]) == STALE_STRIKE for row in rows):
+            failures.append(f"no entry on the stale {STALE_STRIKE} contract")
+        if any(row[1] == "ENTRY" and float(row[3]) == UNQUOTED_STRIKE for row in rows):
+            failures.append(f"an entry on the never quoted {UNQUOTED_STRIKE} contract")
+        if stats['skipped'] < 1 or stats['chain_fetches'] < 1:
+            failures.append(f"{stats['skipped']} skipped, {stats['chain_fetches']} chain fetches")
+        if failures:
+            print("FAILED:\n  " + "\n  ".join(failures))
+            sys.exit(1)
+        print("all checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Scaling of the day-sharded replay over worker processes.
+
+Generates --days trading days of recorded frames and alerts (see
+bench_replay.py) in a directory per day, replays them with 1, 2, 4 and 8
+workers and checks every merged journal is byte for byte the serial one.
+Worker counts above the CPUs this process may use can't go faster than
+serial, so each line also gives the bound: the longest worker's share of
+the serial per-day times, biggest days first, as replay_days schedules
+them, i.e. the wall time on that many free cores.
+
+Usage:
+----
+    python benchmarks/bench_replay_days.py [--days 8] [--per-second 1] [--per-frame 8] [--trades 20] [--workers 1 2 4 8]
+"""
+import argparse
+import filecmp
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_replay import DAY, generate  # noqa: E402
+from cpus import available_cpus  # noqa: E402
+from replay import recorded_days, replay_days  # noqa: E402
+
+
+def generate_day(root, day, per_second, per_frame, trades, seed):
+    directory = os.path.join(root, f"{day:%Y-%m-%d}")
+    os.makedirs(directory)
+    generate(directory, per_second, per_frame, trades, seed, False, day)
+
+
+def makespan(seconds, workers):
+    """Wall time of the days on `workers` cores, biggest first to the least loaded."""
+
+    loads = [0.0] * workers
+    for day in sorted(seconds, reverse=True):
+        loads[loads.index(min(loads))] += day
+    return max(loads)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=8)
+    parser.add_argument("--per-second", type=int, default=1)
+    parser.add_argument("--per-frame", type=int, default=8)
+    parser.add_argument("--trades", type=int, default=20)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        started = time.perf_counter()
+        # weekdays after DAY, a different seed each
+        days, day = [], DAY
+        while len(days) < args.days:
+            if day.weekday() < 5:
+                days.append(day)
+            day += timedelta(days=1)
+        with ProcessPoolExecutor() as pool:
+            for future in [pool.submit(generate_day, root, day, args.per_second, args.per_frame, args.trades, seed)
+                           for seed, day in enumerate(days)]:
+                future.result()
+        cpus = available_cpus()
+        print(f"generated {args.days} days in {time.perf_counter() - started:.1f}s on {cpus} cpus")
+
+        recorded = recorded_days(root)
+        serial = None
+        for workers in args.workers:
+            journal = os.path.join(root, f"replay-{workers}.csv")
+            stats = replay_days(recorded, journal, workers)
+            if serial is None:
+                serial, serial_seconds = journal, stats['seconds']
+                day_seconds = [day['seconds'] for day in stats['days'].values()]
+            same = filecmp.cmp(serial, journal, shallow=False)
+            bound = makespan(day_seconds, workers)
+            print(f"workers={workers}: {stats['events']} events, {stats['alerts']} alerts in {stats['seconds']:.2f}s, "
+                  f"{stats['events'] / stats['seconds']:,.0f} events/s, x{serial_seconds / stats['seconds']:.2f}"
+                  f"{' (more workers than cpus)' if workers > cpus else ''}, bound {bound:.2f}s "
+                  f"x{serial_seconds / bound:.2f} on {workers} free cores, same as workers={args.workers[0]}: {same}")
+            if not same:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Shutdown time and task leaks of TdStreamerClient, against the local stub streamer.
+
+In one asyncio.run loop, --clients clients at once each enter
+`async with TdStreamerClient(...)` with a handler, a feed monitor and a
+recording on, take --seconds of pushed frames and leave the block; this is
+repeated --rounds times. Reports how long leaving the block takes and checks
+that no task is left behind in the loop afterwards. Then runs the blocking
+stream() in a thread and times how long it takes to return once the server
+drops the connection. Exits non-zero on a failed check.
+
+Usage:
+----
+    python benchmarks/bench_shutdown.py [--clients 3] [--rounds 5] [--seconds 0.5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stream import TdStreamerClient  # noqa: E402
+from ws_stub import StubStreamer, principal_data, credentials  # noqa: E402
+
+
+def new_client(stub):
+    client = TdStreamerClient(websocket_url="stub", principal_data=principal_data(), credentials=credentials())
+    client.websocket_url = stub.url
+    return client
+
+
+async def pusher(stub, stop):
+    seq = 0
+    while not stop.is_set():
+        seq += 1
+        frame = {"data": [{"service": "CHART_EQUITY", "timestamp": int(time.time() * 1000), "command": "SUBS",
+                           "content": [{"seq": seq, "key": "SPY", "1": 400.0, "2": 401.0, "3": 399.0,
+                                        "4": 400.5, "5": 1000, "6": seq}]}]}
+        await stub.push(json.dumps(frame), subscribed_only=True)
+        await asyncio.sleep(.002)
+
+
+async def session(stub, directory, number, seconds, exits, counts):
+    received = []
+
+    async def on_chart(content):
+        received.append(content['seq'])
+
+    client = new_client(stub)
+    client.chart(["SPY"])
+    client.on('CHART_EQUITY', on_chart)
+    client.monitor_feed(interval=.05)
+    client.record(os.path.join(directory, f"client{number}.tdrec"))
+    async with client:
+        await asyncio.sleep(seconds)
+        started = time.perf_counter()
+    exits.append(time.perf_counter() - started)
+    counts.append(len(received))
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seconds", type=float, default=.5)
+    args = parser.parse_args()
+
+    stub = await StubStreamer().start()
+    failures, exits, counts = [], [], []
+    with tempfile.TemporaryDirectory() as directory:
+        for _ in range(args.rounds):
+            stop = asyncio.Event()
+            pushing = asyncio.ensure_future(pusher(stub, stop))
+            await asyncio.gather(*[session(stub, directory, n, args.seconds, exits, counts)
+                                   for n in range(args.clients)])
+            stop.set()
+            await pushing
+            # let the stub's handlers see the closes
+            await asyncio.sleep(.05)
+            leaked = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()
+                      and "StubStreamer" not in repr(task.get_coro())]
+            if leaked:
+                failures.append(f"{len(leaked)} tasks left after a round: {leaked[:3]}")
+    if min(counts) == 0:
+        failures.append("a client received nothing")
+    exits.sort()
+    print(f"{args.rounds} rounds x {args.clients} clients in one loop, {statistics.mean(counts):.0f} frames "
+          f"handled per client")
+    print(f"async with exit: p50 {statistics.median(exits) * 1e3:.1f} ms, max {exits[-1] * 1e3:.1f} ms")
+
+    # the blocking API, on its own loop in a thread
+    client = new_client(stub)
+    client.chart(["SPY"])
+    stop = asyncio.Event()
+    pushing = asyncio.ensure_future(pusher(stub, stop))
+    streaming = asyncio.get_running_loop().run_in_executor(None, client.stream, False)
+    while not stub.subscribed:
+        await asyncio.sleep(.01)
+    await asyncio.sleep(args.seconds)
+    dropped = time.perf_counter()
+    stub.drop()
+    await streaming
+    returned = time.perf_counter() - dropped
+    stop.set()
+    await pushing
+    await stub.stop()
+    print(f"stream() returned {returned * 1e3:.1f} ms after the server dropped the connection")
+    if returned > 1:
+        failures.append(f"stream() took {returned:.1f}s to return")
+
+    if failures:
+        print("FAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("all checks passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
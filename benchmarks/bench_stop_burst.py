@@ -0,0 +1,148 @@
+"""How many stream messages wait behind a stop-move burst.
+
+A feeder thread pushes a stream message onto the event loop every millisecond,
+the way the websocket would. Halfway through, a Limit Sell fill triggers the
+"move every Stop Sell to break-even" burst against a local orders stub that
+answers each PUT after --put-ms. The burst runs in its own task, next to the
+task draining the stream, so only a frozen event loop can hold messages back.
+"blocking" replays the old requests.put loop, "async" goes through
+LiveT.process_key. A message counts as waiting when it sat in the queue for
+longer than --threshold-ms before being handled. Each mode runs --rounds
+times; the median and the worst round are reported. livetrade needs a
+config.py on the path; sounds are skipped where there is no winsound.
+
+Usage:
+----
+    python benchmarks/bench_stop_burst.py [--size 6] [--put-ms 40] [--threshold-ms 2] [--rounds 5]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import livetrade  # noqa: E402
+
+SYMBOL = "SPXW_121622C4000"
+MESSAGES = 500
+
+
+class StubOrders(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    put_delay = 0.0
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_PUT(self):
+        length = int(self.headers.get('Content-Length', 0))
+        if length:
+            self.rfile.read(length)
+        time.sleep(self.put_delay)
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def blocking_stop_move(trader, price, symbol):
+    # the pre-async path: one requests.put after another, on the event loop thread
+    position = trader.positions.latest()
+    trader.positions.discard("SS0")
+    for key in position.keys['Stop']['Sell'].copy():
+        requests.put(url=f"{livetrade.PO_ENDPOINT}/{key}", headers=trader.header, json={"stopPrice": price, "symbol": symbol})
+        trader.positions.discard(key)
+
+
+def open_position(trader, size):
+    # the messages in stream order: the Limit Buy fills before its OCO children are entered,
+    # then one contract's Limit Sell fills and its sibling stop SS0 is about to be canceled
+    positions = trader.positions
+    positions.open(SYMBOL)
+    positions.apply("EntryRequest", "Limit", "Buy", "LB0", "1.00", SYMBOL, size)
+    positions.apply("Fill", "Limit", "Buy", "LB0", "1.00", SYMBOL, size)
+    for i in range(size):
+        positions.apply("EntryRequest", "Limit", "Sell", f"LS{i}", "1.50", SYMBOL, size)
+        positions.apply("EntryRequest", "Stop", "Sell", f"SS{i}", "0.50", SYMBOL, size)
+    positions.apply("Fill", "Limit", "Sell", "LS0", "1.50", SYMBOL, size)
+    position = positions.latest()
+    if position is None or len(position.keys['Stop']['Sell']) != size:
+        sys.exit(f"position not set up for the burst: {position}")
+
+
+async def run(mode, size, threshold):
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    trader = livetrade.LiveT()
+    trader.header = {"Authorization": "Bearer stub"}
+    open_position(trader, size)
+    await trader.open_session()
+
+    def feed():
+        for seq in range(MESSAGES):
+            loop.call_soon_threadsafe(queue.put_nowait, (seq, time.perf_counter()))
+            time.sleep(.001)
+        loop.call_soon_threadsafe(queue.put_nowait, (None, None))
+
+    async def burst():
+        if mode == "blocking":
+            blocking_stop_move(trader, "0.70", SYMBOL)
+        else:
+            await trader.process_key("UROUT", "Stop", "Sell", "SS0", "0.70", SYMBOL)
+
+    threading.Thread(target=feed, daemon=True).start()
+    waited, worst, burst_task = 0, 0.0, None
+    while True:
+        seq, sent = await queue.get()
+        if seq is None:
+            break
+        wait = time.perf_counter() - sent
+        worst = max(worst, wait)
+        if wait > threshold:
+            waited += 1
+        if seq == MESSAGES // 2:
+            burst_task = asyncio.ensure_future(burst())
+    await burst_task
+    await trader.close_session()
+    return waited, worst * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=6)
+    parser.add_argument("--put-ms", type=float, default=40.0)
+    parser.add_argument("--threshold-ms", type=float, default=2.0)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    livetrade.SIZE = args.size
+    StubOrders.put_delay = args.put_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOrders)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    livetrade.PO_ENDPOINT = f"http://127.0.0.1:{server.server_address[1]}/orders"
+
+    print(f"{args.size - 1} concurrent Stop Sell moves per burst, each PUT takes {args.put_ms}ms, "
+          f"{args.rounds} rounds")
+    for mode in ("blocking", "async"):
+        rounds = [asyncio.run(run(mode, args.size, args.threshold_ms / 1000)) for _ in range(args.rounds)]
+        waited = [result[0] for result in rounds]
+        worst = [result[1] for result in rounds]
+        print(f"{mode:>8}: median {statistics.median(waited):5.0f}/{MESSAGES} messages waited > {args.threshold_ms}ms "
+              f"(max {max(waited)}), worst wait median {statistics.median(worst):7.2f}ms (max {max(worst):7.2f}ms)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Merged throughput of StreamPool at 1 to 4 connections, against local stub streamers.
+
+Each connection logs in to its own StubStreamer (a different account of
+the same login) and the pool spreads --symbols OPTION symbols over them.
+Every stub then pushes its share of --frames frames, --per-frame entries of
+its own symbols each, as fast as the socket takes them. Each count is run
+again with one more connection whose stub never pushes, like a session
+that only carries ACCT_ACTIVITY. Reports frames and entries per second out
+of pool.frames(), how many frames the ordering held up for max_delay and
+the p50/p99 delay from a frame's server timestamp to its way out (ms
+timestamps). Checks that every symbol went to exactly one connection,
+every frame came out once, the output is in server time order and an idle
+connection doesn't hold the others back. Exits non-zero on a failed check.
+The stubs run in the same process, so on few cores they take CPU from the
+client.
+
+Usage:
+----
+    python benchmarks/bench_streampool.py [--frames 20000] [--symbols 1200] [--per-frame 20] [--connections 1,2,3,4]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stream import TdStreamerClient  # noqa: E402
+from streampool import StreamPool  # noqa: E402
+from ws_stub import StubStreamer, principal_data, credentials  # noqa: E402
+
+
+def subscribed_symbols(stub):
+    symbols = []
+    for request in stub.session_requests:
+        if request.get("command") in ("SUBS", "ADD"):
+            symbols.extend(request["parameters"]["keys"].split(","))
+    return symbols
+
+
+async def pusher(stub, frames, per_frame):
+    symbols = subscribed_symbols(stub)
+    for n in range(frames):
+        content = [{"key": symbols[(n * per_frame + i) % len(symbols)], "2": 1.05, "3": 1.10, "4": 10, "5": 12}
+                   for i in range(per_frame)]
+        frame = {"data": [{"service": "OPTION", "timestamp": int(time.time() * 1000), "command": "SUBS",
+                           "content": content}]}
+        await stub.push(json.dumps(frame))
+        # a local send doesn't suspend, let the other stubs send too, as separate servers would
+        await asyncio.sleep(0)
+    return symbols
+
+
+async def run(connections, idle, args, symbols):
+    stubs = [await StubStreamer().start() for _ in range(connections + idle)]
+    clients = []
+    for account, stub in enumerate(stubs):
+        client = TdStreamerClient(websocket_url="stub", principal_data=principal_data(), credentials=credentials(),
+                                  account=account % len(principal_data()["accounts"]))
+        client.websocket_url = stub.url
+        clients.append(client)
+    pool = StreamPool(clients)
+    pool.subscribe("OPTION", symbols, fields=[0, 2, 3, 4, 5])
+    failures = []
+    label = f"{connections} connections" + (f" + {idle} idle" if idle else "")
+
+    async with pool:
+        # wait for every SUBS to be answered
+        received = 0
+        async for index, message in pool.frames():
+            received += 'response' in message
+            if received == len(stubs):
+                break
+        share = [args.frames // connections + (n < args.frames % connections) for n in range(connections)] + [0] * idle
+        started = time.perf_counter()
+        pushing = asyncio.gather(*[pusher(stub, count, args.per_frame) for stub, count in zip(stubs, share)])
+        frames = entries = 0
+        per_connection = [0] * len(stubs)
+        last = disorder = 0
+        delays = []
+        async for index, message in pool.frames():
+            if 'data' not in message:
+                continue
+            frames += 1
+            per_connection[index] += 1
+            entries += len(message['data'][0]['content'])
+            timestamp = message['data'][0]['timestamp']
+            delays.append(time.time() * 1000 - timestamp)
+            disorder += timestamp < last
+            last = max(last, timestamp)
+            if frames == args.frames:
+                break
+        elapsed = time.perf_counter() - started
+        spread = await pushing
+        metrics = pool.metrics()
+    for stub in stubs:
+        await stub.stop()
+
+    everywhere = [symbol for share in spread for symbol in share]
+    if sorted(everywhere) != sorted(symbols):
+        failures.append(f"{label}: symbols not spread exactly once")
+    if per_connection != share:
+        failures.append(f"{label}: got {per_connection} frames per connection, sent {share}")
+    if disorder:
+        failures.append(f"{label}: {disorder} frames out of server time order")
+    delays.sort()
+    p50, p99 = statistics.median(delays), delays[int(len(delays) * .99)]
+    if idle and metrics['forced'] > frames // 100:
+        failures.append(f"{label}: {metrics['forced']} frames held for max_delay by the idle connection")
+    print(f"{label:>24} {frames / elapsed:>10,.0f} {entries / elapsed:>12,.0f} {metrics['forced']:>7} "
+          f"{p50:>8.1f} {p99:>8.1f} {'/'.join(str(len(share)) for share in spread):>18}")
+    return failures
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=20000)
+    parser.add_argument("--symbols", type=int, default=1200)
+    parser.add_argument("--per-frame", type=int, default=20)
+    parser.add_argument("--connections", default="1,2,3,4")
+    args = parser.parse_args()
+
+    symbols = [f"SPY_1216{22 + n // 1000}C{300 + n % 1000}" for n in range(args.symbols)]
+    print(f"{'connections':>24} {'frames/s':>10} {'entries/s':>12} {'forced':>7} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'symbols per conn':>18}")
+    failures = []
+    for connections in (int(n) for n in args.connections.split(",")):
+        for idle in (0, 1):
+            failures.extend(await run(connections, idle, args, symbols))
+    if failures:
+        print("FAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("all checks passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+"""Frames and bytes per subscription change, against the local stub streamer.
+
+Subscribes --symbols OPTION contracts with every field, then adds --added
+more, both through TdStreamerClient's builders, and reports what the stub
+received for each step. The last line is what growing the subscription would
+have cost as a full resubscribe of every symbol, for comparison. Then checks
+that adding a symbol without fields to a custom-field subscription sends a
+single ADD with the custom fields. Exits non-zero on a failed check.
+
+Usage:
+----
+    python benchmarks/bench_subscriptions.py [--symbols 1000] [--added 50]
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stream import TdStreamerClient  # noqa: E402
+from ws_stub import StubStreamer, principal_data, credentials  # noqa: E402
+
+
+def option_symbols(count, start=0):
+    return [f"SPXW_1216{22 + (n // 800) % 5}{'CP'[n % 2]}{3000 + (n // 2) % 400 * 5}" for n in range(start, start + count)]
+
+
+def client_for(stub):
+    client = TdStreamerClient(websocket_url="stub", principal_data=principal_data(), credentials=credentials())
+    client.websocket_url = stub.url
+    client.print_to_console = False
+    return client
+
+
+async def step(stub, client, label, action):
+    stub.reset_counts()
+    requests = action()
+    if await client.send_subscriptions():
+        # wait for the stub's response so its counts are complete
+        await client._receive_message(return_value=True)
+    print(f"{label:<32} {requests:>8} {stub.frames:>7} {stub.bytes:>10,}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", type=int, default=1000)
+    parser.add_argument("--added", type=int, default=50)
+    args = parser.parse_args()
+
+    stub = await StubStreamer().start()
+    client = client_for(stub)
+    await client._connect()
+
+    print(f"{'change':<32} {'requests':>8} {'frames':>7} {'bytes':>10}")
+    first = option_symbols(args.symbols)
+    added = option_symbols(args.added, start=args.symbols)
+    await step(stub, client, f"SUBS {args.symbols} symbols", lambda: client.level_one_options(first))
+    await step(stub, client, f"ADD {args.added} symbols", lambda: client.level_one_options(added))
+    await step(stub, client, "re-add already subscribed", lambda: client.level_one_options(first[:10]))
+
+    # the same growth as a full resubscribe, on a fresh client
+    other = client_for(stub)
+    await other._connect()
+    await step(stub, other, f"full SUBS {args.symbols + args.added} symbols",
+               lambda: other.level_one_options(first + added))
+
+    # growing a custom-field subscription without restating the fields keeps them
+    custom = client_for(stub)
+    await custom._connect()
+    custom.level_one_options(first[:10], fields=[0, 2, 3, 41])
+    await custom.send_subscriptions()
+    await custom._receive_message(return_value=True)
+    sent = len(stub.session_requests)
+    await step(stub, custom, "ADD 1 symbol, custom fields", lambda: custom.level_one_options(added[:1]))
+    requests = [(request['command'], request['parameters']['keys'], request['parameters']['fields'])
+                for request in stub.session_requests[sent:]]
+
+    await client.connection.close()
+    await other.connection.close()
+    await custom.connection.close()
+    await stub.stop()
+    if requests != [("ADD", added[0], "0,2,3,41")]:
+        print(f"FAILED:\n  adding a symbol to a custom-field subscription sent {requests}")
+        sys.exit(1)
+    print("all checks passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+"""Combinations per second of the vectorized bracket sweep.
+
+Generates --trades price paths after an entry (--steps quotes each, a random
+walk with fat-tailed moves like a 0DTE contract's), checks a sample of
+combinations against a plain one-contract-at-a-time simulation, then sweeps
+the default grid (stop x ladder x size x BE move) with each worker count and
+prints the ranked table and where the live bracket ranks.
+
+Usage:
+----
+    python benchmarks/bench_sweep.py [--trades 500] [--steps 2000] [--workers 1 2 4] [--seed 11]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sweep  # noqa: E402
+
+
+def generate(trades, steps, seed):
+    rng = np.random.default_rng(seed)
+    entries = np.round(rng.uniform(.5, 8, trades), 2)
+    moves = rng.standard_t(3, (trades, steps)) * rng.uniform(.002, .01, (trades, 1))
+    moves[:, 0] = 0
+    paths = entries[:, None] * np.exp(np.cumsum(moves, axis=1))
+    return paths, entries
+
+
+def reference(path, entry, stop, ladder, size, be_move):
+    # one trade through the bracket the slow way, step by step
+    exits = [None] * size
+    stop_level = stop * entry
+    first_filled = False
+    for price in path:
+        for i in range(size):
+            if exits[i] is None and price >= ladder[i] * entry:
+                exits[i] = ladder[i] * entry
+                first_filled = True
+        if not first_filled and price <= stop_level:
+            return sum(min(price, stop_level) - entry for _ in range(size)) * sweep.CONTRACT_MULTIPLIER
+        if first_filled:
+            moved = stop * be_move * entry
+            if price <= moved:
+                for i in range(size):
+                    if exits[i] is None:
+                        exits[i] = min(price, moved)
+        if all(exit is not None for exit in exits):
+            break
+    return sum((path[-1] if exit is None else exit) - entry for exit in exits) * sweep.CONTRACT_MULTIPLIER
+
+
+def check(paths, entries, rows, samples, seed):
+    rng = random.Random(seed)
+    for stop, ladder, size, be_move, pnl, *_ in rng.sample(rows, samples):
+        expected = sum(reference(path, entry, stop, ladder, size, be_move) for path, entry in zip(paths, entries))
+        if abs(expected - pnl) > 1e-6 * max(1.0, abs(expected)):
+            sys.exit(f"MISMATCH stop={stop} ladder={ladder} size={size} be={be_move}: {pnl} != {expected}")
+    print(f"{samples} sampled combinations match the step-by-step simulation")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trades", type=int, default=500)
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--samples", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    paths, entries = generate(args.trades, args.steps, args.seed)
+    rows = None
+    for workers in args.workers:
+        started = time.perf_counter()
+        result = sweep.sweep(paths, entries, workers=workers)
+        elapsed = time.perf_counter() - started
+        print(f"workers={workers}: {len(result)} combinations x {args.trades} trades in {elapsed:.2f}s, "
+              f"{len(result) / elapsed:,.0f} combinations/s")
+        if rows is not None and result != rows:
+            sys.exit(f"workers={workers} ranks differently from workers={args.workers[0]}")
+        rows = result
+
+    check(paths, entries, rows, args.samples, args.seed)
+    print(sweep.format_table(rows, 10))
+    live_ladder = tuple(sweep.LIVE_SCALE[:sweep.LIVE_SIZE])
+    for rank, row in enumerate(rows, 1):
+        if (row[0], row[2], row[3]) == (sweep.LIVE_STOP, sweep.LIVE_SIZE, sweep.LIVE_BE_MOVE) and \
+                np.allclose(row[1], live_ladder):
+            print(f"live bracket ranks {rank} of {len(rows)}: pnl {row[4]:.2f}, max dd {row[6]:.2f}, hit {row[7]:.1%}")
+
+
+if __name__ == "__main__":
+    main()
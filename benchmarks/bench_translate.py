@@ -0,0 +1,124 @@
+"""Field translation throughput on a LEVELONE_OPTION firehose.
+
+"dict walk" renames each content entry field by field through the nested
+csv_keys_dictionary, the way a consumer would by hand. "records" is
+FieldTranslator.records, one namedtuple per entry. "int slots" is the same
+with an int-indexed slot table instead of the slots dict, int() on each
+numeric key, the alternative records() was measured against. Records carry
+every field and the walk only those sent, so records are not expected to be
+faster, only not much slower. "columns" decodes all the
+frames' data at once into column buffers with decode_columns. Frames are
+decoded with the default codec up front, only translation is timed. The
+variants take turns within each of --rounds rounds and the best round of
+each is reported, with its rate relative to the dict walk.
+
+Usage:
+----
+    python benchmarks/bench_translate.py [--frames 20000] [--rounds 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from codec import DEFAULT_CODEC  # noqa: E402
+from fields import CSV_FIELD_KEYS  # noqa: E402
+from translate import TRANSLATORS, decode_columns, field_identifier, _new_tuple  # noqa: E402
+import firehose  # noqa: E402
+
+
+def dict_walk(data):
+    out = []
+    for entry in data:
+        service = entry['service']
+        out.append([{CSV_FIELD_KEYS[service][k]: v for k, v in item.items()} for item in entry['content']])
+    return out
+
+
+def records(data):
+    return [TRANSLATORS[entry['service']].records(entry['content']) for entry in data]
+
+
+def int_slot_tables():
+    # service -> (slot per numeric raw key, indexed by int(raw), slots of the named keys)
+    tables = {}
+    for service, translator in TRANSLATORS.items():
+        numeric = [int(raw) for raw in translator.slots if raw.isdigit()]
+        index = [None] * (max(numeric, default=-1) + 1)
+        named = {}
+        for raw, slot in translator.slots.items():
+            if raw.isdigit():
+                index[int(raw)] = slot
+            else:
+                named[raw] = slot
+        tables[service] = index, named
+    return tables
+
+
+INT_SLOTS = int_slot_tables()
+
+
+def int_slots(data):
+    out = []
+    for entry in data:
+        translator = TRANSLATORS[entry['service']]
+        index, named = INT_SLOTS[entry['service']]
+        record_type, defaults = translator.record_type, translator.defaults
+        recs = []
+        for item in entry['content']:
+            values = list(defaults)
+            for raw, value in item.items():
+                if raw.isdigit():
+                    values[index[int(raw)]] = value
+                else:
+                    slot = named.get(raw)
+                    if slot is not None:
+                        values[slot] = value
+            recs.append(_new_tuple(record_type, values))
+        out.append(recs)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=20_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    messages = [DEFAULT_CODEC.loads(frame) for frame in firehose.generate(args.frames)]
+    entries = sum(len(entry['content']) for message in messages for entry in message['data'])
+    print(f"{len(messages)} frames, {entries} content entries")
+
+    # same values either way
+    for message in messages[:200]:
+        assert records(message['data']) == int_slots(message['data'])
+        for walked, recs in zip(dict_walk(message['data']), records(message['data'])):
+            for named, record in zip(walked, recs):
+                assert all(getattr(record, field_identifier(name)) == value for name, value in named.items())
+
+    data = [entry for message in messages for entry in message['data']]
+    assert len(decode_columns(data)['OPTION']['mark']) == entries
+
+    def per_message(func):
+        def run():
+            for message in messages:
+                func(message['data'])
+        return run
+
+    variants = (("dict walk", per_message(dict_walk)), ("records", per_message(records)),
+                ("int slots", per_message(int_slots)), ("columns", lambda: decode_columns(data)))
+    best = [0.0] * len(variants)
+    for _ in range(args.rounds):
+        for i, (_, run) in enumerate(variants):
+            start = time.perf_counter()
+            run()
+            best[i] = max(best[i], entries / (time.perf_counter() - start))
+    for (label, _), rate in zip(variants, best):
+        print(f"{label:<10} {rate:>12,.0f} entries/s {rate / best[0]:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Field validation cost when subscribing 1,000 symbols to every field.
+
+Each symbol gets its own subscription whose field list (all fields of the
+service, by name) is validated, the way a per-symbol QUOTE or OPTION request
+is built. "old" is _validate_argument before subscriptions.py, rebuilding the
+key and value lists and calling list.index for every field. "new" is
+validate_fields on the precomputed id/name indexes. Both must return the same
+ids.
+
+Usage:
+----
+    python benchmarks/bench_validate.py [--symbols 1000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fields import STREAM_FIELD_IDS  # noqa: E402
+from subscriptions import validate_fields  # noqa: E402
+
+
+def legacy_validate(argument, endpoint):
+    arg_list = []
+    for arg in argument:
+        arg_str = str(arg)
+        key_list = list(STREAM_FIELD_IDS[endpoint].keys())
+        val_list = list(STREAM_FIELD_IDS[endpoint].values())
+        if arg_str in key_list:
+            arg_list.append(arg_str)
+        elif arg_str in val_list:
+            key_value = key_list[val_list.index(arg_str)]
+            arg_list.append(key_value)
+    return arg_list
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", type=int, default=1000)
+    args = parser.parse_args()
+
+    print("endpoint            fields   old (ms)   new (ms)   speedup")
+    for endpoint in ("level_one_quote", "level_one_option"):
+        names = list(STREAM_FIELD_IDS[endpoint].values())
+        assert legacy_validate(names, endpoint) == validate_fields(names, endpoint)
+        timings = []
+        for func in (legacy_validate, validate_fields):
+            start = time.perf_counter()
+            for _ in range(args.symbols):
+                func(names, endpoint)
+            timings.append((time.perf_counter() - start) * 1e3)
+        old, new = timings
+        print(f"{endpoint:<18} {len(names):>7} {old:>10.1f} {new:>10.1f} {old / new:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
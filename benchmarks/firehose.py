@@ -0,0 +1,101 @@
+"""A LEVELONE_OPTION firehose, as TD streams it, for the stream benchmarks.
+
+generate() returns text frames shaped like the ones TdStreamerClient receives
+for an OPTION subscription: a "data" list with one OPTION entry whose
+"content" holds one dict per contract. The first update of each contract
+carries every field in fields.py's level_one_option, later ones only the
+quote fields that changed (bid/ask/last/mark, sizes, greeks, volume), as TD
+sends them. A share of frames can carry the bare U+FFFD values TD sometimes
+sends in place of a number. load() reads frames recorded one per line.
+"""
+import json
+import random
+
+UNDERLYING = "SPXW"
+STRIKES = range(3800, 4200, 5)
+EXPIRY = "121622"
+# more expiries for symbol counts beyond one chain
+EXPIRIES = [EXPIRY] + [f"{month:02d}{day:02d}23" for month in range(1, 13) for day in (2, 6, 9, 13, 16, 20, 23, 27)]
+
+# fields that move between updates, by level_one_option id
+MOVING = ("2", "3", "4", "8", "10", "20", "21", "22", "23", "29", "32", "33", "34", "35", "39", "41")
+
+
+def contracts(count):
+    symbols = []
+    for expiry in EXPIRIES:
+        for strike in STRIKES:
+            for side in "CP":
+                symbols.append(f"{UNDERLYING}_{expiry}{side}{strike}")
+        if len(symbols) >= count:
+            break
+    return symbols[:count]
+
+
+def full_quote(rng, symbol):
+    strike = int(symbol[-4:])
+    side = symbol[len(UNDERLYING) + 7]
+    bid = round(rng.uniform(.05, 40), 2)
+    return {
+        "key": symbol, "delayed": False, "1": f"SPXW Dec 16 2022 {strike} {'Call' if side == 'C' else 'Put'} (Weekly)",
+        "2": bid, "3": round(bid + .1, 2), "4": round(bid + .05, 2), "5": round(bid * 1.5, 2), "6": round(bid * .5, 2),
+        "7": round(bid * 1.1, 2), "8": rng.randint(0, 50000), "9": rng.randint(0, 20000),
+        "10": round(rng.uniform(5, 40), 4), "11": 53722, "12": 53721, "13": round(rng.uniform(-50, 50), 2),
+        "14": 19342, "15": 19342, "16": 2022, "17": 100.0, "18": 2, "19": round(bid * 1.05, 2),
+        "20": rng.randint(1, 500), "21": rng.randint(1, 500), "22": rng.randint(1, 20), "23": round(rng.uniform(-5, 5), 2),
+        "24": float(strike), "25": side, "26": "$SPX.X", "27": 12, "28": "", "29": round(rng.uniform(0, 5), 2),
+        "30": 16, "31": 0, "32": round(rng.uniform(-1, 1), 4), "33": round(rng.uniform(0, .05), 4),
+        "34": round(rng.uniform(-5, 0), 4), "35": round(rng.uniform(0, .5), 4), "36": round(rng.uniform(-.1, .1), 4),
+        "37": "Normal", "38": round(bid + .04, 3), "39": round(rng.uniform(3900, 4100), 2), "40": "P",
+        "41": round(bid + .05, 2),
+    }
+
+
+def update(rng, quote):
+    changed = {"key": quote["key"], "delayed": False}
+    for field in rng.sample(MOVING, rng.randint(2, 6)):
+        value = quote[field]
+        if isinstance(value, float):
+            value = round(max(.01, value + rng.uniform(-.2, .2)), 2)
+        else:
+            value = max(0, value + rng.randint(-3, 5))
+        quote[field] = changed[field] = value
+    return changed
+
+
+def generate(frames=20_000, symbols=200, per_frame=8, bad_every=0, seed=11):
+    """Returns `frames` JSON text frames over `symbols` contracts, `per_frame`
+    contracts per frame. Every `bad_every`th frame (0: none) has its first
+    changed number replaced with a bare U+FFFD."""
+
+    rng = random.Random(seed)
+    books = {}
+    keys = contracts(symbols)
+    out = []
+    timestamp = 1671207322000
+    for n in range(frames):
+        content = []
+        for symbol in rng.sample(keys, per_frame):
+            if symbol in books:
+                content.append(update(rng, books[symbol]))
+            else:
+                books[symbol] = full_quote(rng, symbol)
+                content.append(dict(books[symbol]))
+        timestamp += rng.randint(1, 40)
+        frame = json.dumps({"data": [{"service": "OPTION", "timestamp": timestamp, "command": "SUBS",
+                                      "content": content}]})
+        if bad_every and n % bad_every == 0:
+            # TD's bad frames: a raw replacement character where a number should be
+            head, sep, tail = frame.partition('"delayed": false, "')
+            field, colon, rest = tail.partition('": ')
+            rest = rest[min(i for i in (rest.find(","), rest.find("}")) if i != -1):]
+            frame = head + sep + field + colon + "\ufffd" + rest
+        out.append(frame)
+    return out
+
+
+def load(path):
+    """Frames recorded one JSON message per line."""
+
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return [line.rstrip("\n") for line in f if line.strip()]
@@ -0,0 +1,114 @@
+"""Replays ~10k interleaved fills and cancels across 50 open positions.
+
+Each position is a bracket entry, sized so the interleaved part comes to about
+--messages in total. Its OrderEntryRequests
+arrive right after it is opened, the same way they follow a bracket POST.
+Everything after that (Limit Buy fills, target and stop fills with their OCO
+cancels, replacement stops after the break-even move) is shuffled across
+positions, keeping each position's own messages in order. The replay checks
+that every message lands on the right position, that break-even fires exactly
+where it should, and that every position ends up closed.
+
+Usage:
+----
+    python benchmarks/stress_positions.py [--positions 50] [--messages 10000] [--seed 3]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from positions import PositionIndex, BREAK_EVEN, CLOSED  # noqa: E402
+
+
+def position_messages(rng, n, size):
+    """Returns (entries, rest, break_even_stops) for position n."""
+
+    symbol = f"SYM{n}_121622C{4000 + n}"
+    entries, rest = [], []
+    for i in range(size):
+        entries.append(("EntryRequest", "Limit", "Buy", f"{n}-LB{i}", "1.00", symbol))
+        entries.append(("EntryRequest", "Limit", "Sell", f"{n}-LS{i}", "1.10", symbol))
+        entries.append(("EntryRequest", "Stop", "Sell", f"{n}-SS{i}", "0.70", symbol))
+    for i in range(size):
+        rest.append(("Fill", "Limit", "Buy", f"{n}-LB{i}", "1.00", symbol))
+
+    outcomes = [rng.random() < .5 for _ in range(size)]  # True: target hit, False: stopped out
+    stop_key = {i: f"{n}-SS{i}" for i in range(size)}
+    break_even_stops = set()
+    for i, target in enumerate(outcomes):
+        if target:
+            rest.append(("Fill", "Limit", "Sell", f"{n}-LS{i}", "1.10", symbol))
+            rest.append(("UROUT", "Stop", "Sell", stop_key[i], "0.70", symbol))
+        else:
+            rest.append(("Fill", "Stop", "Sell", stop_key[i], "0.70", symbol))
+            rest.append(("UROUT", "Limit", "Sell", f"{n}-LS{i}", "1.10", symbol))
+        if i == 0 and target and size > 1:
+            # first contract hit its target: the other stops get replaced at break-even
+            break_even_stops = {f"{n}-SS{j}" for j in range(1, size)}
+            for j in range(1, size):
+                stop_key[j] = f"{n}-BE{j}"
+                rest.append(("EntryRequest", "Stop", "Sell", stop_key[j], "0.95", symbol))
+    return symbol, entries, rest, break_even_stops
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--positions", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # about 3.5 interleaved messages per contract: buy fill, exit fill, OCO cancel, sometimes a replacement stop
+    size = max(2, math.ceil(args.messages / args.positions / 3.5))
+    index = PositionIndex()
+    owners, pending, expected_be = {}, [], {}
+    entries_count = 0
+    for n in range(args.positions):
+        symbol, entries, rest, break_even_stops = position_messages(rng, n, size)
+        position = index.open(symbol)
+        owners[symbol] = position
+        expected_be[symbol] = break_even_stops
+        for message in entries:
+            index.apply(*message, size)
+        entries_count += len(entries)
+        pending.append(list(reversed(rest)))
+
+    # interleave the rest, each position's messages stay in order
+    replay = []
+    while pending:
+        queue = rng.choice(pending)
+        replay.append(queue.pop())
+        if not queue:
+            pending.remove(queue)
+
+    seen_be = {}
+    start = time.perf_counter()
+    for message in replay:
+        activity, _, _, orderkey, _, symbol = message
+        if activity != "EntryRequest":
+            owner = index.lookup(orderkey)
+            assert owner is owners[symbol], f"{orderkey} attributed to {owner and owner.symbol}, expected {symbol}"
+        position, stop_keys = index.apply(*message, size)
+        if stop_keys:
+            assert position.state == BREAK_EVEN and symbol not in seen_be
+            seen_be[symbol] = stop_keys
+    elapsed = time.perf_counter() - start
+
+    assert {symbol: keys for symbol, keys in expected_be.items() if keys} == seen_be
+    assert all(position.state == CLOSED for position in owners.values())
+    assert len(index) == 0 and not index.by_key and not index.by_symbol
+
+    total = entries_count + len(replay)
+    print(f"{args.positions} positions x {size} contracts: {total} messages, {len(replay)} replayed interleaved")
+    print(f"break-even moves: {len(seen_be)}, all attributions and final states correct")
+    print(f"{len(replay) / elapsed:,.0f} messages/s ({elapsed / len(replay) * 1e6:.2f}us/message)")
+
+
+if __name__ == "__main__":
+    main()
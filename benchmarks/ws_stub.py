@@ -0,0 +1,122 @@
+"""A local stand-in for the TD streamer websocket.
+
+StubStreamer answers the ADMIN LOGIN and every request with a code 0
+response, the way the real server does, and counts the frames and bytes it
+receives. Point a TdStreamerClient at it with client.websocket_url =
+stub.url. drop() cuts every connection the way a network failure does and
+accepting = False turns new connections away, for reconnect tests.
+freeze() stops reading from the clients, so their pings go unanswered, for
+liveness tests. Needs
+the websockets package, like stream.py.
+"""
+import json
+import time
+
+import websockets
+
+
+def principal_data():
+    """The parts of the user principals response TdStreamerClient reads."""
+
+    return {
+        "accounts": [{"accountId": "123456789"}, {"accountId": "987654321"}],
+        "streamerInfo": {"appId": "stub", "token": "token"},
+        "streamerSubscriptionKeys": {"keys": [{"key": "ab12cd34ef56"}]},
+    }
+
+
+def credentials():
+    return {"userid": "123456789", "token": "token", "company": "AMER", "segment": "ADVNCED",
+            "cddomain": "A000000012345678", "usergroup": "ACCT", "accesslevel": "ACCT", "authorized": "Y",
+            "timestamp": 0, "appid": "stub", "acl": "AK"}
+
+
+def response(request, code=0, msg="ok"):
+    return {"service": request.get("service"), "requestid": str(request.get("requestid")),
+            "command": request.get("command"), "timestamp": int(time.time() * 1000),
+            "content": {"code": code, "msg": msg}}
+
+
+class StubStreamer:
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.server = None
+        self.frames = 0
+        self.bytes = 0
+        self.requests = []
+        self.connections = set()
+        # connections that sent a SUBS or ADD, and the requests of the newest connection
+        self.subscribed = set()
+        self.session_requests = []
+        self.sessions = 0
+        self.accepting = True
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}/ws"
+
+    async def start(self):
+        self.server = await websockets.serve(self.handler, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def reset_counts(self):
+        self.frames = 0
+        self.bytes = 0
+
+    async def handler(self, websocket, path=None):
+        if not self.accepting:
+            websocket.transport.abort()
+            return
+        self.connections.add(websocket)
+        self.sessions += 1
+        self.session_requests = session = []
+        try:
+            async for message in websocket:
+                if message == "ping":
+                    continue
+                self.frames += 1
+                self.bytes += len(message.encode() if isinstance(message, str) else message)
+                requests = json.loads(message).get("requests", [])
+                self.requests.extend(requests)
+                session.extend(requests)
+                if any(request.get("command") in ("SUBS", "ADD") for request in requests):
+                    self.subscribed.add(websocket)
+                await websocket.send(json.dumps({"response": [response(request) for request in requests]}))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            self.connections.discard(websocket)
+            self.subscribed.discard(websocket)
+
+    def drop(self):
+        """Cuts every connection without a close handshake."""
+
+        for websocket in list(self.connections):
+            websocket.transport.abort()
+
+    def freeze(self):
+        """Stops reading from every connection: frames still go out, pings get no pong."""
+
+        for websocket in list(self.connections):
+            websocket.transport.pause_reading()
+
+    def thaw(self):
+        for websocket in list(self.connections):
+            websocket.transport.resume_reading()
+
+    async def push(self, frame, subscribed_only=False):
+        """Sends one frame to every connected client, or only to those that
+        have subscribed to something."""
+
+        for websocket in list(self.subscribed if subscribed_only else self.connections):
+            try:
+                await websocket.send(frame)
+            except websockets.exceptions.ConnectionClosed:
+                pass
@@ -0,0 +1,7 @@
+# The bracket LiveT trades, and the one sweep.py ranks the alternatives against
+
+# TRADE PARAMETERS
+SIZE = 2  # Number of contracts
+STOP_PRICE = .70  # SL at -25%
+SCALE = [1.10, 1.20, 1.60, 2.00, 2.50, 3.00]  # +15%, +30%, +60%, +100%, +150%, 200%
+BE_MOVE = 1.35  # Stops move to this multiple of the stop price once the first target fills (~BE)
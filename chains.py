@@ -0,0 +1,154 @@
+import time
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+CONTRACT_TYPES = ("CALL", "PUT")
+
+
+class ChainCache:
+
+    def __init__(self, fetch, ttl: float = 5.0, maxsize: int = 32, whole_chains: bool = False,
+                 clock=time.monotonic):
+        """Option chains by (underlying, expiry, type), kept for `ttl` seconds.
+        A miss on a contract fetches its strike only, the way the chains
+        endpoint is cheapest to ask, and a SCALE or EXIT on it within the
+        TTL is served from the cache. With whole_chains, a miss fetches
+        every strike of the chain instead, so alerts on neighbouring strikes
+        don't go back to the API either; that pays off only when alerts come
+        closer together than the TTL, the whole 0DTE chain is a far bigger
+        download. A whole chain loaded by chain() or prefetch() serves any
+        strike in both modes. Contracts are also indexed by their symbol for
+        O(1) lookups. At most `maxsize` entries are kept, the least recently
+        used one is evicted first.
+        Arguments:
+        ----
+        fetch {callable} -- fetch(underlying, contract_type, expiry, strike) returns
+            the callExpDateMap/putExpDateMap of a chain, like PaperT.fetch_api_json;
+            strike None for every strike.
+        Keyword Arguments:
+        ----
+        ttl {float} -- Seconds an entry is served before it's fetched again. (default: {5.0})
+        maxsize {int} -- Chains and single strikes kept. (default: {32})
+        whole_chains {bool} -- Fetch the whole chain on a miss. (default: {False})
+        clock {callable} -- Time source, seconds. (default: {time.monotonic})
+        """
+
+        self.fetch = fetch
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.whole_chains = whole_chains
+        self.clock = clock
+        # key -> (fetched at, {strike: contract}), oldest use first
+        self.chains = OrderedDict()
+        # symbol -> (key, contract)
+        self.symbols = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(underlying: str, expiry: str, contract_type: str, strike: float = None) -> tuple:
+        """The cache key of a whole chain, or of one strike of it."""
+
+        return underlying, expiry, contract_type, strike
+
+    def _fresh(self, key: tuple) -> dict:
+        entry = self.chains.get(key)
+        if entry is None:
+            return None
+        fetched, strikes = entry
+        if self.clock() - fetched > self.ttl:
+            self._drop(key)
+            return None
+        self.chains.move_to_end(key)
+        return strikes
+
+    def _drop(self, key: tuple) -> None:
+        _, strikes = self.chains.pop(key)
+        for contract in strikes.values():
+            self.symbols.pop(contract['symbol'], None)
+
+    def _store(self, key: tuple, exp_date_map: dict) -> dict:
+        strikes = {}
+        for by_strike in (exp_date_map or {}).values():
+            for strike, contracts in by_strike.items():
+                if contracts:
+                    strikes[float(strike)] = contracts[0]
+        if key in self.chains:
+            self._drop(key)
+        self.chains[key] = (self.clock(), strikes)
+        for contract in strikes.values():
+            self.symbols[contract['symbol']] = (key, contract)
+        while len(self.chains) > self.maxsize:
+            self._drop(next(iter(self.chains)))
+            self.evictions += 1
+        return strikes
+
+    def chain(self, underlying: str, contract_type: str, expiry: str) -> dict:
+        """Every contract of a chain by strike, fetched if it isn't cached or expired."""
+
+        key = self.key(underlying, expiry, contract_type)
+        strikes = self._fresh(key)
+        if strikes is not None:
+            self.hits += 1
+            return strikes
+        self.misses += 1
+        return self._store(key, self.fetch(underlying, contract_type, expiry, None))
+
+    def contract(self, underlying: str, strike, contract_type: str, expiry: str) -> dict:
+        """One contract, from the cache when its strike or its whole chain
+        is there, otherwise fetched (its strike only unless whole_chains).
+        Raises:
+        ----
+        KeyError: If the chain has no such strike.
+        """
+
+        if self.whole_chains:
+            return self.chain(underlying, contract_type, expiry)[float(strike)]
+        price = float(strike)
+        key = self.key(underlying, expiry, contract_type, price)
+        for cached in (self.key(underlying, expiry, contract_type), key):
+            strikes = self._fresh(cached)
+            if strikes is not None and price in strikes:
+                self.hits += 1
+                return strikes[price]
+        self.misses += 1
+        return self._store(key, self.fetch(underlying, contract_type, expiry, strike))[price]
+
+    def lookup(self, symbol: str) -> dict:
+        """The contract with this symbol if its chain is cached and fresh,
+        None otherwise. Never fetches."""
+
+        entry = self.symbols.get(symbol)
+        if entry is None or self._fresh(entry[0]) is None:
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def prefetch(self, underlyings: list, expiry: str = None, workers: int = 4) -> int:
+        """Fetches the whole call and put chains of `underlyings` side by side,
+        e.g. the 0DTE chains of the watched tickers at the open. Only worth
+        it when the first alerts come within the TTL of the call.
+        Keyword Arguments:
+        ----
+        expiry {str} -- "YYYY-MM-DD", today (0DTE) if None.
+        Returns:
+        ----
+        int -- The number of chains fetched.
+        """
+
+        if expiry is None:
+            expiry = str(datetime.now()).split()[0]
+        keys = [(underlying, contract_type) for underlying in underlyings for contract_type in CONTRACT_TYPES]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            maps = list(pool.map(lambda k: self.fetch(k[0], k[1], expiry, None), keys))
+        for (underlying, contract_type), exp_date_map in zip(keys, maps):
+            self._store(self.key(underlying, expiry, contract_type), exp_date_map)
+        return len(keys)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'chains': len(self.chains),
+                'hit_ratio': self.hits / lookups if lookups else 0.0}
@@ -0,0 +1,89 @@
+import json
+import re
+
+from typing import Union
+
+# tried in this order when no backend is asked for, json is always there
+BACKENDS = ("orjson", "ujson", "json")
+
+# a bare U+FFFD where a value belongs, which TD sends now and then instead of a number
+BAD_VALUE_RE = re.compile(r'(?<=[:,\[])\s*\ufffd+\s*(?=[,}\]])')
+
+
+def repair(message: Union[str, bytes]) -> str:
+    """A frame as str, invalid UTF-8 replaced while decoding and bare U+FFFD
+    values swapped for "None", the same substitution the old fallback made.
+    A clean str frame is returned as is; the U+FFFD scan costs a memchr."""
+
+    if not isinstance(message, str):
+        message = bytes(message).decode("utf-8", "replace")
+    if "\ufffd" in message:
+        message = BAD_VALUE_RE.sub('"None"', message)
+    return message
+
+
+def json_loads(message: Union[str, bytes]):
+    # the stdlib backend: one json.loads per clean frame as before codec.py, only a rejected one is repaired
+    try:
+        return json.loads(message)
+    except ValueError:
+        return json.loads(repair(message))
+
+
+class JsonCodec:
+    """One JSON backend behind the loads/dumps pair TdStreamerClient uses.
+    loads takes a str or bytes frame and returns Python objects, normally a
+    dict, with bad values repaired (see repair); it raises ValueError if the
+    frame is not JSON even then. dumps returns a str so it goes out as a
+    text frame whichever backend serialized it.
+    """
+
+    __slots__ = ("name", "loads", "_dumps")
+
+    def __init__(self, name: str = None):
+        """Arguments:
+        ----
+        name {str} -- "orjson", "ujson" or "json". None picks the first of
+            BACKENDS that is installed.
+        Raises:
+        ----
+        ImportError: If the requested backend is not installed.
+        ValueError: If the name is not one of BACKENDS.
+        """
+
+        if name is None:
+            for backend in BACKENDS:
+                try:
+                    self._load_backend(backend)
+                    break
+                except ImportError:
+                    continue
+        elif name in BACKENDS:
+            self._load_backend(name)
+        else:
+            raise ValueError(f"Unknown JSON backend {name!r}, expected one of {BACKENDS}")
+
+    def _load_backend(self, name: str) -> None:
+        if name == "orjson":
+            import orjson
+            self.loads = lambda message: orjson.loads(repair(message))
+            self._dumps = lambda obj: orjson.dumps(obj).decode()
+        elif name == "ujson":
+            import ujson
+            self.loads = lambda message: ujson.loads(repair(message))
+            self._dumps = lambda obj: ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False)
+        else:
+            # no wrapper call in front of json.loads, the path every install without orjson/ujson takes
+            self.loads = json_loads
+            self._dumps = lambda obj: json.dumps(obj, separators=(",", ":"))
+        self.name = name
+
+    def dumps(self, obj) -> str:
+        return self._dumps(obj)
+
+    def __repr__(self):
+        return f"JsonCodec({self.name!r})"
+
+
+# shared by every client that isn't given its own
+DEFAULT_CODEC = JsonCodec()
@@ -0,0 +1,10 @@
+import os
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on, which can be fewer than the machine's
+    (an affinity mask, a container's cpuset). At least 1."""
+
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
@@ -0,0 +1,267 @@
+import asyncio
+import traceback
+
+from collections import deque
+
+from subscriptions import LEVEL_ONE_SERVICES
+
+# BACKPRESSURE POLICIES
+BLOCK = "block"                      # a full queue holds up the receive loop, nothing is lost
+DROP_OLDEST = "drop-oldest"          # a full queue drops its oldest item
+COALESCE_LATEST = "coalesce-latest"  # one pending item per key (symbol), the newest one wins
+
+POLICIES = (BLOCK, DROP_OLDEST, COALESCE_LATEST)
+
+# the parts of a frame and what each one holds
+DATA = "data"
+RESPONSE = "response"
+NOTIFY = "notify"
+
+
+def default_policy(service: str, kind: str = DATA) -> str:
+    """The policy of a registration that doesn't name one: COALESCE_LATEST
+    for level-one quotes, where only the newest entry per symbol matters
+    (a QuoteBook still sees every delta), DROP_OLDEST for everything else.
+    Nothing gets BLOCK unless it asks for it, so a slow handler can only
+    hold up the receive loop, and ACCT_ACTIVITY behind it, where the caller
+    chose that, e.g. for order activity that must never be lost."""
+
+    if kind == DATA and service in LEVEL_ONE_SERVICES:
+        return COALESCE_LATEST
+    return DROP_OLDEST
+
+
+class ServiceQueue:
+    """A bounded queue feeding one coroutine handler."""
+
+    def __init__(self, name: str, handler, policy: str = BLOCK, maxsize: int = 1000):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy {policy!r}, expected one of {POLICIES}")
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.name = name
+        self.handler = handler
+        self.policy = policy
+        self.maxsize = maxsize
+        # coalesce-latest keeps keys in arrival order and the newest item per key
+        self.items = deque()
+        self.latest = {}
+        self.not_empty = asyncio.Event()
+        self.not_full = asyncio.Event()
+        self.task = None
+        # an item has been popped and its handler hasn't returned yet
+        self.busy = False
+        # metrics
+        self.high_water = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self.items)
+
+    async def put(self, item) -> None:
+        items = self.items
+        if self.policy == COALESCE_LATEST:
+            key = item.get('key') if isinstance(item, dict) else None
+            if key in self.latest:
+                self.latest[key] = item
+                self.coalesced += 1
+                return
+            if len(items) >= self.maxsize:
+                del self.latest[items.popleft()]
+                self.dropped += 1
+            items.append(key)
+            self.latest[key] = item
+        elif len(items) >= self.maxsize:
+            if self.policy == DROP_OLDEST:
+                items.popleft()
+                self.dropped += 1
+            else:
+                while len(items) >= self.maxsize:
+                    self.not_full.clear()
+                    await self.not_full.wait()
+            items.append(item)
+        else:
+            items.append(item)
+
+        if len(items) > self.high_water:
+            self.high_water = len(items)
+        self.not_empty.set()
+
+    def _pop(self):
+        if self.policy == COALESCE_LATEST:
+            return self.latest.pop(self.items.popleft())
+        return self.items.popleft()
+
+    async def consume(self) -> None:
+        """Hands items to the handler one at a time, in order, until cancelled."""
+
+        while True:
+            while not self.items:
+                self.not_empty.clear()
+                await self.not_empty.wait()
+            item = self._pop()
+            self.busy = True
+            self.not_full.set()
+            try:
+                await self.handler(item)
+                self.delivered += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # a failing handler mustn't take its queue down with it
+                self.errors += 1
+                traceback.print_exc()
+            finally:
+                self.busy = False
+                self.not_full.set()
+
+    async def drain(self) -> None:
+        """Waits until every queued item has been handled."""
+
+        while self.items or self.busy:
+            self.not_full.clear()
+            await self.not_full.wait()
+
+    def metrics(self) -> dict:
+        return {
+            'policy': self.policy, 'maxsize': self.maxsize, 'depth': self.depth, 'high_water': self.high_water,
+            'delivered': self.delivered, 'dropped': self.dropped, 'coalesced': self.coalesced, 'errors': self.errors,
+        }
+
+
+class Dispatcher:
+
+    def __init__(self):
+        """Splits decoded frames into their data, response and notify parts
+        and routes each part to the handlers registered for it. Every
+        registration gets its own bounded queue and consumer task, so a slow
+        handler on one service only backs up its own queue: quotes piling up
+        behind a journal never delay ACCT_ACTIVITY. Only a BLOCK queue that
+        fills up holds up the receive loop, which is the point of BLOCK.
+        """
+
+        self.queues = {}
+        # service -> plain functions called inline with each data entry, see tap()
+        self.taps = {}
+        self.unrouted = 0
+        self.running = False
+        # requestid -> future resolved with its response entry, see expect()
+        self.waiters = {}
+
+    def register(self, service: str, handler, policy: str = None, maxsize: int = 1000, kind: str = DATA) -> ServiceQueue:
+        """Routes one service's items to a coroutine handler.
+        Arguments:
+        ----
+        service {str} -- e.g. "ACCT_ACTIVITY" or "OPTION". None takes every
+            service of `kind` that has no handler of its own, and is how notify
+            (heartbeats) is handled.
+        handler {coroutine function} -- Awaited with each item: one content
+            entry for data, one response entry, one notify entry.
+        Keyword Arguments:
+        ----
+        policy {str} -- BLOCK, DROP_OLDEST or COALESCE_LATEST, see default_policy if None.
+        maxsize {int} -- Queue bound, in items (keys for COALESCE_LATEST). (default: {1000})
+        kind {str} -- DATA, RESPONSE or NOTIFY. (default: {DATA})
+        Returns:
+        ----
+        ServiceQueue -- The queue, for its metrics.
+        """
+
+        if policy is None:
+            policy = default_policy(service, kind)
+        queue = ServiceQueue(f"{kind}:{service or '*'}", handler, policy, maxsize)
+        self.queues[(kind, service)] = queue
+        if self.running:
+            queue.task = asyncio.ensure_future(queue.consume())
+        return queue
+
+    def tap(self, service: str, func) -> None:
+        """Calls `func(entry)` with every data entry of `service` right in the
+        receive loop, before any queue. For cheap work that must see every
+        update, like merging quotes into a QuoteBook."""
+
+        self.taps.setdefault(service, []).append(func)
+
+    def expect(self, requestid) -> asyncio.Future:
+        """A future resolved with the response entry to request `requestid`
+        once answer() sees it, e.g. to await the answer to an UNSUBS while
+        the receive loop keeps the socket to itself. The entry still goes to
+        the response handler, if there is one."""
+
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[str(requestid)] = future
+        return future
+
+    def answer(self, message: dict) -> None:
+        """Resolves the futures from expect() that the responses in one
+        decoded frame answer. Called for every frame received, whoever reads."""
+
+        for entry in message.get(RESPONSE, ()):
+            waiter = self.waiters.pop(str(entry.get('requestid')), None)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(entry)
+
+    def start(self) -> None:
+        """Starts a consumer task per queue. Needs a running event loop."""
+
+        self.running = True
+        for queue in self.queues.values():
+            if queue.task is None:
+                queue.task = asyncio.ensure_future(queue.consume())
+
+    async def stop(self, drain: bool = True) -> None:
+        """Stops the consumers, after they've handled what is queued if `drain`."""
+
+        if drain:
+            for queue in self.queues.values():
+                if queue.task is not None:
+                    await queue.drain()
+        tasks = [queue.task for queue in self.queues.values() if queue.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for queue in self.queues.values():
+            queue.task = None
+        self.running = False
+
+    def _queue(self, kind: str, service: str) -> ServiceQueue:
+        queue = self.queues.get((kind, service))
+        if queue is None:
+            queue = self.queues.get((kind, None))
+        return queue
+
+    async def dispatch(self, message: dict) -> None:
+        """Routes every part of one decoded frame to its queue."""
+
+        for entry in message.get(DATA, ()):
+            service = entry.get('service')
+            taps = self.taps.get(service)
+            if taps:
+                for func in taps:
+                    func(entry)
+            queue = self._queue(DATA, service)
+            if queue is None:
+                if not taps:
+                    self.unrouted += 1
+                continue
+            for content in entry.get('content', ()):
+                await queue.put(content)
+
+        for kind in (RESPONSE, NOTIFY):
+            for entry in message.get(kind, ()):
+                queue = self._queue(kind, entry.get('service'))
+                if queue is None:
+                    self.unrouted += 1
+                    continue
+                await queue.put(entry)
+
+    def metrics(self) -> dict:
+        """Queue depth and counters per registration, keyed "kind:service"."""
+
+        metrics = {queue.name: queue.metrics() for queue in self.queues.values()}
+        metrics['unrouted'] = self.unrouted
+        return metrics
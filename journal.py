@@ -0,0 +1,92 @@
+import atexit
+import csv
+import os
+import time
+
+# paperdata.csv columns, in the order pandas has always written them
+JOURNAL_COLUMNS = ['Time', 'Action', 'Ticker', 'Strike', 'C/P', 'bid', 'ask', 'bidAskSize', 'last',
+                   'totalVolume', 'openInterest', 'net']
+
+# FSYNC POLICIES
+FSYNC_ALWAYS = "always"      # fsync after every flush, survives power loss
+FSYNC_INTERVAL = "interval"  # fsync at most once every fsync_interval seconds and on close
+FSYNC_NEVER = "never"        # leave it to the OS, survives a crashed process but not a crashed box
+
+
+class TradeJournal:
+
+    def __init__(self, path: str = "paperdata.csv", flush_rows: int = 1, fsync: str = FSYNC_INTERVAL,
+                 fsync_interval: float = 1.0):
+        """Append-only CSV journal, O(1) per row regardless of file size.
+        Rows are buffered in the file object and pushed to the OS every
+        `flush_rows` rows, then fsynced according to the `fsync` policy.
+        The file is only opened on the first row, so a journal nothing is
+        recorded to leaves no file behind.
+        Arguments:
+        ----
+        path {str} -- The CSV file to append to, created with a header if missing.
+        flush_rows {int} -- Rows buffered before they are written out. (default: {1})
+        fsync {str} -- One of 'always', 'interval' or 'never'. (default: {'interval'})
+        fsync_interval {float} -- Seconds between fsyncs for the 'interval' policy.
+        """
+
+        if fsync not in (FSYNC_ALWAYS, FSYNC_INTERVAL, FSYNC_NEVER):
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+
+        self.path = path
+        self.flush_rows = max(1, flush_rows)
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.pending = 0
+        self.last_fsync = time.monotonic()
+        # opened by the first record()
+        self.file = None
+        self.writer = None
+
+    def _open(self) -> None:
+        needs_header = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        if not needs_header:
+            self._repair_tail()
+        self.file = open(self.path, "a", newline="", buffering=1 << 16)
+        self.writer = csv.writer(self.file, lineterminator="\n")
+        if needs_header:
+            self.writer.writerow(JOURNAL_COLUMNS)
+            self.flush()
+        atexit.register(self.close)
+
+    def _repair_tail(self) -> None:
+        """Terminates a row torn by a crash so the next append starts on a fresh line."""
+
+        with open(self.path, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+    def record(self, row) -> None:
+        """Appends one row, given in JOURNAL_COLUMNS order. NaN is written as an
+        empty field, the same way pandas.to_csv writes it."""
+
+        if self.file is None or self.file.closed:
+            self._open()
+        self.writer.writerow(["" if value != value else value for value in row])
+        self.pending += 1
+        if self.pending >= self.flush_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        self.file.flush()
+        self.pending = 0
+        if self.fsync == FSYNC_ALWAYS:
+            os.fsync(self.file.fileno())
+        elif self.fsync == FSYNC_INTERVAL and time.monotonic() - self.last_fsync >= self.fsync_interval:
+            os.fsync(self.file.fileno())
+            self.last_fsync = time.monotonic()
+
+    def close(self) -> None:
+        if self.file is None or self.file.closed:
+            return
+        self.file.flush()
+        if self.fsync != FSYNC_NEVER:
+            os.fsync(self.file.fileno())
+        self.file.close()
+        atexit.unregister(self.close)
@@ -0,0 +1,205 @@
+import time
+
+from collections import deque
+
+# MONITOR PARAMETERS
+HEARTBEAT_INTERVAL = 5.0  # Seconds between two pings
+PING_TIMEOUT = 5.0        # A ping unanswered for longer marks the feed stalled
+STALL_AFTER = 15.0        # Seconds without a frame or a pong before the feed is stalled (TD sends a heartbeat every 10s)
+RTT_WINDOW = 60           # Round trips kept for the percentiles, 5 minutes of pings
+LAG_WINDOW = 1024         # Data frames kept for the percentiles
+
+
+class RollingWindow:
+
+    def __init__(self, size: int):
+        """The latest `size` samples of a latency, for percentiles."""
+
+        self.samples = deque(maxlen=size)
+
+    def add(self, value: float) -> None:
+        self.samples.append(value)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def percentile(self, q: float) -> float:
+        """Nearest-rank percentile, e.g. q=.99, None while there are no samples."""
+
+        if not self.samples:
+            return None
+        samples = sorted(self.samples)
+        return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+    def percentiles(self, qs=(.5, .9, .99)) -> dict:
+        """{"p50": ..., "p90": ..., "p99": ...} in one sort."""
+
+        samples = sorted(self.samples)
+        return {f"p{q * 100:g}": samples[min(len(samples) - 1, int(len(samples) * q))] if samples else None
+                for q in qs}
+
+
+class FeedMonitor:
+
+    def __init__(self, stall_after: float = STALL_AFTER, data_deadline: float = None,
+                 interval: float = HEARTBEAT_INTERVAL, ping_timeout: float = PING_TIMEOUT,
+                 clock=time.monotonic, wall_clock=time.time):
+        """Liveness and latency of one stream connection. TdStreamerClient
+        feeds it every frame it reads and heartbeat() feeds it the round trip
+        of a protocol-level ping every `interval` seconds. check() says, at
+        any moment, whether the feed is stalled: a ping unanswered past
+        ping_timeout, nothing at all received for stall_after seconds or,
+        with a data_deadline, no data frame for that long.
+        Keyword Arguments:
+        ----
+        stall_after {float} -- Seconds of silence, pongs included. (default: {STALL_AFTER})
+        data_deadline {float} -- Seconds without a data frame, None to not
+            require data (e.g. ACCT_ACTIVITY only streams on order events).
+        interval {float} -- Seconds between two pings. (default: {HEARTBEAT_INTERVAL})
+        ping_timeout {float} -- Seconds to wait for a pong. (default: {PING_TIMEOUT})
+        clock {callable} -- Monotonic seconds.
+        wall_clock {callable} -- Epoch seconds, to compare with the frames' timestamps.
+        """
+
+        self.stall_after = stall_after
+        self.data_deadline = data_deadline
+        self.interval = interval
+        self.ping_timeout = ping_timeout
+        self.clock = clock
+        self.wall_clock = wall_clock
+        # a new monitor counts as just heard from
+        now = clock()
+        self.last_frame = now
+        self.last_data = now
+        self.last_pong = now
+        # when the oldest unanswered ping went out
+        self.ping_sent = None
+        # round trips of the pings and server timestamp -> receive time of data frames, in seconds
+        self.rtt = RollingWindow(RTT_WINDOW)
+        self.lag = RollingWindow(LAG_WINDOW)
+        self.stalled_since = None
+        self.frames = 0
+        self.data_frames = 0
+        self.pings = 0
+        self.timeouts = 0
+        self.stalls = 0
+
+    def frame(self, message: dict) -> None:
+        """Notes one decoded frame."""
+
+        now = self.clock()
+        self.last_frame = now
+        self.frames += 1
+        data = message.get('data')
+        if data:
+            self.last_data = now
+            self.data_frames += 1
+            timestamp = data[0].get('timestamp')
+            if timestamp:
+                self.lag.add(self.wall_clock() - timestamp / 1000)
+
+    def ping(self) -> float:
+        """Notes a ping sent. An unanswered one keeps its time, so a second
+        ping doesn't hide it.
+        Returns:
+        ----
+        float -- When this ping went out, to hand to pong().
+        """
+
+        self.pings += 1
+        now = self.clock()
+        if self.ping_sent is None:
+            self.ping_sent = now
+        return now
+
+    def pong(self, sent: float = None) -> float:
+        """Notes the answer to the outstanding pings.
+        Keyword Arguments:
+        ----
+        sent {float} -- What ping() returned for the ping answered. None
+            times it from the oldest unanswered ping, which after a lost pong
+            counts the wait for that one too.
+        Returns:
+        ----
+        float -- The round trip, in seconds.
+        """
+
+        now = self.clock()
+        rtt = now - (self.ping_sent if sent is None else sent)
+        self.rtt.add(rtt)
+        self.last_pong = now
+        self.ping_sent = None
+        return rtt
+
+    def timeout(self) -> None:
+        """Notes a pong that didn't come within ping_timeout."""
+
+        self.timeouts += 1
+
+    def lost(self) -> None:
+        """Forgets the outstanding ping, its connection is gone."""
+
+        self.ping_sent = None
+
+    def since_frame(self) -> float:
+        """Seconds since anything, frame or pong, was received."""
+
+        return self.clock() - max(self.last_frame, self.last_pong)
+
+    def since_data(self) -> float:
+        """Seconds since the last data frame."""
+
+        return self.clock() - self.last_data
+
+    def check(self, max_rtt: float = None, max_lag: float = None, q: float = .9) -> str:
+        """Whether the feed can be trusted right now, e.g. before an order.
+        Keyword Arguments:
+        ----
+        max_rtt {float} -- Highest acceptable ping round trip percentile, in seconds.
+        max_lag {float} -- Highest acceptable data lag percentile, in seconds.
+        q {float} -- The percentile compared with max_rtt and max_lag. (default: {.9})
+        Returns:
+        ----
+        str -- Why the feed is stale, "" if it is fine.
+        """
+
+        now = self.clock()
+        if self.ping_sent is not None and now - self.ping_sent > self.ping_timeout:
+            return f"NO PONG IN {now - self.ping_sent:.1f}s"
+        quiet = now - max(self.last_frame, self.last_pong)
+        if quiet > self.stall_after:
+            return f"NOTHING RECEIVED IN {quiet:.1f}s"
+        if self.data_deadline is not None and now - self.last_data > self.data_deadline:
+            return f"NO DATA IN {now - self.last_data:.1f}s"
+        if max_rtt is not None:
+            rtt = self.rtt.percentile(q)
+            if rtt is not None and rtt > max_rtt:
+                return f"PING ROUND TRIP {rtt * 1e3:.0f}ms"
+        if max_lag is not None:
+            lag = self.lag.percentile(q)
+            if lag is not None and lag > max_lag:
+                return f"DATA {lag * 1e3:.0f}ms BEHIND"
+        return ""
+
+    def healthy(self, max_rtt: float = None, max_lag: float = None, q: float = .9) -> bool:
+        return not self.check(max_rtt, max_lag, q)
+
+    def update(self) -> str:
+        """check(), printing a line when the feed stalls or recovers.
+        Called by TdStreamerClient.heartbeat after every ping."""
+
+        reason = self.check()
+        if reason and self.stalled_since is None:
+            self.stalled_since = self.clock()
+            self.stalls += 1
+            print(f"************ STREAM STALLED: {reason} ************")
+        elif not reason and self.stalled_since is not None:
+            print(f"************ STREAM RECOVERED AFTER {self.clock() - self.stalled_since:.1f}s ************")
+            self.stalled_since = None
+        return reason
+
+    def metrics(self) -> dict:
+        return {'stalled': self.check(), 'since_frame': self.since_frame(), 'since_data': self.since_data(),
+                'rtt': self.rtt.percentiles(), 'lag': self.lag.percentiles(), 'frames': self.frames,
+                'data_frames': self.data_frames, 'pings': self.pings, 'timeouts': self.timeouts,
+                'stalls': self.stalls}
@@ -1,25 +1,42 @@
 import requests
 from datetime import datetime, timedelta
-import winsound
-import xmltodict
 import asyncio
 import aiohttp
 import traceback
 from pprint import pprint
 import dateutil.parser
-from pandas import pandas as pd
-from stream import TdStreamerClient
+from stream import TdStreamerClient, streamer_credentials
+from dispatch import BLOCK
+from journal import TradeJournal
+from sink import BackgroundSink
+from alerts import parse_option_alert, AlertParseError
+from activity import decode_activity
+from positions import PositionIndex, CLOSED
+from orders import BracketStrategy, STOP_TEMPLATE, MARKET_TEMPLATE, json_str
+from bracket import SIZE, STOP_PRICE, SCALE, BE_MOVE
 from config import C_KEY, ACCT_NUM, REFRESH
+try:
+    import winsound
+except ImportError:
+    # not on Windows: the sink skips sounds, e.g. benchmarks on Linux
+    winsound = None
 
 # API ENDPOINTS
 UP_ENDPT = "https://api.tdameritrade.com/v1/userprincipals"
 OC_ENDPOINT = "https://api.tdameritrade.com/v1/marketdata/chains"
 PO_ENDPOINT = f"https://api.tdameritrade.com/v1/accounts/{ACCT_NUM}/orders"
 
-# TRADE PARAMETERS
-SIZE = 2  # Number of contracts
-STOP_PRICE = .70  # SL at -25%
-SCALE = [1.10, 1.20, 1.60, 2.00, 2.50, 3.00]  # +15%, +30%, +60%, +100%, +150%, 200%
+# SOUND PARAMETERS
+SOUND_FLAGS = winsound.SND_FILENAME | winsound.SND_ASYNC if winsound is not None else None
+
+# CONNECTION PARAMETERS
+POOL_SIZE = 10  # Max keep-alive connections held open to the API
+KEEPALIVE = 75  # Seconds an idle connection stays in the pool
+REWARM_EVERY = 30  # Seconds between requests that keep the pooled connections from going idle, under KEEPALIVE
+
+# FEED PARAMETERS
+STALL_AFTER = 15  # Seconds without a frame or pong from the streamer before entries are refused
+MAX_RTT = 0.5  # Entries are refused while the p90 ping round trip is slower than this
 
 
 class LiveT:
@@ -28,12 +45,21 @@ class LiveT:
         self.header = ""
         self.refresh_now = datetime.now()
         self.timestamp = ""
-        self.key_list = []
-        self.template = {'Symbol': '',
-                         'Limit': {'Buy': set(), 'Sell': set()},
-                         'Stop': {'Sell': set()}}
+        # open bracket entries, indexed by order key and symbol
+        self.positions = PositionIndex()
         self.endpoint_list = []
         self.json_list = []
+        # bracket orders for this SIZE/STOP_PRICE/SCALE, serialized once at startup
+        self.strategy = BracketStrategy(SIZE, STOP_PRICE, SCALE)
+        # long-lived, pooled HTTP client for order traffic (see start and open_session)
+        self.session = None
+        # re-warms the session every REWARM_EVERY seconds while LiveT is started
+        self.keepalive = None
+        self.journal = TradeJournal("paperdata.csv")
+        # console output, sounds and journal rows are written by a background worker
+        self.sink = BackgroundSink(self.journal)
+        # liveness of the streaming session, set by create_streaming_session
+        self.feed = None
 
 # TOKEN MANAGEMENT
 
@@ -53,293 +79,241 @@ class LiveT:
             self.get_access()
             self.refresh_now = datetime.now()
 
+# CONNECTION MANAGEMENT
+
+    async def start(self):
+        # warm order connections from the first alert on, and kept warm between alerts until close()
+        await self.open_session()
+        if self.keepalive is None or self.keepalive.done():
+            self.keepalive = asyncio.ensure_future(self.keep_warm())
+        return self
+
+    async def close(self):
+        if self.keepalive is not None:
+            self.keepalive.cancel()
+            await asyncio.gather(self.keepalive, return_exceptions=True)
+            self.keepalive = None
+        await self.close_session()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def open_session(self):
+        # one pooled session for every order call, created once and reused for the whole day
+        self.get_session()
+        # pay for DNS, TCP connect and TLS handshake now instead of on the first alert
+        await self.warm_session()
+
+    def get_session(self):
+        # falls back to a cold (unwarmed) session if open_session was never called
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=POOL_SIZE, keepalive_timeout=KEEPALIVE, ttl_dns_cache=None)
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
+
+    async def warm_session(self):
+        # open SIZE connections concurrently so every leg of a bracket entry finds one in the pool
+        async def warm(session):
+            async with session.get(PO_ENDPOINT, headers=self.header) as response:
+                await response.read()
+                return response.status
+        try:
+            await asyncio.gather(*[warm(self.get_session()) for _ in range(SIZE)])
+        except aiohttp.ClientError:
+            traceback.print_exc()
+            print("************ FAILED TO WARM ORDER CONNECTIONS ************")
+
+    async def keep_warm(self):
+        # an idle pooled connection is closed after KEEPALIVE seconds, so the next order would pay the handshake again
+        while True:
+            await asyncio.sleep(REWARM_EVERY)
+            try:
+                await self.warm_session()
+            except Exception:
+                # e.g. a timeout, the next round tries again
+                traceback.print_exc()
+                print("************ FAILED TO RE-WARM ORDER CONNECTIONS ************")
+
+    async def close_session(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
 # STREAMING DATA MANAGEMENT
 
-    def process_stream(self, data):
+    async def process_stream(self, data):
         try:
             activity = data['2']
             # exclude 'SUBSCRIBED, TransactionTrade, OrderRoute'
             if activity not in ['SUBSCRIBED', 'TransactionTrade', 'OrderRoute']:
-                # convert xml to dict and store what we need in variable
-                parsed_data = xmltodict.parse(data['3'])[f'{activity}Message']
-                # timestamp = data['ActivityTimestamp']
-                orderkey = parsed_data['Order']['OrderKey']
-                ordertype = parsed_data['Order']['OrderType']
-                openclose = parsed_data['Order']['OpenClose']
-                orderinstruct = parsed_data['Order']['OrderInstructions']
-                symbol = parsed_data['Order']['Security']['Symbol']
-                if ordertype != "Market":
-                    price = parsed_data['Order']['OrderPricing'][f'{ordertype}']
-                else:
-                    price = "MARKET"
+                # pull only the order fields we need out of the xml
+                order = decode_activity(activity, data['3'])
+                orderkey = order.orderkey
+                ordertype = order.ordertype
+                openclose = order.openclose
+                orderinstruct = order.orderinstruct
+                symbol = order.symbol
+                price = order.price
                 # if "Order" in the title, crop "Order" to be concise
                 if "Order" in activity:
                     activity = activity[5:]
                 # print a beautiful one line summary
-                print(f"{datetime.now()}: {activity} {ordertype} {orderinstruct} to {openclose} {symbol} @ {price} ({orderkey})")
-                # store order keys in most recent set of keys and print
-                if len(self.key_list) > 0:
-                    self.process_key(activity, ordertype, orderinstruct, orderkey, price, symbol)
-                pprint(self.key_list)
+                self.sink.log(f"{datetime.now()}: {activity} {ordertype} {orderinstruct} to {openclose} {symbol} @ {price} ({orderkey})")
+                # update the position the order belongs to and print
+                await self.process_key(activity, ordertype, orderinstruct, orderkey, price, symbol)
+                self.sink.pprint(self.positions.snapshot())
         # if for whatever reason we run into an error, print all the data out
         except:
             traceback.print_exc()
             print("************ ERROR ENCOUNTERED WHILE PROCESSING STREAM, PRINTING FULL RESPONSE ************")
             pprint(data)
 
-    def process_key(self, activity, ordertype, orderinstruct, orderkey, price, symbol):
-        if activity == "EntryRequest":  # add key when order entered
-            self.key_list[-1][ordertype][orderinstruct].add(orderkey)
-        if activity in ["Fill", "CancelRequest"]:  # process fills or canceled orders
-            # If Limit Buy filled, "Go-go-go!"
-            if activity == "Fill" and ordertype == "Limit" and orderinstruct == "Buy":
-                winsound.PlaySound('sound/bought.wav', winsound.SND_FILENAME | winsound.SND_ASYNC)
-            # If Limit Sell filled, "CHA-CHING!" $$$
-            if activity == "Fill" and ordertype == "Limit" and orderinstruct == "Sell":
-                winsound.PlaySound('sound/profit.wav', winsound.SND_FILENAME | winsound.SND_ASYNC)
-            # Remove order key from key list if not market order
-            if price != "MARKET":
-                self.key_list[-1][ordertype][orderinstruct].discard(orderkey)
-
-        # If Stop Order canceled and number of keys in Limit Sell set equal to SIZE - 1
-        if activity == "UROUT" and ordertype == "Stop" and orderinstruct == "Sell" and SIZE == len(self.key_list[-1]['Limit']['Sell']) + 1:
-            new_stop_price = str(round((float(price) * 1.35), 1)) + "0"
-            # iterate thru a copy of the Stop Sell keys to avoid 'runtime error: set changed size during iteration'
-            for key in self.key_list[-1]['Stop']['Sell'].copy():
-                self.replace_order(key, new_stop_price, symbol)
-                # Remove order key from key list
-                self.key_list[-1]['Stop']['Sell'].discard(key)
-
-        # remove orderkey if UROUT and key is still in key list
-        if activity == "UROUT" and orderkey in self.key_list[-1][ordertype][orderinstruct]:
-            self.key_list[-1][ordertype][orderinstruct].discard(orderkey)
-
-        # check for and remove empty key lists
-        for dict in self.key_list:
-            if not dict['Limit']['Buy'] and not dict['Limit']['Sell'] and not dict['Stop']['Sell']:
-                self.key_list.remove(dict)
-                print("************ REMOVING EMPTY KEY DICT ************")
+    async def process_key(self, activity, ordertype, orderinstruct, orderkey, price, symbol):
+        # find the position the order belongs to by its key and update it
+        position, stop_keys = self.positions.apply(activity, ordertype, orderinstruct, orderkey, price, symbol, SIZE)
+        if position is None:
+            return
+        # If Limit Buy filled, "Go-go-go!"
+        if activity == "Fill" and ordertype == "Limit" and orderinstruct == "Buy":
+            self.sink.sound('sound/bought.wav', SOUND_FLAGS)
+        # If Limit Sell filled, "CHA-CHING!" $$$
+        if activity == "Fill" and ordertype == "Limit" and orderinstruct == "Sell":
+            self.sink.sound('sound/profit.wav', SOUND_FLAGS)
+
+        # If Stop Order canceled by the first Limit Sell fill, move the remaining stops to ~BE
+        if stop_keys:
+            new_stop_price = str(round((float(price) * BE_MOVE), 1)) + "0"
+            # move every stop at once instead of one round trip after another
+            await asyncio.gather(*[self.replace_order(key, new_stop_price, position.symbol) for key in stop_keys])
+
+        if position.state == CLOSED:
+            self.sink.log(f"************ POSITION CLOSED: {position.symbol} ************")
 
 # ORDER MANAGEMENT
 
+    async def send_order(self, method, url, json_data=None):
+        # single PUT/DELETE over the pooled session, returns the status code (0 if the request never completed)
+        headers = {**self.header, "Content-Type": "application/json"}
+        try:
+            async with self.get_session().request(method, url, headers=headers, data=json_data) as response:
+                await response.read()
+                return response.status
+        except aiohttp.ClientError:
+            traceback.print_exc()
+            return 0
+
     async def make_request(self, session, url, headers, json_data):
-        async with session.post(url, headers=headers, json=json_data) as response:
+        # json_data is already serialized (see orders.py)
+        async with session.post(url, headers=headers, data=json_data) as response:
+            # drain the body so the connection goes back to the pool instead of being closed
+            await response.read()
             return response.status
 
     async def send_requests(self, urls, headers, json_data_list):
-        async with aiohttp.ClientSession() as session:
-            tasks = []
-            for url, json_data in zip(urls, json_data_list):
-                tasks.append(asyncio.ensure_future(self.make_request(session, url, headers, json_data)))
-            responses = await asyncio.gather(*tasks)
-            return responses
+        session = self.get_session()
+        headers = {**headers, "Content-Type": "application/json"}
+        tasks = []
+        for url, json_data in zip(urls, json_data_list):
+            tasks.append(asyncio.ensure_future(self.make_request(session, url, headers, json_data)))
+        responses = await asyncio.gather(*tasks)
+        return responses
 
     async def enter_position(self, symbol, entryprice):
-        # Set variables for SL, reformat entry price to string
-        stop_price = str(round((entryprice * STOP_PRICE), 2))
-        entry_price = str("%.2f" % entryprice)
-        # SIZE constant determines number of cons, iterates for each one
-        for i in range(SIZE):
-            # Using SCALE constant list, each request has a unique limit sell price
-            scale_price = str(round((entryprice * SCALE[i]), 2))
-            # BRACKET ORDER
-            order_json = {
-                "orderType": "LIMIT",
-                "session": "NORMAL",
-                "price": entry_price,
-                "duration": "DAY",
-                "orderStrategyType": "TRIGGER",
-                "orderLegCollection": [
-                    {
-                        "quantity": 1,
-                        "instruction": "BUY_TO_OPEN",
-                        "instrument": {
-                            "assetType": "OPTION",
-                            "symbol": symbol
-                        }
-                    }
-                ],
-                "childOrderStrategies": [
-                    {
-                        "orderStrategyType": "OCO",
-                        "childOrderStrategies": [
-                            {
-                                "orderStrategyType": "SINGLE",
-                                "session": "NORMAL",
-                                "duration": "DAY",
-                                "orderType": "LIMIT",
-                                "price": scale_price,
-                                "orderLegCollection": [
-                                    {
-                                        "instruction": "SELL_TO_CLOSE",
-                                        "instrument": {
-                                            "assetType": "OPTION",
-                                            "symbol": symbol
-                                        },
-                                        "quantity": 1,
-                                    }
-                                ]
-                            },
-                            {
-                                "orderStrategyType": "SINGLE",
-                                "session": "NORMAL",
-                                "duration": "DAY",
-                                "orderType": "STOP",
-                                "stopPrice": stop_price,
-                                "orderLegCollection": [
-                                    {
-                                        "instruction": "SELL_TO_CLOSE",
-                                        "instrument": {
-                                            "assetType": "OPTION",
-                                            "symbol": symbol
-                                        },
-                                        "quantity": 1,
-                                    }
-                                ]
-                            }
-                        ]
-                    }
-                ]
-            }
-            self.json_list.append(order_json)
-            self.endpoint_list.append(PO_ENDPOINT)
+        # track the position before the orders go out, their OrderEntryRequests can beat the 201s back
+        self.positions.open(symbol)
+        # fill symbol and prices into the pre-serialized bracket, one order per contract (SIZE)
+        self.json_list = self.strategy.render(symbol, entryprice)
+        self.endpoint_list = [PO_ENDPOINT] * len(self.json_list)
         # After adding jsons and endpoints, send the requests asynchronously
         status_list = await self.send_requests(self.endpoint_list, self.header, self.json_list)
         for status_code in status_list:
             if status_code == 201:
-                print(f"{datetime.now()} | ENTRY ORDER PLACED!")
-                winsound.PlaySound('sound/entry.wav', winsound.SND_FILENAME | winsound.SND_ASYNC)
+                self.sink.log(f"{datetime.now()} | ENTRY ORDER PLACED!")
+                self.sink.sound('sound/entry.wav', SOUND_FLAGS)
             else:
-                print(f"{datetime.now()} | ENTRY ORDER FAILED TO PLACE!")
-                winsound.PlaySound('sound/codec.wav', winsound.SND_FILENAME | winsound.SND_ASYNC)
-        # create a new set of keys
-        self.key_list.append(self.template)
-        # add symbol for future reference
-        self.key_list[-1]['Symbol'] = symbol
+                self.sink.log(f"{datetime.now()} | ENTRY ORDER FAILED TO PLACE!")
+                self.sink.sound('sound/codec.wav', SOUND_FLAGS)
         # clear lists for asyncio, aiohttp
         self.json_list, self.endpoint_list = [], []
 
     # replace orders to raise stop losses to ~BE
-    def replace_order(self, orderkey, stop_price, symbol):
-        order_json = {
-                        "orderStrategyType": "SINGLE",
-                        "session": "NORMAL",
-                        "duration": "DAY",
-                        "orderType": "STOP",
-                        "stopPrice": stop_price,
-                        "orderLegCollection": [
-                            {
-                                "instruction": "SELL_TO_CLOSE",
-                                "instrument": {
-                                    "assetType": "OPTION",
-                                    "symbol": symbol
-                                },
-                                "quantity": 1,
-                            }
-                        ]
-                    }
-
-        order_response = requests.put(url=f"{PO_ENDPOINT}/{orderkey}", headers=self.header, json=order_json)
-        if 200 <= order_response.status_code < 300:
-            print(f"{datetime.now()} | ********** MOVING SL TO {stop_price} **********")
-            winsound.PlaySound('sound/stoplossup.wav', winsound.SND_FILENAME | winsound.SND_ASYNC)
+    async def replace_order(self, orderkey, stop_price, symbol):
+        order_json = STOP_TEMPLATE.render(symbol=json_str(symbol), stop=json_str(stop_price))
+
+        status_code = await self.send_order("PUT", f"{PO_ENDPOINT}/{orderkey}", order_json)
+        if 200 <= status_code < 300:
+            self.sink.log(f"{datetime.now()} | ********** MOVING SL TO {stop_price} **********")
+            self.sink.sound('sound/stoplossup.wav', SOUND_FLAGS)
         else:
-            print(f"{datetime.now()} | ********** {order_response.status_code}: FAILED TO REPLACE ORDER {orderkey} **********")
-            winsound.PlaySound('sound/codec.wav', winsound.SND_FILENAME | winsound.SND_ASYNC)
+            self.sink.log(f"{datetime.now()} | ********** {status_code}: FAILED TO REPLACE ORDER {orderkey} **********")
+            self.sink.sound('sound/codec.wav', SOUND_FLAGS)
 
     # replace stop orders to market sells to quickly exit position
-    def replace_order_market(self, orderkey, symbol):
-        order_json = {
-                        "orderStrategyType": "SINGLE",
-                        "session": "NORMAL",
-                        "duration": "DAY",
-                        "orderType": "MARKET",
-                        "orderLegCollection": [
-                            {
-                                "instruction": "SELL_TO_CLOSE",
-                                "instrument": {
-                                    "assetType": "OPTION",
-                                    "symbol": symbol
-                                },
-                                "quantity": 1,
-                            }
-                        ]
-                    }
-
-        order_response = requests.put(url=f"{PO_ENDPOINT}/{orderkey}", headers=self.header, json=order_json)
-        if 200 <= order_response.status_code < 300:
-            print(f"{datetime.now()} | ********** REPLACING SL ORDER {orderkey} WITH MARKET SELL ORDER **********")
-            winsound.PlaySound('sound/stoplossup.wav', winsound.SND_FILENAME | winsound.SND_ASYNC)
+    async def replace_order_market(self, orderkey, symbol):
+        order_json = MARKET_TEMPLATE.render(symbol=json_str(symbol))
+
+        status_code = await self.send_order("PUT", f"{PO_ENDPOINT}/{orderkey}", order_json)
+        if 200 <= status_code < 300:
+            self.sink.log(f"{datetime.now()} | ********** REPLACING SL ORDER {orderkey} WITH MARKET SELL ORDER **********")
+            self.sink.sound('sound/stoplossup.wav', SOUND_FLAGS)
         else:
-            print(f"{datetime.now()} | ********** {order_response.status_code}: FAILED TO REPLACE ORDER {orderkey} **********")
-            winsound.PlaySound('sound/codec.wav', winsound.SND_FILENAME | winsound.SND_ASYNC)
-
-    def cancel_order(self, orderkey):
-        order_response = requests.delete(url=f"{PO_ENDPOINT}/{orderkey}", headers=self.header)
-        if 200 <= order_response.status_code < 300:
-            print(f"{datetime.now()} | ********** SUCCESSFULLY CANCELED ORDER {orderkey} **********")
-            winsound.PlaySound('sound/dodged.wav', winsound.SND_FILENAME | winsound.SND_ASYNC)
+            self.sink.log(f"{datetime.now()} | ********** {status_code}: FAILED TO REPLACE ORDER {orderkey} **********")
+            self.sink.sound('sound/codec.wav', SOUND_FLAGS)
+
+    async def cancel_order(self, orderkey):
+        status_code = await self.send_order("DELETE", f"{PO_ENDPOINT}/{orderkey}")
+        if 200 <= status_code < 300:
+            self.sink.log(f"{datetime.now()} | ********** SUCCESSFULLY CANCELED ORDER {orderkey} **********")
+            self.sink.sound('sound/dodged.wav', SOUND_FLAGS)
         else:
-            print(f"{datetime.now()} | ********** {order_response.status_code}: FAILED TO CANCEL ORDER {orderkey} **********")
-            winsound.PlaySound('sound/codec.wav', winsound.SND_FILENAME | winsound.SND_ASYNC)
+            self.sink.log(f"{datetime.now()} | ********** {status_code}: FAILED TO CANCEL ORDER {orderkey} **********")
+            self.sink.sound('sound/codec.wav', SOUND_FLAGS)
 
     async def alert_trace(self, title, desc):
 
         if "entering" in title.lower():
 
-            # ignore all lotto/risky/swing plays
-            if "risky" in desc.lower() or "swing" in desc.lower() or "lotto" in desc.lower():
-                print(f"{datetime.now()} | ********** IGNORING RISKY/SWING/LOTTO PLAY **********")
+            # extract ticker, strike, contract type, expiry and entry price in one pass, flagged plays aren't read
+            try:
+                signal = parse_option_alert(desc, skip_flagged=True)
+            except AlertParseError as e:
+                self.sink.log(f"{datetime.now()} | ********** IGNORING MALFORMED ALERT: {e} **********")
                 return
 
-            arr = desc.split()
-
-            # extract ticker
-            for i in range(len(arr)):
-                if arr[i] == "Option:":
-                    ticker = arr[i + 1]
-                    strike = arr[i + 2]
-                    contract_type = arr[i + 3]
-                    expiry = arr[i + 4]
-
-                if arr[i] == "Entry:":
-                    if arr[i + 1][0] == "@" and arr[i + 1][1] == "$":
-                        entry_price = float(arr[i + 1][2:])
-                    else:
-                        entry_price = float(arr[i + 1])
-
-            if ticker == "SPX":
-                ticker = "SPXW"
+            # ignore all lotto/risky/swing plays
+            if signal.risky or signal.swing or signal.lotto:
+                self.sink.log(f"{datetime.now()} | ********** IGNORING RISKY/SWING/LOTTO PLAY **********")
+                return
 
-            # set expiry to today (0DTE)
-            current_year = datetime.now().year
-            date_parts = expiry.split('/')
-            month = int(date_parts[0])
-            day = int(date_parts[1])
+            # don't enter on a stalled or slow stream, the fills couldn't be followed
+            stale = self.feed.check(max_rtt=MAX_RTT) if self.feed is not None else ""
+            if stale:
+                self.sink.log(f"{datetime.now()} | ********** IGNORING ENTRY, STREAM STALE: {stale} **********")
+                return
 
-            expiry = "{:02d}{:02d}{:02d}".format(month, day, current_year % 100)
+            ticker = "SPXW" if signal.ticker == "SPX" else signal.ticker
 
             # combine variables to create symbol
-            symbol = f"{ticker}_{expiry}{contract_type}{strike}"
+            symbol = f"{ticker}_{signal.expiry:%m%d%y}{signal.contract_type[0]}{signal.strike}"
             # send post orders asynchronously
-            await self.enter_position(symbol, entry_price)
+            await self.enter_position(symbol, signal.entry_price)
 
         elif title == "EXIT":
 
+            position = self.positions.latest()
+            if position is None:
+                return
+            keys = position.keys
             # if EXIT alerted but no buys filled yet
-            if self.key_list and len(self.key_list[-1]['Limit']['Sell']) == 0 and len(self.key_list[-1]['Stop']['Sell']) == 0 and len(self.key_list[-1]['Limit']['Buy']) > 0:
-                for key in self.key_list[-1]['Limit']['Buy']:
-                    self.cancel_order(key)
+            if len(keys['Limit']['Sell']) == 0 and len(keys['Stop']['Sell']) == 0 and len(keys['Limit']['Buy']) > 0:
+                await asyncio.gather(*[self.cancel_order(key) for key in keys['Limit']['Buy'].copy()])
             # if EXIT alerted after all buys filled
-            if self.key_list and len(self.key_list[-1]['Limit']['Buy']) == 0 and len(self.key_list[-1]['Stop']['Sell']) > 0 and len(self.key_list[-1]['Limit']['Sell']) > 0:
+            if len(keys['Limit']['Buy']) == 0 and len(keys['Stop']['Sell']) > 0 and len(keys['Limit']['Sell']) > 0:
                 # replace all stop sells with market sells
-                for key in self.key_list[-1]['Stop']['Sell']:
-                    symbol = self.key_list[-1]['Symbol']
-                    self.replace_order_market(key, symbol)
-            # Remove template after exiting
-            # if self.key_list:
-            #     # slice last element off list
-            #     self.key_list = self.key_list[:-1]
+                await asyncio.gather(*[self.replace_order_market(key, position.symbol) for key in keys['Stop']['Sell'].copy()])
 
 # STREAMING DATA
 
@@ -355,7 +329,7 @@ class LiveT:
         epoch = datetime.utcfromtimestamp(0)
         return int((token_timestamp - epoch).total_seconds() * 1000)
 
-    def create_streaming_session(self):
+    def create_streaming_session(self, account=None):
         # grab streamer info
         principals_response = self.get_user_principals("streamerConnectionInfo,streamerSubscriptionKeys")
         # grab timestamp
@@ -364,45 +338,24 @@ class LiveT:
         socket_url = principals_response['streamerInfo']['streamerSocketUrl']
         # parse timestamp
         t_timestamp_ms = self.create_token_timestamp(token_timestamp=t_timestamp)
-        # define credentials dictionary used for authentication
-        credentials = {
-            "userid": principals_response['accounts'][0]['accountId'],
-            "token": principals_response['streamerInfo']['token'],
-            "company": principals_response['accounts'][0]['company'],
-            "segment": principals_response['accounts'][0]['segment'],
-            "cddomain": principals_response['accounts'][0]['accountCdDomainId'],
-            "usergroup": principals_response['streamerInfo']['userGroup'],
-            "accesslevel": principals_response['streamerInfo']['accessLevel'],
-            "authorized": "Y",
-            "timestamp": t_timestamp_ms,
-            "appid": principals_response['streamerInfo']['appId'],
-            "acl": principals_response['streamerInfo']['acl']
-        }
-
-        streaming_session = TdStreamerClient(websocket_url=socket_url, principal_data=principals_response, credentials=credentials)
+        # log in as the account the orders go to (ACCT_NUM) unless told otherwise, its credentials are its own
+        if account is None:
+            account_ids = [str(entry['accountId']) for entry in principals_response['accounts']]
+            account = account_ids.index(str(ACCT_NUM)) if str(ACCT_NUM) in account_ids else 0
+        credentials = streamer_credentials(principals_response, account, t_timestamp_ms)
+
+        streaming_session = TdStreamerClient(websocket_url=socket_url, principal_data=principals_response,
+                                             credentials=credentials, account=account)
+        # order activity is never dropped, whatever else is streaming
+        streaming_session.on('ACCT_ACTIVITY', self.process_stream, policy=BLOCK)
+        # account activity only streams on order events, so liveness comes from pings and TD's heartbeats
+        self.feed = streaming_session.monitor_feed(stall_after=STALL_AFTER)
         return streaming_session
 
 
 # RECORD/DATA MANAGEMENT
 
-    @staticmethod
-    def record_entry(time, action, ticker, strike, contracttype, bid, ask, bidasksize, last, totalvolume,
+    def record_entry(self, time, action, ticker, strike, contracttype, bid, ask, bidasksize, last, totalvolume,
                      openinterest, net):
-        new_entry = {
-            'Time': [time],
-            'Action': [action],
-            'Ticker': [ticker],
-            'Strike': [strike],
-            'C/P': [contracttype],
-            'bid': [bid],
-            'ask': [ask],
-            'bidAskSize': [bidasksize],
-            'last': [last],
-            'totalVolume': [totalvolume],
-            'openInterest': [openinterest],
-            'net': [net]
-        }
-        df = pd.read_csv("paperdata.csv")
-        row_dd = pd.DataFrame(new_entry)
-        new_dd = pd.concat([df, row_dd], ignore_index=True)
-        new_dd.to_csv("paperdata.csv", index=False)
+        self.sink.record([time, action, ticker, strike, contracttype, bid, ask, bidasksize, last, totalvolume,
+                          openinterest, net])
@@ -0,0 +1,146 @@
+import json
+import re
+
+# slots look like "@@name@@" inside the JSON strings of a template
+SLOT_RE = re.compile(r"@@(\w+)@@")
+
+
+class OrderTemplate:
+
+    def __init__(self, order: dict):
+        """An order body serialized to JSON once, with "@@name@@" string values
+        left as slots. render() fills the slots by byte concatenation, so no
+        dict is built and nothing is serialized at alert time.
+        Arguments:
+        ----
+        order {dict} -- The order JSON, with "@@name@@" wherever a value is
+            only known at alert time.
+        """
+
+        parts = SLOT_RE.split(json.dumps(order, separators=(",", ":")))
+        self.literals = [part.encode() for part in parts[0::2]]
+        self.slots = parts[1::2]
+
+    def render(self, **values: bytes) -> bytes:
+        """Returns the ready-to-send JSON body.
+        Arguments:
+        ----
+        values {bytes} -- One value per slot, already JSON-safe (see json_str).
+        """
+
+        chunks = [self.literals[0]]
+        for slot, literal in zip(self.slots, self.literals[1:]):
+            chunks.append(values[slot])
+            chunks.append(literal)
+        return b"".join(chunks)
+
+
+def json_str(value) -> bytes:
+    """Escapes a value for use inside a JSON string slot."""
+
+    return json.dumps(str(value))[1:-1].encode()
+
+
+def sell_leg(symbol="@@symbol@@") -> dict:
+    return {
+        "instruction": "SELL_TO_CLOSE",
+        "instrument": {
+            "assetType": "OPTION",
+            "symbol": symbol
+        },
+        "quantity": 1,
+    }
+
+
+def stop_order(stop_price="@@stop@@") -> dict:
+    return {
+        "orderStrategyType": "SINGLE",
+        "session": "NORMAL",
+        "duration": "DAY",
+        "orderType": "STOP",
+        "stopPrice": stop_price,
+        "orderLegCollection": [sell_leg()]
+    }
+
+
+def market_order() -> dict:
+    return {
+        "orderStrategyType": "SINGLE",
+        "session": "NORMAL",
+        "duration": "DAY",
+        "orderType": "MARKET",
+        "orderLegCollection": [sell_leg()]
+    }
+
+
+def bracket_order() -> dict:
+    """Limit buy that triggers an OCO of a limit sell at "target" and a stop at "stop"."""
+
+    return {
+        "orderType": "LIMIT",
+        "session": "NORMAL",
+        "price": "@@price@@",
+        "duration": "DAY",
+        "orderStrategyType": "TRIGGER",
+        "orderLegCollection": [
+            {
+                "quantity": 1,
+                "instruction": "BUY_TO_OPEN",
+                "instrument": {
+                    "assetType": "OPTION",
+                    "symbol": "@@symbol@@"
+                }
+            }
+        ],
+        "childOrderStrategies": [
+            {
+                "orderStrategyType": "OCO",
+                "childOrderStrategies": [
+                    {
+                        "orderStrategyType": "SINGLE",
+                        "session": "NORMAL",
+                        "duration": "DAY",
+                        "orderType": "LIMIT",
+                        "price": "@@target@@",
+                        "orderLegCollection": [sell_leg()]
+                    },
+                    stop_order()
+                ]
+            }
+        ]
+    }
+
+
+# built once at import, shared by every LiveT instance
+BRACKET_TEMPLATE = OrderTemplate(bracket_order())
+STOP_TEMPLATE = OrderTemplate(stop_order())
+MARKET_TEMPLATE = OrderTemplate(market_order())
+
+
+class BracketStrategy:
+
+    def __init__(self, size: int, stop: float, scale: list):
+        """One bracket entry of `size` contracts, each with its own target from
+        the `scale` ladder and a shared stop at `stop` times the entry price.
+        Arguments:
+        ----
+        size {int} -- Number of contracts, one bracket order each.
+        stop {float} -- Stop price as a multiple of the entry price.
+        scale {list} -- Limit sell targets as multiples of the entry price.
+        """
+
+        if size > len(scale):
+            raise ValueError(f"SIZE {size} needs {size} SCALE targets, got {len(scale)}")
+        self.size = size
+        self.stop = stop
+        self.scale = scale[:size]
+
+    def render(self, symbol: str, entryprice: float) -> list:
+        """Returns the JSON body of every bracket order for one entry."""
+
+        symbol = json_str(symbol)
+        price = ("%.2f" % entryprice).encode()
+        stop = str(round(entryprice * self.stop, 2)).encode()
+        return [BRACKET_TEMPLATE.render(symbol=symbol, price=price, stop=stop,
+                                        target=str(round(entryprice * scale, 2)).encode())
+                for scale in self.scale]
@@ -1,29 +1,88 @@
 import requests
+import asyncio
 from datetime import datetime, timedelta
-from pprint import pprint
 import numpy as np
-from pandas import pandas as pd
-import winsound
-from config import C_KEY, REFRESH
+from journal import TradeJournal
+from sink import BackgroundSink
+from chains import ChainCache
 
 # ENDPOINTS
 OC_ENDPOINT = "https://api.tdameritrade.com/v1/marketdata/chains"
 
+# streamed quotes older than this (seconds) are not trusted for a fill
+MAX_QUOTE_AGE = 5.0
+# seconds a fetched contract is reused, and how many chains or strikes are kept
+CHAIN_TTL = 5.0
+CHAIN_CACHE_SIZE = 32
+# fetch the whole chain on a cache miss instead of the alert's strike, see ChainCache
+WHOLE_CHAINS = False
+# underlyings whose 0DTE chains prefetch() loads, when it is called
+WATCHED = ["$SPX.X"]
+# option root of the 0DTE contracts an alert ticker trades, when it isn't the ticker itself
+OPTION_ROOTS = {"$SPX.X": "SPXW"}
+# last letter of a short alert's strike -> contract type
+CONTRACT_TYPES = {"c": "CALL", "p": "PUT"}
+
+
+def api_credentials():
+    # (client id, refresh token) from config.py, only read once the API is called so replays don't need it
+    from config import C_KEY, REFRESH
+    return C_KEY, REFRESH
+
+
+def option_symbol(ticker, strike, contract_type, expiry):
+    # "$SPX.X", "4000", "CALL", "2022-12-16" -> "SPXW_121622C4000", the symbol LEVELONE_OPTION streams
+    root = OPTION_ROOTS.get(ticker, ticker.lstrip("$"))
+    year, month, day = expiry.split("-")
+    return f"{root}_{month}{day}{year[2:]}{contract_type[0]}{strike}"
+
+
+def quote_data(quote):
+    # a streamed OPTION quote in the shape of a chain entry, so both sources read the same
+    return {
+        "symbol": quote.symbol, "bid": quote.bid_price, "ask": quote.ask_price, "last": quote.last_price,
+        "mark": quote.mark, "bidAskSize": f"{quote.bid_size}X{quote.ask_size}", "totalVolume": quote.total_volume,
+        "openInterest": quote.open_interest, "source": "stream"
+    }
+
+
 class PaperT:
 
-    def __init__(self):
+    def __init__(self, stream=None, quotes=None, journal=None, echo=True, clock=datetime.now):
+        """Keyword Arguments:
+        ----
+        stream {TdStreamerClient} -- If given, marks come from its OPTION
+            quote book and contracts first seen through REST are subscribed.
+        quotes {QuoteBook} -- A book to read marks from without a stream.
+        journal {TradeJournal} -- Where trades are recorded, paperdata.csv if None.
+        echo {bool} -- Print and play sounds, off for replays. (default: {True})
+        clock {callable} -- Returns the current datetime, a replay passes its
+            simulated clock. (default: {datetime.now})
+        """
+
         self.header = ""
         self.refresh_now = datetime.now()
         self.timestamp = ""
         self.open_trades = []
+        self.clock = clock
+        self.journal = TradeJournal("paperdata.csv") if journal is None else journal
+        # console output, sounds and journal rows are written by a background worker
+        self.sink = BackgroundSink(self.journal, echo=echo)
+        # streamed quotes, REST chain calls are only the cold-start fallback
+        self.stream = stream
+        self.quotes = stream.quote_book('OPTION') if stream is not None and quotes is None else quotes
+        self.rest_fetches = 0
+        # contracts fetched on a miss and reused for CHAIN_TTL seconds
+        self.chains = ChainCache(self.fetch_chain, ttl=CHAIN_TTL, maxsize=CHAIN_CACHE_SIZE, whole_chains=WHOLE_CHAINS)
 
 # TOKEN MANAGEMENT
 
     def get_access(self):
+        client_id, refresh_token = api_credentials()
         access_params = {
             "grant_type": "refresh_token",
-            "refresh_token": REFRESH,
-            "client_id": C_KEY
+            "refresh_token": refresh_token,
+            "client_id": client_id
         }
         access_response = requests.post(url="https://api.tdameritrade.com/v1/oauth2/token", data=access_params)
         access_data = access_response.json()
@@ -40,7 +99,7 @@ class PaperT:
     def fetch_api_json(self, ticker, strike, contract_type, expiry):
         # GET JSON
         option_data = {
-            "apikey": C_KEY,
+            "apikey": api_credentials()[0],
             "symbol": ticker,
             "contractType": contract_type,
             "includeQuotes": "TRUE",
@@ -60,6 +119,51 @@ class PaperT:
         # RETURN JSON
         return data
 
+    def fetch_chain(self, ticker, contract_type, expiry, strike=None):
+        # one strike, or the whole chain for one expiry and type: requests leaves out the None strike
+        self.rest_fetches += 1
+        return self.fetch_api_json(ticker, strike, contract_type, expiry)
+
+    def prefetch(self, underlyings=None):
+        # opt-in: load today's whole chains of the watched underlyings, e.g. right at the open
+        return self.chains.prefetch(WATCHED if underlyings is None else underlyings)
+
+    def get_option_data(self, ticker, strike, contract_type, expiry, symbol=None):
+        # latest streamed quote if there is a fresh one, otherwise one chain call
+        if symbol is None:
+            symbol = option_symbol(ticker, strike, contract_type, expiry)
+        if self.quotes is not None:
+            quote = self.quotes.get(symbol)
+            if quote is not None and quote.mark is not None and self.quotes.age(symbol) <= MAX_QUOTE_AGE:
+                return quote_data(quote)
+
+        # COLD START: not streamed yet (or stale), take it from the chain, cached or fetched
+        option_data = self.chains.lookup(symbol)
+        if option_data is None:
+            option_data = self.chains.contract(ticker, strike, contract_type, expiry)
+        self.watch(option_data['symbol'])
+        return option_data
+
+    def watch(self, symbol):
+        # subscribe a contract so its next quote comes from the stream
+        if self.stream is None:
+            return
+        subscription = self.stream.subscriptions.get('OPTION')
+        if subscription is not None and symbol in subscription.symbols:
+            return
+        self.stream.level_one_options([symbol])
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # not streaming yet, the request goes out with the first data request
+            return
+        self.stream.send_subscriptions_soon().add_done_callback(self.watch_sent)
+
+    def watch_sent(self, task):
+        # the contract stays on REST quotes until the next send goes through
+        if not task.cancelled() and task.exception() is not None:
+            self.sink.log(f"{self.clock()} | ********** FAILED TO SUBSCRIBE QUOTES: {task.exception()!r} **********")
+
     # Basic function that uses clues from description to find a match with current open trades
     def check_match_trade(self, desc):
         # Iterate through list of open trades started from the last one
@@ -81,45 +185,36 @@ class PaperT:
 
             # ignore all lotto plays
             if "lotto" in desc.lower():
-                print(f"{datetime.now()} | ********** IGNORING LOTTO **********")
+                self.sink.log(f"{self.clock()} | ********** IGNORING LOTTO **********")
                 return
 
-            # extract ticker
-            ticker = desc.split()[0]
-            if ticker == "$SPX":
-                ticker = "$SPX.X"
-
-            # extract strike price
-            strike = desc.split()[1][:-1]
-
-            # extract contract type
-            if desc.split()[1][-1] == "c":
-                contract_type = "CALL"
-            elif desc.split()[1][-1] == "p":
-                contract_type = "PUT"
-            else:
+            # "$SPX 4000c ...": ticker, then strike with the contract type glued on
+            words = desc.split()
+            contract_type = CONTRACT_TYPES.get(words[1][-1]) if len(words) > 1 else None
+            if contract_type is None:
+                self.sink.log(f"{self.clock()} | ********** IGNORING MALFORMED ALERT: {desc!r} **********")
                 return
 
-            # set expiry to today (0DTE)
-            expiry = str(datetime.now()).split()[0]
+            ticker = "$SPX.X" if words[0] == "$SPX" else words[0]
+            strike = words[1][:-1]
 
-            #  GET JSON!
-            data = self.fetch_api_json(ticker, strike, contract_type, expiry)
+            # set expiry to today (0DTE)
+            expiry = str(self.clock()).split()[0]
 
-            # extract symbol from json response
-            option_data = (data.popitem()[1]).popitem()[1][0]
+            # quote at the moment of the alert, streamed or fetched
+            option_data = self.get_option_data(ticker, strike, contract_type, expiry)
             symbol = option_data['symbol']
 
             # IF NEW TRADE (NOT ALREADY PRESENT IN OPEN TRADES)
             if symbol not in self.open_trades:
                 # add new trade to list and print data
-                print(f"{datetime.now()} | ENTERING: {[symbol, ticker, strike, contract_type, expiry]}")
-                pprint(option_data)
+                self.sink.log(self.clock(), "| ENTERING:", [symbol, ticker, strike, contract_type, expiry])
+                self.sink.pprint(option_data)
                 # NON-TIME SENSITIVE STUFF STARTS HERE
                 # update open trades list
                 self.open_trades.append([symbol, ticker, strike, contract_type, expiry, option_data['mark']])
-                pprint(f"OPEN TRADES: {self.open_trades}")
-                winsound.PlaySound('sound/entry.wav', winsound.SND_FILENAME)
+                self.sink.pprint(f"OPEN TRADES: {self.open_trades}")
+                self.sink.sound('sound/entry.wav')
 
                 self.record_entry(self.timestamp, title, ticker, strike, contract_type, option_data["bid"],
                                   option_data["ask"], option_data["bidAskSize"], option_data["last"],
@@ -134,24 +229,22 @@ class PaperT:
             contract_type = active_trade[3]
             expiry = active_trade[4]
 
-            data = self.fetch_api_json(ticker, strike, contract_type, expiry)
-
-            option_data = (data.popitem()[1]).popitem()[1][0]
+            option_data = self.get_option_data(ticker, strike, contract_type, expiry, active_trade[0])
 
             # update open trades list
             self.open_trades.remove(active_trade)
             active_trade.append(option_data['mark'])
 
-            print(f"{datetime.now()} | SCALING: {active_trade}")
-            pprint(option_data)
+            self.sink.log(self.clock(), "| SCALING:", list(active_trade))
+            self.sink.pprint(option_data)
             # NON-TIME SENSITIVE STUFF STARTS HERE
             # update open trades list
             self.open_trades.append(active_trade)
-            pprint(f"OPEN TRADES: {self.open_trades}")
+            self.sink.pprint(f"OPEN TRADES: {self.open_trades}")
 
             net = round(float(active_trade[-1]) - float(active_trade[5]), 2)
             if net > 0:
-                winsound.PlaySound('sound/profit.wav', winsound.SND_FILENAME)
+                self.sink.sound('sound/profit.wav')
 
             self.record_entry(self.timestamp, title, ticker, strike, contract_type, option_data["bid"],
                               option_data["ask"], option_data["bidAskSize"], option_data["last"],
@@ -166,52 +259,33 @@ class PaperT:
             contract_type = active_trade[3]
             expiry = active_trade[4]
 
-            data = self.fetch_api_json(ticker, strike, contract_type, expiry)
-
-            option_data = (data.popitem()[1]).popitem()[1][0]
+            option_data = self.get_option_data(ticker, strike, contract_type, expiry, active_trade[0])
 
             active_trade.append(option_data['mark'])
 
-            print(f"{datetime.now()} | EXITING {active_trade}")
-            pprint(option_data)
+            self.sink.log(self.clock(), "| EXITING", list(active_trade))
+            self.sink.pprint(option_data)
             # NON-TIME SENSITIVE STUFF STARTS HERE
             # update open trades list
             self.open_trades.remove(active_trade)
-            pprint(f"OPEN TRADES: {self.open_trades}")
+            self.sink.pprint(f"OPEN TRADES: {self.open_trades}")
 
             net = round(float(active_trade[-1]) - float(active_trade[5]), 2)
             if net < 0:
-                winsound.PlaySound('sound/badexit.wav', winsound.SND_FILENAME)
+                self.sink.sound('sound/badexit.wav')
             elif net > 0:
-                winsound.PlaySound('sound/goodexit.wav', winsound.SND_FILENAME)
+                self.sink.sound('sound/goodexit.wav')
 
             self.record_entry(self.timestamp, title, ticker, strike, contract_type, option_data["bid"],
                               option_data["ask"], option_data["bidAskSize"], option_data["last"],
                               option_data["totalVolume"], option_data["openInterest"], net)
 
         else:
-            winsound.PlaySound('sound/notify.wav', winsound.SND_FILENAME)
+            self.sink.sound('sound/notify.wav')
 
 # RECORD/DATA MANAGEMENT
 
-    @staticmethod
-    def record_entry(time, action, ticker, strike, contracttype, bid, ask, bidasksize, last, totalvolume,
+    def record_entry(self, time, action, ticker, strike, contracttype, bid, ask, bidasksize, last, totalvolume,
                      openinterest, net):
-        new_entry = {
-            'Time': [time],
-            'Action': [action],
-            'Ticker': [ticker],
-            'Strike': [strike],
-            'C/P': [contracttype],
-            'bid': [bid],
-            'ask': [ask],
-            'bidAskSize': [bidasksize],
-            'last': [last],
-            'totalVolume': [totalvolume],
-            'openInterest': [openinterest],
-            'net': [net]
-        }
-        df = pd.read_csv("paperdata.csv")
-        row_dd = pd.DataFrame(new_entry)
-        new_dd = pd.concat([df, row_dd], ignore_index=True)
-        new_dd.to_csv("paperdata.csv", index=False)
+        self.sink.record([time, action, ticker, strike, contracttype, bid, ask, bidasksize, last, totalvolume,
+                          openinterest, net])
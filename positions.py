@@ -0,0 +1,185 @@
+# POSITION STATES
+PENDING = "PENDING"        # bracket sent, no order key seen yet
+WORKING = "WORKING"        # order keys known, no buy filled yet
+IN_TRADE = "IN_TRADE"      # at least one Limit Buy filled
+BREAK_EVEN = "BREAK_EVEN"  # stops moved to break-even
+CLOSED = "CLOSED"          # every order key filled, canceled or replaced
+
+
+class Position:
+    """The order keys of one bracket entry, grouped like the old key_list dicts."""
+
+    __slots__ = ("symbol", "keys", "state", "exits")
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.keys = {'Limit': {'Buy': set(), 'Sell': set()}, 'Stop': {'Sell': set()}}
+        self.state = PENDING
+        # Sell keys attached so far; the OCO children only show up after their Limit Buy filled
+        self.exits = 0
+
+    def is_empty(self) -> bool:
+        return not self.keys['Limit']['Buy'] and not self.keys['Limit']['Sell'] and not self.keys['Stop']['Sell']
+
+    def as_dict(self) -> dict:
+        return {'Symbol': self.symbol, 'State': self.state,
+                'Limit': {'Buy': set(self.keys['Limit']['Buy']), 'Sell': set(self.keys['Limit']['Sell'])},
+                'Stop': {'Sell': set(self.keys['Stop']['Sell'])}}
+
+    def __repr__(self):
+        return f"Position({self.as_dict()!r})"
+
+
+class PositionIndex:
+
+    def __init__(self):
+        """Open positions indexed by order key and by symbol.
+        An ACCT_ACTIVITY message finds its position through its order key in
+        O(1), whichever position it belongs to. Only an OrderEntryRequest,
+        which introduces a key, is matched by symbol, to the newest open
+        position in that contract.
+        """
+
+        self.by_key = {}
+        self.by_symbol = {}
+        self.positions = []
+
+    def open(self, symbol: str) -> Position:
+        """Starts tracking a new bracket entry. Call before the orders go out so
+        no OrderEntryRequest can arrive ahead of its position."""
+
+        position = Position(symbol)
+        self.positions.append(position)
+        self.by_symbol.setdefault(symbol, []).append(position)
+        return position
+
+    def attach(self, orderkey: str, ordertype: str, orderinstruct: str, symbol: str) -> Position:
+        """Adds an order key from an OrderEntryRequest to the newest open position
+        in `symbol`. Returns None if no position is open in that contract."""
+
+        positions = self.by_symbol.get(symbol)
+        if not positions:
+            return None
+        position = positions[-1]
+        position.keys[ordertype][orderinstruct].add(orderkey)
+        self.by_key[orderkey] = (position, ordertype, orderinstruct)
+        if orderinstruct == 'Sell':
+            position.exits += 1
+        if position.state == PENDING:
+            position.state = WORKING
+        return position
+
+    def lookup(self, orderkey: str) -> Position:
+        entry = self.by_key.get(orderkey)
+        return entry[0] if entry is not None else None
+
+    def fill(self, orderkey: str) -> Position:
+        """Records a fill. A filled Limit Buy puts the position in the trade."""
+
+        entry = self.by_key.get(orderkey)
+        if entry is None:
+            return None
+        position, ordertype, orderinstruct = entry
+        if ordertype == 'Limit' and orderinstruct == 'Buy' and position.state in (PENDING, WORKING):
+            position.state = IN_TRADE
+        return position
+
+    def done(self, position: Position) -> bool:
+        """Whether nothing more can happen to a position: no key is left and
+        either no Limit Buy filled (the bracket was canceled) or the exits
+        the fill triggered have been attached and are gone too. A filled
+        position whose children aren't reported yet stays open."""
+
+        if not position.is_empty():
+            return False
+        return position.state in (PENDING, WORKING) or position.exits > 0
+
+    def discard(self, orderkey: str) -> Position:
+        """Stops tracking an order key. Closes its position once it is done()."""
+
+        entry = self.by_key.pop(orderkey, None)
+        if entry is None:
+            return None
+        position, ordertype, orderinstruct = entry
+        position.keys[ordertype][orderinstruct].discard(orderkey)
+        if self.done(position):
+            self.close(position)
+        return position
+
+    def take(self, position: Position, ordertype: str, orderinstruct: str) -> set:
+        """Removes and returns every key of one kind, e.g. all Stop Sells before
+        they are replaced."""
+
+        keys = position.keys[ordertype][orderinstruct]
+        taken = set(keys)
+        keys.clear()
+        for key in taken:
+            self.by_key.pop(key, None)
+        if self.done(position):
+            self.close(position)
+        return taken
+
+    def close(self, position: Position) -> None:
+        if position.state == CLOSED:
+            return
+        position.state = CLOSED
+        for keys in (position.keys['Limit']['Buy'], position.keys['Limit']['Sell'], position.keys['Stop']['Sell']):
+            for key in keys:
+                self.by_key.pop(key, None)
+        self.positions.remove(position)
+        same_symbol = self.by_symbol[position.symbol]
+        same_symbol.remove(position)
+        if not same_symbol:
+            del self.by_symbol[position.symbol]
+
+    def apply(self, activity: str, ordertype: str, orderinstruct: str, orderkey: str, price: str, symbol: str,
+              size: int) -> tuple:
+        """Applies one ACCT_ACTIVITY message to the position it belongs to.
+        Arguments:
+        ----
+        activity {str} -- Message type without the "Order" prefix, e.g. "Fill" or "UROUT".
+        size {int} -- Contracts per bracket entry (SIZE).
+        Returns:
+        ----
+        tuple -- (position, stop_keys). position is None if the order isn't
+            tracked. stop_keys are the Stop Sells to move to break-even, they
+            are already out of the index. It is empty unless this message is the
+            stop canceled by the first Limit Sell fill.
+        """
+
+        if activity == "EntryRequest":
+            return self.attach(orderkey, ordertype, orderinstruct, symbol), set()
+
+        position = self.lookup(orderkey)
+        if position is None:
+            return None, set()
+
+        if activity in ("Fill", "CancelRequest"):
+            if activity == "Fill":
+                self.fill(orderkey)
+            # market orders keep their key, the stop they replaced is still reported
+            if price != "MARKET":
+                self.discard(orderkey)
+
+        stop_keys = set()
+        if activity == "UROUT":
+            # the canceled order itself is done, take it out before looking at the rest of the bracket
+            self.discard(orderkey)
+            # the first Limit Sell filled and its OCO stop was canceled: move the other stops
+            if ordertype == "Stop" and orderinstruct == "Sell" and position.state == IN_TRADE \
+                    and size == len(position.keys['Limit']['Sell']) + 1:
+                position.state = BREAK_EVEN
+                stop_keys = self.take(position, 'Stop', 'Sell')
+
+        return position, stop_keys
+
+    def latest(self) -> Position:
+        """The newest open position, what an EXIT alert refers to."""
+
+        return self.positions[-1] if self.positions else None
+
+    def snapshot(self) -> list:
+        return [position.as_dict() for position in self.positions]
+
+    def __len__(self):
+        return len(self.positions)
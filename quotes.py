@@ -0,0 +1,133 @@
+import time
+
+from collections import namedtuple
+from types import MappingProxyType
+
+from fields import STREAM_FIELD_IDS
+from subscriptions import LEVEL_ONE_SERVICES
+from translate import field_identifier
+
+# namedtuple's _make without the classmethod call
+_new_tuple = tuple.__new__
+
+
+def _quote_type(service: str, endpoint: str):
+    ids = STREAM_FIELD_IDS[endpoint]
+    names = [field_identifier(ids[str(i)]) for i in range(len(ids))]
+    return namedtuple(f"{service.title().replace('_', '')}Quote", names)
+
+
+# one record type per Level One service, field i of a record is fields.py id i
+QUOTE_TYPES = {service: _quote_type(service, endpoint) for service, endpoint in LEVEL_ONE_SERVICES.items()}
+
+
+class QuoteBook:
+
+    def __init__(self, service: str = "OPTION", clock=time.monotonic):
+        """The latest quote per symbol of one Level One service.
+        Every delta is merged into its symbol's record as it arrives, so a
+        burst of updates leaves one current record per symbol instead of a
+        queue of stale dicts. Records are immutable tuples indexed by the
+        fields.py ids (quote[2] and quote.bid_price are the same field), a
+        merge swaps in a new one. A record someone holds never changes
+        under them, so reading a quote is a dict lookup with no copy.
+        Fields never sent for a symbol are None.
+        Arguments:
+        ----
+        service {str} -- QUOTE, OPTION, LEVELONE_FUTURES, LEVELONE_FUTURES_OPTIONS
+            or LEVELONE_FOREX. (default: {"OPTION"})
+        clock {callable} -- Time source for update times and age(), seconds.
+            A replay passes its simulated clock. (default: {time.monotonic})
+        """
+
+        if service not in QUOTE_TYPES:
+            raise ValueError(f"Unknown Level One service {service!r}, expected one of {list(QUOTE_TYPES)}")
+        self.service = service
+        self.quote_type = QUOTE_TYPES[service]
+        self.clock = clock
+        size = len(self.quote_type._fields)
+        self.empty = (None,) * size
+        # content key -> field id, the symbol comes in as "key"
+        self.slots = {str(i): i for i in range(size)}
+        self.slots['key'] = 0
+        self.quotes = {}
+        # monotonic time each symbol was last updated
+        self.updated = {}
+        # set once snapshot() has handed out self.quotes, the next merge copies it first
+        self._shared = False
+        self.merged = 0
+
+    def merge(self, content: dict, now: float = None) -> tuple:
+        """Merges one content entry (a full quote or a delta) into its symbol's
+        record and returns the new record."""
+
+        if self._shared:
+            self.quotes = dict(self.quotes)
+            self._shared = False
+        symbol = content.get('key')
+        old = self.quotes.get(symbol)
+        values = list(self.empty if old is None else old)
+        slots = self.slots
+        for raw, value in content.items():
+            slot = slots.get(raw)
+            if slot is not None:
+                values[slot] = value
+        quote = self.quotes[symbol] = _new_tuple(self.quote_type, values)
+        self.updated[symbol] = self.clock() if now is None else now
+        self.merged += 1
+        return quote
+
+    def merge_entry(self, entry: dict) -> None:
+        """Merges every content entry of one data entry of a frame."""
+
+        # merge() inlined, this runs for every update on the stream
+        if self._shared:
+            self.quotes = dict(self.quotes)
+            self._shared = False
+        now = self.clock()
+        quotes, updated, slots, empty, quote_type = self.quotes, self.updated, self.slots, self.empty, self.quote_type
+        count = 0
+        for content in entry.get('content', ()):
+            symbol = content.get('key')
+            old = quotes.get(symbol)
+            values = list(empty if old is None else old)
+            for raw, value in content.items():
+                slot = slots.get(raw)
+                if slot is not None:
+                    values[slot] = value
+            quotes[symbol] = _new_tuple(quote_type, values)
+            updated[symbol] = now
+            count += 1
+        self.merged += count
+
+    def merge_message(self, message: dict) -> None:
+        """Merges the entries of a whole decoded frame that belong to this
+        book's service, for callers reading frames themselves."""
+
+        for entry in message.get('data', ()):
+            if entry.get('service') == self.service:
+                self.merge_entry(entry)
+
+    def get(self, symbol: str) -> tuple:
+        """The latest quote for `symbol`, None if it hasn't been streamed."""
+
+        return self.quotes.get(symbol)
+
+    def age(self, symbol: str) -> float:
+        """Seconds since `symbol` was last updated, None if it never was."""
+
+        updated = self.updated.get(symbol)
+        return None if updated is None else self.clock() - updated
+
+    def snapshot(self) -> MappingProxyType:
+        """A read-only view of every quote that no later merge changes. Costs
+        nothing up front: the first merge after it copies the symbol index."""
+
+        self._shared = True
+        return MappingProxyType(self.quotes)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.quotes
+
+    def __len__(self):
+        return len(self.quotes)
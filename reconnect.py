@@ -0,0 +1,107 @@
+import random
+
+from collections import deque
+
+# BACKOFF PARAMETERS
+BACKOFF_BASE = 0.5  # Seconds before the first retry, at most (full jitter)
+BACKOFF_CAP = 30.0  # Longest wait between two attempts
+BACKOFF_FACTOR = 2.0
+
+
+class Backoff:
+
+    def __init__(self, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP, factor: float = BACKOFF_FACTOR,
+                 max_attempts: int = None, rng=random.random):
+        """Exponential backoff with full jitter: attempt n waits a random
+        time between 0 and min(cap, base * factor ** n), so clients dropped
+        together don't all come back at the same instant.
+        Keyword Arguments:
+        ----
+        base {float} -- Seconds, the ceiling of the first wait. (default: {BACKOFF_BASE})
+        cap {float} -- Seconds, the highest ceiling. (default: {BACKOFF_CAP})
+        factor {float} -- Growth of the ceiling per attempt. (default: {BACKOFF_FACTOR})
+        max_attempts {int} -- Attempts before giving up, None for no limit.
+        rng {callable} -- Returns a float in [0, 1), for reproducible waits.
+        """
+
+        self.base = base
+        self.cap = cap
+        self.factor = factor
+        self.max_attempts = max_attempts
+        self.rng = rng
+        self.attempt = 0
+
+    def next(self) -> float:
+        """The wait before the next attempt, in seconds.
+        Raises:
+        ----
+        ConnectionError: Once max_attempts have been made.
+        """
+
+        if self.max_attempts is not None and self.attempt >= self.max_attempts:
+            raise ConnectionError(f"GAVE UP RECONNECTING AFTER {self.attempt} ATTEMPTS")
+        ceiling = min(self.cap, self.base * self.factor ** self.attempt)
+        self.attempt += 1
+        return self.rng() * ceiling
+
+    def reset(self) -> None:
+        self.attempt = 0
+
+
+class SequenceGaps:
+
+    def __init__(self, on_gap=None, keep: int = 1000):
+        """Follows the "seq" of every content entry per service and key and
+        reports the numbers that never arrived. A seq at or below the last
+        one is a restarted sequence (a new session), not a gap.
+        Keyword Arguments:
+        ----
+        on_gap {callable} -- Called as on_gap(service, key, last, seq) for
+            every gap, prints a line if None.
+        keep {int} -- Gaps kept in self.recent. (default: {1000})
+        """
+
+        self.on_gap = on_gap or self._print_gap
+        # (service, key) -> last seq seen
+        self.last = {}
+        self.recent = deque(maxlen=keep)
+        self.gaps = 0
+        self.missing = 0
+        self.restarts = 0
+
+    @staticmethod
+    def _print_gap(service, key, last, seq) -> None:
+        print(f"************ GAP IN {service} {key}: SEQ {last} -> {seq}, {seq - last - 1} MISSING ************")
+
+    def check(self, message: dict) -> int:
+        """Checks the data entries of one decoded frame.
+        Returns:
+        ----
+        int -- Sequence numbers missing before this frame's entries.
+        """
+
+        missing = 0
+        last_seen = self.last
+        for entry in message.get('data', ()):
+            service = entry.get('service')
+            for content in entry.get('content', ()):
+                seq = content.get('seq')
+                if seq is None:
+                    continue
+                key = (service, content.get('key'))
+                last = last_seen.get(key)
+                last_seen[key] = seq
+                if last is None or seq == last + 1:
+                    continue
+                if seq <= last:
+                    self.restarts += 1
+                    continue
+                self.gaps += 1
+                self.missing += seq - last - 1
+                missing += seq - last - 1
+                self.recent.append((service, key[1], last, seq))
+                self.on_gap(service, key[1], last, seq)
+        return missing
+
+    def metrics(self) -> dict:
+        return {'gaps': self.gaps, 'missing': self.missing, 'restarts': self.restarts, 'tracked': len(self.last)}
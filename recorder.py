@@ -0,0 +1,213 @@
+import atexit
+import mmap
+import queue
+import struct
+import threading
+import time
+import weakref
+import zlib
+
+from codec import DEFAULT_CODEC
+
+# FILE LAYOUT
+# header: MAGIC, then the wall clock and the monotonic clock (ns) when recording started
+# blocks: compressed size and raw size, then the zlib stream of the block's records
+# records: receive time (monotonic ns) and frame size, then the frame as it came off the socket
+MAGIC = b"TDREC\x00\x00\x01"
+HEADER = struct.Struct("<8sqq")
+BLOCK_HEADER = struct.Struct("<II")
+RECORD_HEADER = struct.Struct("<qI")
+
+# RECORDER PARAMETERS
+BLOCK_SIZE = 1 << 18  # Frame bytes per compressed block
+COMPRESSION = 1       # zlib level, 1 keeps up with the firehose on a fraction of a core
+MAX_PENDING = 64      # Blocks waiting for the writer before record() blocks
+
+
+class RecordingError(ValueError):
+    """Raised when a file is not a stream recording."""
+
+
+class FrameRecorder:
+
+    def __init__(self, path: str, block_size: int = BLOCK_SIZE, level: int = COMPRESSION,
+                 max_pending: int = MAX_PENDING):
+        """Writes every raw frame received, with its monotonic receive time,
+        to a compressed, length-prefixed binary log. record() only appends to
+        a list in the receive loop; full blocks are packed, compressed and
+        written by a worker thread (zlib releases the GIL while it works).
+        Only a writer that is max_pending blocks behind makes record() wait,
+        no frame is ever dropped. Whatever is buffered is written on close()
+        or at interpreter exit.
+        Arguments:
+        ----
+        path {str} -- The log file, overwritten.
+        Keyword Arguments:
+        ----
+        block_size {int} -- Frame bytes buffered per block. (default: {BLOCK_SIZE})
+        level {int} -- zlib compression level. (default: {COMPRESSION})
+        max_pending {int} -- Queue bound, in blocks. (default: {MAX_PENDING})
+        """
+
+        self.path = path
+        self.block_size = block_size
+        self.level = level
+        self.file = open(path, "wb")
+        self.started = time.monotonic_ns()
+        self.file.write(HEADER.pack(MAGIC, time.time_ns(), self.started))
+        self.frames = []
+        self.size = 0
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.closed = False
+        # metrics, written by the worker
+        self.recorded = 0
+        self.blocks = 0
+        self.raw_bytes = 0
+        self.written_bytes = HEADER.size
+        self.thread = threading.Thread(target=self._run, name="frame-recorder", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def record(self, frame, received: int = None) -> None:
+        """Buffers one frame, str or bytes, stamped with time.monotonic_ns()
+        unless `received` is given."""
+
+        if received is None:
+            received = time.monotonic_ns()
+        self.frames.append((received, frame))
+        self.size += len(frame)
+        if self.size >= self.block_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Hands the buffered frames to the writer as one block."""
+
+        if self.frames:
+            self.queue.put(self.frames)
+            self.frames = []
+            self.size = 0
+
+    def _run(self) -> None:
+        pack = RECORD_HEADER.pack
+        while True:
+            frames = self.queue.get()
+            if frames is None:
+                return
+            parts = []
+            for received, frame in frames:
+                if isinstance(frame, str):
+                    frame = frame.encode()
+                parts.append(pack(received, len(frame)))
+                parts.append(frame)
+            raw = b"".join(parts)
+            block = zlib.compress(raw, self.level)
+            self.file.write(BLOCK_HEADER.pack(len(block), len(raw)))
+            self.file.write(block)
+            self.recorded += len(frames)
+            self.blocks += 1
+            self.raw_bytes += len(raw)
+            self.written_bytes += BLOCK_HEADER.size + len(block)
+
+    def metrics(self) -> dict:
+        return {'recorded': self.recorded, 'buffered': len(self.frames), 'blocks': self.blocks,
+                'raw_bytes': self.raw_bytes, 'written_bytes': self.written_bytes,
+                'ratio': self.raw_bytes / max(self.written_bytes, 1)}
+
+    def close(self, timeout: float = None) -> None:
+        """Writes out what is buffered and closes the file."""
+
+        if self.closed:
+            return
+        self.closed = True
+        self.flush()
+        self.queue.put(None)
+        self.thread.join(timeout)
+        self.file.close()
+        atexit.unregister(self.close)
+
+
+class FrameReader:
+
+    def __init__(self, path: str):
+        """Reads a FrameRecorder log through a memory map. Each block is
+        inflated once and its frames are handed out as memoryview slices of
+        it, no copy per frame. A block torn by a crash ends the iteration.
+        Arguments:
+        ----
+        path {str} -- The log file.
+        Raises:
+        ----
+        RecordingError: If the file doesn't start with the recording header.
+        """
+
+        self.path = path
+        # iterations still holding views of the map, closed before it is
+        self.iterators = weakref.WeakSet()
+        self.file = open(path, "rb")
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # mmap can't map an empty file
+            self.file.close()
+            raise RecordingError(f"{path} is empty")
+        if len(self.map) < HEADER.size or self.map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise RecordingError(f"{path} is not a stream recording")
+        _, self.started_wall, self.started = HEADER.unpack_from(self.map, 0)
+
+    def wall_time(self, received: int) -> float:
+        """Epoch seconds of a monotonic receive time from this recording."""
+
+        return (self.started_wall + received - self.started) / 1e9
+
+    def __iter__(self):
+        """Yields (receive time in monotonic ns, frame as a memoryview).
+        A view keeps its inflated block alive, bytes(frame) if only the frame is kept."""
+
+        frames = self._frames()
+        self.iterators.add(frames)
+        return frames
+
+    def _frames(self):
+        unpack_block, unpack_record = BLOCK_HEADER.unpack_from, RECORD_HEADER.unpack_from
+        record_size = RECORD_HEADER.size
+        view = memoryview(self.map)
+        try:
+            end = len(view)
+            offset = HEADER.size
+            while offset + BLOCK_HEADER.size <= end:
+                compressed, size = unpack_block(view, offset)
+                offset += BLOCK_HEADER.size
+                if offset + compressed > end:
+                    break
+                with view[offset:offset + compressed] as chunk:
+                    raw = zlib.decompress(chunk, bufsize=size)
+                offset += compressed
+                with memoryview(raw) as block:
+                    position = 0
+                    while position < size:
+                        received, length = unpack_record(block, position)
+                        position += record_size
+                        yield received, block[position:position + length]
+                        position += length
+        finally:
+            view.release()
+
+    def messages(self, codec=DEFAULT_CODEC):
+        """Yields (receive time in monotonic ns, decoded frame)."""
+
+        loads = codec.loads
+        for received, frame in self:
+            yield received, loads(frame)
+
+    def close(self) -> None:
+        for frames in list(self.iterators):
+            frames.close()
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
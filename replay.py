@@ -0,0 +1,380 @@
+import argparse
+import csv
+import heapq
+import os
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from chains import ChainCache
+from codec import DEFAULT_CODEC
+from cpus import available_cpus
+from journal import TradeJournal, FSYNC_NEVER
+from papertrade import PaperT, CHAIN_TTL, CHAIN_CACHE_SIZE, OPTION_ROOTS, quote_data
+from quotes import QuoteBook
+from recorder import FrameReader
+
+# recorded stream timestamps are epoch milliseconds, alerts are logged in market time
+MARKET_TZ = ZoneInfo("America/New_York")
+
+# "SPXW_121622C4000" -> root, month, day, year, C/P, strike
+OPTION_SYMBOL_RE = re.compile(r"^(.+)_(\d\d)(\d\d)(\d\d)([CP])([\d.]+)$")
+
+# event kinds, at the same instant quotes go first so an alert sees the quote stamped with its own time
+_QUOTE, _ALERT = 0, 1
+# quote event payloads
+_ENTRY, _CONTENT, _TRADE = range(3)
+
+# quote csv column -> LEVELONE_OPTION field id
+QUOTE_COLUMNS = {
+    "bid": "2", "ask": "3", "last": "4", "total_volume": "8", "open_interest": "9", "bid_size": "20",
+    "ask_size": "21", "mark": "41",
+}
+INT_COLUMNS = frozenset({"total_volume", "open_interest", "bid_size", "ask_size"})
+# TdStreamerClient.record() logs
+RECORDING_SUFFIX = ".tdrec"
+
+
+def market_time(value) -> datetime:
+    """A naive market-time datetime, like datetime.now() on the trading box,
+    from a datetime, an ISO string or an epoch timestamp in ms or seconds."""
+
+    if isinstance(value, datetime):
+        when = value
+    elif isinstance(value, (int, float)) or (isinstance(value, str) and value.replace(".", "", 1).isdigit()):
+        stamp = float(value)
+        # anything past the year 5138 in seconds is milliseconds
+        return datetime.fromtimestamp(stamp / 1000 if stamp > 1e11 else stamp, MARKET_TZ).replace(tzinfo=None)
+    else:
+        when = datetime.fromisoformat(value)
+    if when.tzinfo is not None:
+        when = when.astimezone(MARKET_TZ).replace(tzinfo=None)
+    return when
+
+
+def _rows(path: str) -> list:
+    # jsonl or csv by extension, one dict per line either way
+    with open(path, newline="") as f:
+        if path.endswith((".jsonl", ".json")):
+            return [DEFAULT_CODEC.loads(line) for line in f if line.strip()]
+        return list(csv.DictReader(f))
+
+
+def load_alerts(path: str, source: int = 1):
+    """Alert events from a log of {"time", "title", "desc"} lines (jsonl) or
+    rows (csv with that header), in the order they were posted."""
+
+    for seq, row in enumerate(_rows(path)):
+        yield market_time(row["time"]), _ALERT, source, seq, (row["title"], row["desc"])
+
+
+def _frame_events(messages, source: int, service: str):
+    # each data entry of `service` stamped with its own "timestamp", TIMESALE_OPTIONS prints update last
+    seq = 0
+    for message in messages:
+        for entry in message.get("data", ()):
+            entry_service = entry.get("service")
+            if entry_service == service:
+                payload = (_ENTRY, entry)
+            elif entry_service == "TIMESALE_OPTIONS":
+                payload = (_TRADE, [(c.get("key"), c.get("2"), c.get("3")) for c in entry.get("content", ())])
+            else:
+                continue
+            yield market_time(entry["timestamp"]), _QUOTE, source, seq, payload
+            seq += 1
+
+
+def load_frames(path: str, source: int = 0, service: str = "OPTION"):
+    """Quote events from recorded stream frames, one decoded frame per line
+    (jsonl), as the streamer received them."""
+
+    with open(path, "rb") as f:
+        yield from _frame_events((DEFAULT_CODEC.loads(line) for line in f if line.strip()), source, service)
+
+
+def load_recording(path: str, source: int = 0, service: str = "OPTION"):
+    """Quote events from a TdStreamerClient.record() log."""
+
+    with FrameReader(path) as reader:
+        yield from _frame_events((message for _, message in reader.messages()), source, service)
+
+
+def load_quotes(path: str, source: int = 0):
+    """Quote events from a csv with a time and a symbol column and either
+    quote columns (bid, ask, last, mark, bid_size, ask_size, total_volume,
+    open_interest, any subset) or timesale columns (price, size)."""
+
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        trades = "price" in reader.fieldnames
+        columns = [(name, QUOTE_COLUMNS[name], int if name in INT_COLUMNS else float)
+                   for name in reader.fieldnames if name in QUOTE_COLUMNS]
+        for seq, row in enumerate(reader):
+            when = market_time(row["time"])
+            if trades:
+                payload = (_TRADE, [(row["symbol"], float(row["price"]), int(float(row.get("size") or 0)))])
+            else:
+                content = {"key": row["symbol"]}
+                for name, field, cast in columns:
+                    if row[name] != "":
+                        content[field] = cast(float(row[name])) if cast is int else cast(row[name])
+                payload = (_CONTENT, content)
+            yield when, _QUOTE, source, seq, payload
+
+
+def load(path: str, source: int):
+    # quote events from any recording by its extension
+    if path.endswith(RECORDING_SUFFIX):
+        return load_recording(path, source)
+    if path.endswith((".jsonl", ".json")):
+        return load_frames(path, source)
+    return load_quotes(path, source)
+
+
+class ReplayClock:
+    """The simulated clock: datetime.now() for PaperT, time.monotonic() for
+    the quote book and the chain cache. It only moves when an event is replayed."""
+
+    __slots__ = ("now", "start", "elapsed")
+
+    def __init__(self, start: datetime):
+        self.now = start
+        self.start = start
+        self.elapsed = 0.0
+
+    def __call__(self) -> datetime:
+        return self.now
+
+    def seconds(self) -> float:
+        return self.elapsed
+
+    def advance(self, when: datetime) -> None:
+        if when != self.now:
+            self.now = when
+            self.elapsed = (when - self.start).total_seconds()
+
+
+class ReplayEngine:
+
+    def __init__(self, journal_path: str = "replay.csv", service: str = "OPTION"):
+        """Drives PaperT.alert_trace with recorded alerts against recorded
+        quotes, on a simulated clock and as fast as the events can be read.
+        Alerts and quotes are merged in time order, quotes first at the same
+        instant, and ties break on file order, so a replay of the same files
+        writes the same rows every time. Marks come from the QuoteBook the
+        quotes are merged into: a quote younger than MAX_QUOTE_AGE is read
+        like a streamed one, an older one is served through the chain cache
+        as the last known quote of its contract, as a REST call would have
+        been. An alert on a contract never quoted is skipped and counted.
+        Keyword Arguments:
+        ----
+        journal_path {str} -- Where the trades go, in the paperdata.csv
+            schema. Overwritten. (default: {"replay.csv"})
+        service {str} -- The Level One service of the recorded quotes. (default: {"OPTION"})
+        """
+
+        self.journal_path = journal_path
+        self.service = service
+        # symbol -> (root, expiry, contract type, strike), parsed once per symbol
+        self.contracts = {}
+
+    def _contract(self, symbol: str) -> tuple:
+        contract = self.contracts.get(symbol)
+        if contract is None:
+            match = OPTION_SYMBOL_RE.match(symbol)
+            if match is None:
+                contract = self.contracts[symbol] = ()
+            else:
+                root, month, day, year, side, strike = match.groups()
+                contract = self.contracts[symbol] = (root, f"20{year}-{month}-{day}",
+                                                     "CALL" if side == "C" else "PUT", strike)
+        return contract
+
+    def fetch_chain(self, book: QuoteBook, ticker: str, contract_type: str, expiry: str, strike=None) -> dict:
+        """The chain PaperT.fetch_chain would have got, built from the
+        latest quote of every contract in the book: only `strike` if one is
+        given, every strike if None."""
+
+        root = OPTION_ROOTS.get(ticker, ticker.lstrip("$"))
+        price = None if strike is None else float(strike)
+        by_strike = {}
+        for symbol, quote in book.quotes.items():
+            if quote.mark is None:
+                continue
+            contract = self._contract(symbol)
+            if contract and contract[0] == root and contract[1] == expiry and contract[2] == contract_type and \
+                    (price is None or float(contract[3]) == price):
+                by_strike[contract[3]] = [quote_data(quote)]
+        return {f"{expiry}:0": by_strike}
+
+    def run(self, *sources) -> dict:
+        """Replays every event of `sources`, e.g. load_alerts(...) and
+        load(...) per quote file, each in time order.
+        Returns:
+        ----
+        dict -- Counts and the replay's wall time, the trades are in journal_path.
+        """
+
+        events = heapq.merge(*sources)
+        first = next(events, None)
+        if first is None:
+            return {'events': 0, 'alerts': 0, 'skipped': 0, 'quotes': 0, 'open_trades': 0, 'chain_fetches': 0,
+                    'seconds': 0.0}
+
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        clock = ReplayClock(first[0])
+        book = QuoteBook(self.service, clock=clock.seconds)
+        journal = TradeJournal(self.journal_path, flush_rows=256, fsync=FSYNC_NEVER)
+        trader = PaperT(quotes=book, journal=journal, echo=False, clock=clock)
+        trader.chains = ChainCache(lambda ticker, contract_type, expiry, strike=None:
+                                   self.fetch_chain(book, ticker, contract_type, expiry, strike),
+                                   ttl=CHAIN_TTL, maxsize=CHAIN_CACHE_SIZE, clock=clock.seconds)
+
+        started = time.perf_counter()
+        count = alerts = skipped = 0
+        merge_entry, merge, advance = book.merge_entry, book.merge, clock.advance
+        try:
+            for when, kind, _, _, payload in heapq.merge([first], events):
+                count += 1
+                advance(when)
+                if kind == _QUOTE:
+                    op, data = payload
+                    if op == _ENTRY:
+                        merge_entry(data)
+                    elif op == _CONTENT:
+                        merge(data)
+                    else:
+                        for symbol, price, size in data:
+                            content = {"key": symbol, "4": price, "22": size}
+                            quote = book.get(symbol)
+                            if quote is None or quote.bid_price is None:
+                                # trades only, the last print is the mark
+                                content["41"] = price
+                            merge(content)
+                else:
+                    alerts += 1
+                    trader.timestamp = when
+                    try:
+                        trader.alert_trace(*payload)
+                    except KeyError:
+                        # no quote for the contract yet
+                        skipped += 1
+        finally:
+            # the sink's thread and the journal file, also when the trader raises
+            trader.sink.close()
+
+        return {'events': count, 'alerts': alerts, 'skipped': skipped, 'quotes': book.merged,
+                'open_trades': len(trader.open_trades), 'chain_fetches': trader.chains.misses,
+                'seconds': time.perf_counter() - started}
+
+
+def replay(alerts_path: str, quote_paths: list, journal_path: str = "replay.csv") -> dict:
+    """Replays one alert log against quote recordings (jsonl frames or csv)."""
+
+    sources = [load(path, source) for source, path in enumerate(quote_paths)]
+    sources.append(load_alerts(alerts_path, len(sources)))
+    return ReplayEngine(journal_path).run(*sources)
+
+
+def recorded_days(directory: str) -> list:
+    """The days recorded under `directory`, one subdirectory per day named so
+    they sort by date (e.g. 2022-12-16), each with an alerts.jsonl or
+    alerts.csv and its quote recordings.
+    Returns:
+    ----
+    list -- (day, alerts path, [quote paths]) in day order.
+    """
+
+    days = []
+    for day in sorted(os.listdir(directory)):
+        path = os.path.join(directory, day)
+        if not os.path.isdir(path):
+            continue
+        files = sorted(os.listdir(path))
+        alerts = [name for name in files if os.path.splitext(name)[0] == "alerts"]
+        if not alerts:
+            continue
+        quotes = [os.path.join(path, name) for name in files
+                  if name not in alerts and name.endswith((".jsonl", ".json", ".csv", RECORDING_SUFFIX))]
+        days.append((day, os.path.join(path, alerts[0]), quotes))
+    return days
+
+
+def _replay_day(day: str, alerts_path: str, quote_paths: list, journal_path: str) -> tuple:
+    return day, replay(alerts_path, quote_paths, journal_path)
+
+
+def replay_days(days: list, journal_path: str = "replay.csv", workers: int = None) -> dict:
+    """Replays every day on its own PaperT, a day per worker process, and
+    merges the day journals into `journal_path` in day order. Days don't
+    share any state, so the result is the same as replaying them one after
+    another, whatever the number of workers.
+    Arguments:
+    ----
+    days {list} -- (day, alerts path, [quote paths]), see recorded_days().
+    Keyword Arguments:
+    ----
+    journal_path {str} -- Every day's trades, in the paperdata.csv schema. Overwritten.
+    workers {int} -- Processes, available_cpus() if None, 1 replays in this one.
+    Returns:
+    ----
+    dict -- The counts summed over the days, 'days' with each day's stats
+        and the wall time in 'seconds'.
+    """
+
+    started = time.perf_counter()
+    workers = min(available_cpus() if workers is None else workers, max(len(days), 1))
+    with tempfile.TemporaryDirectory() as directory:
+        journals = [os.path.join(directory, f"{i:05d}.csv") for i in range(len(days))]
+        args = [(day, alerts_path, quote_paths, journal) for (day, alerts_path, quote_paths), journal
+                in zip(days, journals)]
+        if workers <= 1:
+            results = [_replay_day(*arg) for arg in args]
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                # biggest days first so a long one doesn't start last
+                order = sorted(range(len(args)), key=lambda i: -sum(os.path.getsize(p) for p in args[i][2]))
+                futures = {i: pool.submit(_replay_day, *args[i]) for i in order}
+                results = [futures[i].result() for i in range(len(args))]
+
+        # the header of the first journal, then the rows of every day in order
+        with open(journal_path, "w", newline="") as out:
+            for journal in journals:
+                if not os.path.exists(journal):
+                    continue
+                with open(journal, newline="") as f:
+                    header = f.readline()
+                    if out.tell() == 0:
+                        out.write(header)
+                    shutil.copyfileobj(f, out)
+
+    totals = {key: 0 for key in ('events', 'alerts', 'skipped', 'quotes', 'open_trades', 'chain_fetches')}
+    for _, stats in results:
+        for key in totals:
+            totals[key] += stats[key]
+    totals['days'] = dict(results)
+    totals['seconds'] = time.perf_counter() - started
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replays recorded alerts and quotes through PaperT.")
+    parser.add_argument("alerts", help="alert log, jsonl or csv of time, title, desc, or a directory with a "
+                                       "subdirectory per day (see recorded_days)")
+    parser.add_argument("quotes", nargs="*", help="stream recordings (.tdrec), recorded frames (jsonl) or "
+                                                   "quote/timesale csv")
+    parser.add_argument("--out", default="replay.csv", help="trades, in the paperdata.csv schema")
+    parser.add_argument("--workers", type=int, default=None, help="processes for a directory of days")
+    args = parser.parse_args()
+    if os.path.isdir(args.alerts):
+        stats = replay_days(recorded_days(args.alerts), args.out, args.workers)
+        del stats['days']
+    else:
+        stats = replay(args.alerts, args.quotes, args.out)
+    print(", ".join(f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}"
+                    for key, value in stats.items()))
@@ -0,0 +1,241 @@
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import websockets
+
+from codec import DEFAULT_CODEC
+from dispatch import BLOCK
+from recorder import FrameReader
+from stream import TdStreamerClient, set_recv_buffer
+
+# RUNTIME PARAMETERS
+LOOPS = ("asyncio", "uvloop")
+MAX_GAP = 0.5          # Longest pause, in seconds, kept between two replayed frames in benchmark mode
+
+
+def loop_factory(name: str = None):
+    """The constructor of a new event loop.
+    Keyword Arguments:
+    ----
+    name {str} -- "asyncio" or "uvloop", None for uvloop when it is installed.
+    Raises:
+    ----
+    ImportError: If uvloop is asked for and not installed.
+    ValueError: If the name is not one of LOOPS.
+    Returns:
+    ----
+    callable -- Returns a new loop, as asyncio.new_event_loop does.
+    """
+
+    if name is None:
+        try:
+            return loop_factory("uvloop")
+        except ImportError:
+            return asyncio.new_event_loop
+    if name == "uvloop":
+        import uvloop
+        return uvloop.new_event_loop
+    if name == "asyncio":
+        return asyncio.new_event_loop
+    raise ValueError(f"Unknown event loop {name!r}, expected one of {LOOPS}")
+
+
+def pin_thread(cpus) -> set:
+    """Keeps the calling thread on `cpus`, e.g. {2}. Threads it starts
+    afterwards (the recorder's writer, the sink) inherit the set, so give
+    it more than one CPU if they shouldn't share the loop's. Linux only,
+    elsewhere nothing is pinned.
+    Returns:
+    ----
+    set -- The CPUs the thread may run on now, empty if it couldn't be pinned.
+    """
+
+    if not hasattr(os, "sched_setaffinity"):
+        return set()
+    # pid 0 is the calling thread
+    os.sched_setaffinity(0, cpus)
+    return os.sched_getaffinity(0)
+
+
+def tune_client(client: TdStreamerClient, recv_buffer: int) -> TdStreamerClient:
+    """Sets the receive buffer of the client's socket, applied on every
+    connection from the next one on, and on the current one if it is open.
+    Only worth it when a measured burst overflows the kernel's autotuned
+    buffer: a fixed SO_RCVBUF turns autotuning off and is capped by
+    net.core.rmem_max; the size the kernel gave is logged (see
+    stream.set_recv_buffer).
+    Arguments:
+    ----
+    client {TdStreamerClient} -- The client.
+    recv_buffer {int} -- SO_RCVBUF in bytes, e.g. 4 << 20.
+    Returns:
+    ----
+    TdStreamerClient -- The client.
+    """
+
+    client.recv_buffer = recv_buffer
+    if client.connection is not None and client.connection.open:
+        set_recv_buffer(client.connection.transport.get_extra_info('socket'), recv_buffer)
+    return client
+
+
+def run(main, loop: str = None, cpus=None):
+    """Runs the coroutine `main` to completion on a new event loop, the
+    way asyncio.run does, with debug mode off whatever PYTHONASYNCIODEBUG
+    or -X dev say. The entry point for the bots, e.g.
+    runtime.run(trader_main(), cpus={3}).
+    Arguments:
+    ----
+    main {coroutine} -- The program.
+    Keyword Arguments:
+    ----
+    loop {str} -- "asyncio" or "uvloop", None for uvloop when it is installed.
+    cpus {set} -- CPUs to pin the loop's thread to, None to leave it.
+    Returns:
+    ----
+    What `main` returns.
+    """
+
+    if cpus is not None:
+        pin_thread(cpus)
+    with asyncio.Runner(debug=False, loop_factory=loop_factory(loop)) as runner:
+        return runner.run(main)
+
+
+def load_frames(path: str, limit: int = None) -> list:
+    """(seconds after the first frame, frame as str) from a recording, gaps
+    longer than MAX_GAP shortened to it."""
+
+    frames, offset, last = [], 0.0, None
+    with FrameReader(path) as reader:
+        for received, frame in reader:
+            if last is not None:
+                offset += min((received - last) / 1e9, MAX_GAP)
+            last = received
+            frames.append((offset, str(frame, "utf-8", "replace")))
+            if limit is not None and len(frames) >= limit:
+                break
+    return frames
+
+
+async def _replay_latency(frames: list, speed: float, recv_buffer: int) -> list:
+    """Serves `frames` on a local websocket on their recorded schedule to a
+    TdStreamerClient with a handler on every service in them.
+    Returns:
+    ----
+    list -- Seconds from each frame's send to its last entry reaching a handler.
+    """
+
+    codec = DEFAULT_CODEC
+    # per service, the frames that carry it and the handler's entry count once the frame is through
+    ends = {}
+    for number, (_, frame) in enumerate(frames):
+        for entry in codec.loads(frame).get('data', ()):
+            counts = ends.setdefault(entry['service'], [])
+            counts.append((number, (counts[-1][1] if counts else 0) + len(entry.get('content', ()))))
+    sent = [0.0] * len(frames)
+    latencies = []
+    done = asyncio.Event()
+
+    async def serve(websocket, path=None):
+        # answer the login, then the frames
+        request = codec.loads(await websocket.recv())['requests'][0]
+        await websocket.send(codec.dumps({"response": [{"service": request['service'], "command": request['command'],
+                                                        "requestid": request['requestid'], "timestamp": 0,
+                                                        "content": {"code": 0, "msg": "ok"}}]}))
+        start = time.perf_counter()
+        for number, (offset, frame) in enumerate(frames):
+            delay = start + offset / speed - time.perf_counter()
+            await asyncio.sleep(delay if delay > 0 else 0)
+            sent[number] = time.perf_counter()
+            await websocket.send(frame)
+        await done.wait()
+
+    def handler(service):
+        counts, position, received = ends[service], 0, 0
+
+        async def on_entry(content):
+            nonlocal position, received
+            received += 1
+            if received == counts[position][1]:
+                latencies.append(time.perf_counter() - sent[counts[position][0]])
+                position += 1
+                if len(latencies) == sum(len(counts) for counts in ends.values()):
+                    done.set()
+        return on_entry
+
+    server = await websockets.serve(serve, "127.0.0.1", 0)
+    # the local server takes any login
+    client = TdStreamerClient(websocket_url="replay", principal_data={
+        "accounts": [{"accountId": "0"}], "streamerInfo": {"appId": "replay", "token": "replay"}},
+        credentials={"userid": "0"})
+    client.websocket_url = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}/ws"
+    if recv_buffer is not None:
+        tune_client(client, recv_buffer)
+    for service in ends:
+        # every entry is counted, none may be dropped
+        client.on(service, handler(service), policy=BLOCK)
+    async with client:
+        await done.wait()
+    server.close()
+    await server.wait_closed()
+    return latencies
+
+
+def bench(path: str, loops=LOOPS, cpus=None, speed: float = 1.0, limit: int = None,
+          recv_buffer: int = None) -> dict:
+    """Replays a recording through the whole receive path (socket, decode,
+    dispatch, handler queues) on each event loop and measures the time
+    from each frame's send to its handler.
+    Arguments:
+    ----
+    path {str} -- A TdStreamerClient.record() file (.tdrec).
+    Keyword Arguments:
+    ----
+    loops {tuple} -- Loop implementations to compare; missing ones are skipped.
+    cpus {set} -- CPUs to pin to, None to leave the thread alone.
+    speed {float} -- Replay speed, 2.0 sends the frames twice as fast as recorded. (default: {1.0})
+    limit {int} -- Frames replayed, all if None.
+    recv_buffer {int} -- SO_RCVBUF of the client socket, None for the kernel's autotuning.
+    Returns:
+    ----
+    dict -- loop -> {"frames", "p50", "p99", "mean"} in seconds, None for a loop that isn't installed.
+    """
+
+    frames = load_frames(path, limit)
+    results = {}
+    for name in loops:
+        try:
+            loop_factory(name)
+        except ImportError:
+            results[name] = None
+            continue
+        latencies = sorted(run(_replay_latency(frames, speed, recv_buffer), loop=name, cpus=cpus))
+        results[name] = {"frames": len(latencies), "p50": statistics.median(latencies),
+                         "p99": latencies[min(len(latencies) - 1, int(len(latencies) * .99))],
+                         "mean": statistics.mean(latencies)}
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Frame-to-handler latency of a recorded stream, per event loop.")
+    parser.add_argument("recording", help="a TdStreamerClient.record() file (.tdrec)")
+    parser.add_argument("--loops", default=",".join(LOOPS), help="comma separated, of " + ", ".join(LOOPS))
+    parser.add_argument("--cpu", type=int, action="append", help="pin the loop thread to this CPU, repeatable")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed, 1.0 is as recorded")
+    parser.add_argument("--frames", type=int, default=None, help="replay only the first frames")
+    parser.add_argument("--recv-buffer", type=int, default=None,
+                        help="SO_RCVBUF in bytes, the kernel autotunes the buffer if not given")
+    args = parser.parse_args()
+    results = bench(args.recording, args.loops.split(","), set(args.cpu) if args.cpu else None, args.speed,
+                    args.frames, args.recv_buffer)
+    print(f"{'loop':<8} {'frames':>7} {'p50 (us)':>9} {'p99 (us)':>9} {'mean (us)':>10}")
+    for name, result in results.items():
+        if result is None:
+            print(f"{name:<8} not installed")
+            continue
+        print(f"{name:<8} {result['frames']:>7} {result['p50'] * 1e6:>9.1f} {result['p99'] * 1e6:>9.1f} "
+              f"{result['mean'] * 1e6:>10.1f}")
@@ -0,0 +1,120 @@
+import atexit
+import queue
+import threading
+from pprint import pprint
+
+try:
+    import winsound
+except ImportError:
+    # not on Windows: sounds are skipped, e.g. replays and benchmarks on Linux
+    winsound = None
+
+# SINK PARAMETERS
+MAX_PENDING = 10000  # Max queued items before log lines and sounds start being dropped
+
+# work item kinds
+_LOG, _PPRINT, _SOUND, _RECORD, _STOP = range(5)
+
+
+class BackgroundSink:
+
+    def __init__(self, journal=None, max_pending: int = MAX_PENDING, echo: bool = True):
+        """Takes console output, sound cues and journal rows off the hot path.
+        Everything is handed to a single worker thread through a bounded queue,
+        so items come out in the order they went in. When the queue is full,
+        log lines and sounds are dropped (and counted) rather than stalling the
+        caller, journal rows wait for room so none is ever lost. Whatever is
+        still queued is drained on close() or at interpreter exit. The
+        worker is only started by the first item.
+        Arguments:
+        ----
+        journal {TradeJournal} -- Journal that record() appends to. (default: {None})
+        max_pending {int} -- Queue bound. (default: {MAX_PENDING})
+        echo {bool} -- False drops log lines, pprints and sounds right away
+            and only writes journal rows, e.g. for replays. (default: {True})
+        """
+
+        self.journal = journal
+        self.echo = echo
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.dropped = 0
+        self.closed = False
+        # started by the first item, see _put
+        self.thread = None
+        self.starting = threading.Lock()
+
+    def log(self, *args) -> None:
+        """print(*args) on the worker, the arguments are only formatted there."""
+
+        self._offer((_LOG, args))
+
+    def pprint(self, obj) -> None:
+        """pprint(obj) on the worker. Pass a copy if obj is mutated afterwards."""
+
+        self._offer((_PPRINT, obj))
+
+    def sound(self, path: str, flags: int = None) -> None:
+        """winsound.PlaySound(path, flags) on the worker, winsound.SND_FILENAME
+        if flags is None. Nothing is queued where there is no winsound."""
+
+        if winsound is None:
+            return
+        self._offer((_SOUND, (path, winsound.SND_FILENAME if flags is None else flags)))
+
+    def record(self, row) -> None:
+        """Appends a row to the journal, blocking only if the queue is full."""
+
+        self._start()
+        self.queue.put((_RECORD, row))
+
+    def _start(self) -> None:
+        if self.thread is not None or self.closed:
+            return
+        with self.starting:
+            if self.thread is None:
+                thread = threading.Thread(target=self._run, name="background-sink", daemon=True)
+                thread.start()
+                atexit.register(self.close)
+                self.thread = thread
+
+    def _offer(self, item) -> None:
+        if not self.echo:
+            return
+        self._start()
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            kind, payload = self.queue.get()
+            try:
+                if kind == _STOP:
+                    return
+                elif kind == _LOG:
+                    print(*payload)
+                elif kind == _PPRINT:
+                    pprint(payload)
+                elif kind == _SOUND:
+                    winsound.PlaySound(*payload)
+                elif kind == _RECORD and self.journal is not None:
+                    self.journal.record(payload)
+            except Exception as e:
+                print(f"************ BACKGROUND SINK ERROR: {e!r} ************")
+
+    def close(self, timeout: float = None) -> None:
+        """Drains everything queued so far, then stops the worker and closes the journal."""
+
+        if self.closed:
+            return
+        self.closed = True
+        with self.starting:
+            if self.thread is not None:
+                self.queue.put((_STOP, None))
+                self.thread.join(timeout)
+        if self.journal is not None:
+            self.journal.close()
+        if self.dropped:
+            print(f"************ BACKGROUND SINK DROPPED {self.dropped} LOG LINES/SOUNDS ************")
+        atexit.unregister(self.close)
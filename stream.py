@@ -1,6 +1,7 @@
-import json
 import urllib.parse
 import asyncio
+import socket
+import time
 import websockets
 import textwrap
 
@@ -9,29 +10,122 @@ from typing import Union
 from websockets import exceptions, client
 # from websockets import exceptions as ws_exceptions
 from fields import STREAM_FIELD_IDS, CSV_FIELD_KEYS
+from codec import JsonCodec, DEFAULT_CODEC
+from dispatch import Dispatcher, ServiceQueue, DATA
+from quotes import QuoteBook
+from liveness import FeedMonitor, STALL_AFTER, HEARTBEAT_INTERVAL, PING_TIMEOUT
+from recorder import FrameRecorder
+from reconnect import Backoff, SequenceGaps
+from translate import TRANSLATORS, translate_data, decode_columns
+from subscriptions import field_id, validate_fields, plan_subscription, MAX_KEYS_PER_REQUEST
+from subscriptions import SERVICE_ENDPOINTS, LEVEL_ONE_SERVICES, TIMESALE_SERVICES, CHART_SERVICES, BOOK_SERVICES
+
+
+def streamer_credentials(principal_data: dict, account: int = 0, timestamp: int = None) -> dict:
+    """The credential a session logs in with, for one of the accounts of a
+    user principals response (fields streamerConnectionInfo and
+    streamerSubscriptionKeys).
+    Arguments:
+    ----
+    principal_data {dict} -- The user principals response.
+    Keyword Arguments:
+    ----
+    account {int} -- Index in principal_data['accounts'] of the account. (default: {0})
+    timestamp {int} -- streamerInfo.tokenTimestamp in epoch ms.
+    Returns:
+    ----
+    dict -- The credential, urlencoded into the login request.
+    """
+
+    account_data = principal_data['accounts'][account]
+    streamer_info = principal_data['streamerInfo']
+    return {
+        "userid": account_data['accountId'],
+        "token": streamer_info['token'],
+        "company": account_data['company'],
+        "segment": account_data['segment'],
+        "cddomain": account_data['accountCdDomainId'],
+        "usergroup": streamer_info['userGroup'],
+        "accesslevel": streamer_info['accessLevel'],
+        "authorized": "Y",
+        "timestamp": timestamp,
+        "appid": streamer_info['appId'],
+        "acl": streamer_info['acl']
+    }
+
+
+def set_recv_buffer(sock: socket.socket, size: int) -> int:
+    """Sets SO_RCVBUF on `sock` and logs what the kernel actually gave.
+    Setting it turns off the kernel's receive buffer autotuning for the
+    socket, and the size is capped by net.core.rmem_max (Linux reports
+    twice the size asked, for its bookkeeping).
+    Returns:
+    ----
+    int -- The effective SO_RCVBUF, read back with getsockopt.
+    """
+
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, size)
+    effective = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+    if effective < size:
+        print(f"************ SO_RCVBUF CAPPED AT {effective} BYTES, ASKED {size} (see net.core.rmem_max) ************")
+    else:
+        print(f"************ SO_RCVBUF SET TO {effective} BYTES, ASKED {size} ************")
+    return effective
 
 
 class TdStreamerClient:
 
-    def __init__(self, websocket_url=None, principal_data=None, credentials=None):
+    def __init__(self, websocket_url=None, principal_data=None, credentials=None, codec: JsonCodec = None,
+                 account: int = 0):
         self.websocket_url = f"wss://{websocket_url}/ws"
         self.credentials = credentials
         self.principal_data = principal_data
+        # index in principal_data['accounts'] of the account this session logs in and subscribes as
+        self.account = account
         self.data_requests = {'requests': []}
         self.fields_ids_dictionary = STREAM_FIELD_IDS
         self.csv_keys_dictionary = CSV_FIELD_KEYS
-        self.loop = None
+        self.translators = TRANSLATORS
+        # service -> Subscription, what the server has been asked for so far
+        self.subscriptions = {}
+        self.chunk_size = MAX_KEYS_PER_REQUEST
+        # data_requests before this index have gone out
+        self._sent_requests = 0
+        # routes each service's content to its own queue and handler, see on()
+        self.dispatcher = Dispatcher()
+        # service -> QuoteBook, see quote_book()
+        self.quote_books = {}
+        # writes every frame received to a binary log, see record()
+        self.recorder = None
+        # reconnects when the socket drops and checks "seq" for gaps, see auto_reconnect()
+        self.backoff = None
+        self.sequences = None
+        self.disconnects = 0
+        self.reconnects = 0
+        # seconds from each disconnect to the first data frame after it
+        self.recovery_times = []
+        self._disconnected_at = None
+        self._reconnecting = False
+        # liveness and latency of the feed, kept by heartbeat(), see monitor_feed()
+        self.monitor = None
+        # SO_RCVBUF in bytes set on every connection, None leaves it to the kernel's autotuning (see runtime.tune_client)
+        self.recv_buffer = None
+        # tasks this client runs, cancelled by close_stream
+        self.tasks = set()
+        self.receiver = None
+        # a receive loop owns the socket: dispatch_stream, or a StreamPool reader
+        self.reading = False
         self.connection: client.WebSocketClientProtocol = None
         self.print_to_console = True
-
-        try:
-            self.loop = asyncio.get_event_loop()
-        except websockets.WebSocketException:
-            self.loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(self.loop)
+        # JSON backend for every frame in and out, orjson/ujson when installed
+        self.codec = codec or DEFAULT_CODEC
 
         self.unsubscribe_count = 0
 
+    @property
+    def account_id(self) -> str:
+        return self.principal_data['accounts'][self.account]['accountId']
+
     def _build_login_request(self):
         # define a request
         login_request = {
@@ -40,7 +134,7 @@ class TdStreamerClient:
                     "service": "ADMIN",
                     "requestid": "0",
                     "command": "LOGIN",
-                    "account": self.principal_data['accounts'][0]['accountId'],
+                    "account": self.account_id,
                     "source": self.principal_data['streamerInfo']['appId'],
                     "parameters": {
                         "credential": urllib.parse.urlencode(self.credentials),
@@ -51,7 +145,7 @@ class TdStreamerClient:
             ]
         }
 
-        return json.dumps(login_request)
+        return self.codec.dumps(login_request)
 
     def _build_data_request(self) -> str:
         """Builds the data request for the streaming service.
@@ -62,13 +156,17 @@ class TdStreamerClient:
         [str] -- A JSON string with the login details.
         """
 
-        return json.dumps(self.data_requests)
+        # everything queued so far goes out in this frame
+        self._sent_requests = len(self.data_requests['requests'])
+        return self.codec.dumps(self.data_requests)
 
     def stream(self, print_to_console: bool = True) -> None:
         """Starts the stream and prints the output to the console.
         Initalizes the stream by building a login request, starting
         an event loop, creating a connection, passing through the
-        requests, and keeping the loop running.
+        requests, and receiving until the connection closes. Runs its
+        own event loop (asyncio.run), from async code use
+        `async with TdStreamerClient(...)` instead.
         Keyword Arguments:
         ----
         print_to_console {bool} -- Specifies whether the content is to be printed
@@ -78,17 +176,67 @@ class TdStreamerClient:
         # Print it to the console.
         self.print_to_console = print_to_console
 
-        # Connect to the Websocket.
-        self.loop.run_until_complete(self._connect())
+        asyncio.run(self._print_stream())
 
-        # Send the Request.
-        asyncio.ensure_future(self._send_message(self._build_data_request()))
+    async def _print_stream(self) -> None:
+        # Connect to the Websocket.
+        await self._connect()
 
-        # Start Recieving Messages.
-        asyncio.ensure_future(self._receive_message(return_value=False))
+        try:
+            # Send the Request.
+            await self._send_message(self._build_data_request())
+            if self.monitor is not None:
+                self._spawn(self.heartbeat())
+
+            # Recieve Messages until the connection closes, which closes the stream.
+            await self._receive_message(return_value=False)
+        except BaseException:
+            # e.g. Ctrl+C, which cancels this task
+            await self.close_stream()
+            raise
+
+    async def __aenter__(self) -> "TdStreamerClient":
+        return await self.start()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close_stream()
+
+    async def start(self, receive: bool = True) -> "TdStreamerClient":
+        """Connects, logs in, sends every queued request and runs
+        dispatch_stream in a task, so handlers registered with on() get the
+        data while the caller goes on. close_stream (or leaving an
+        `async with` block) stops it all.
+        Keyword Arguments:
+        ----
+        receive {bool} -- Start the receive loop. Without it the caller reads
+            the frames itself with next_frame(), e.g. a StreamPool; the
+            heartbeat still runs if monitor_feed() is on. (default: {True})
+        Returns:
+        ----
+        TdStreamerClient -- The client, connected.
+        """
 
-        # Keep the Loop going, until an exception is reached.
-        self.loop.run_forever()
+        self.print_to_console = False
+        await self._connect()
+        await self._replay_requests()
+        if receive:
+            self.receiver = self._spawn(self.dispatch_stream())
+        elif self.monitor is not None:
+            self._spawn(self.heartbeat())
+        return self
+
+    async def wait_closed(self) -> None:
+        """Returns once the task started by start() has ended, e.g. when the
+        server closed the connection."""
+
+        if self.receiver is not None:
+            await asyncio.wait([self.receiver])
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.ensure_future(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
 
     async def build_pipeline(self) -> websockets.WebSocketClientProtocol:
         """Builds a data pipeine for processing data.
@@ -141,6 +289,8 @@ class TdStreamerClient:
 
         # Create a connection.
         self.connection = await websockets.client.connect(self.websocket_url)
+        if self.recv_buffer:
+            set_recv_buffer(self.connection.transport.get_extra_info('socket'), self.recv_buffer)
 
         # See if we are connected.
         is_connected = await self._check_connection()
@@ -217,9 +367,15 @@ class TdStreamerClient:
 
                 # Grab the Message
                 message = await self.connection.recv()
+                if self.recorder is not None:
+                    self.recorder.record(message)
 
                 # Parse Message
                 message_decoded = await self._parse_json_message(message=message)
+                if self.monitor is not None:
+                    self.monitor.frame(message_decoded)
+                if self.backoff is not None:
+                    self._track(message_decoded)
 
                 if return_value:
                     return message_decoded
@@ -234,39 +390,303 @@ class TdStreamerClient:
 
             except websockets.exceptions.ConnectionClosed:
 
+                # a drop while logging back in is retried by _reconnect itself
+                if self._reconnecting:
+                    raise
+                if self.backoff is not None:
+                    await self._reconnect()
+                    continue
+
                 # stop the connection if there is an error.
                 await self.close_stream()
                 break
 
-    async def _parse_json_message(self, message: str) -> dict:
+    def on(self, service: str, handler, policy: str = None, maxsize: int = 1000, kind: str = DATA) -> ServiceQueue:
+        """Registers a coroutine handler for one service, used by dispatch_stream.
+        Arguments:
+        ----
+        service {str} -- e.g. "ACCT_ACTIVITY" or "OPTION", None for every
+            other service of that kind.
+        handler {coroutine function} -- Awaited with each content entry
+            (each response or notify entry for those kinds).
+        Keyword Arguments:
+        ----
+        policy {str} -- What a full queue does: "block", "drop-oldest" or
+            "coalesce-latest" (newest entry per symbol). None for
+            coalesce-latest on level-one quotes and drop-oldest elsewhere;
+            pass "block" for streams that must not lose an entry, like
+            ACCT_ACTIVITY for order tracking.
+        maxsize {int} -- The queue bound. (default: {1000})
+        kind {str} -- "data", "response" or "notify". (default: {"data"})
+        Returns:
+        ----
+        ServiceQueue -- The handler's queue.
+        """
+
+        return self.dispatcher.register(service, handler, policy=policy, maxsize=maxsize, kind=kind)
+
+    async def dispatch_stream(self, drain: bool = True) -> None:
+        """Receives frames and routes their parts to the handlers registered
+        with on(), until the connection closes.
+        Keyword Arguments:
+        ----
+        drain {bool} -- Let the handlers finish what is queued before
+            returning. (default: {True})
+        """
+
+        self.dispatcher.start()
+        heartbeat = self._spawn(self.heartbeat()) if self.monitor is not None else None
+        self.reading = True
+        try:
+            while True:
+                message = await self.next_frame()
+                if message is None:
+                    break
+                await self.dispatcher.dispatch(message)
+        finally:
+            self.reading = False
+            if heartbeat is not None:
+                heartbeat.cancel()
+                await asyncio.gather(heartbeat, return_exceptions=True)
+            await self.dispatcher.stop(drain=drain)
+
+    async def next_frame(self) -> dict:
+        """Receives and decodes the next frame, noting it in the recording,
+        the feed monitor and the sequence check. Reconnects when the socket
+        drops if auto_reconnect() is on.
+        Returns:
+        ----
+        dict -- The frame, None once the connection is closed for good.
+        """
+
+        while True:
+            try:
+                message = await self.connection.recv()
+            except websockets.exceptions.ConnectionClosed:
+                if self.backoff is None:
+                    return None
+                await self._reconnect()
+                continue
+            if self.recorder is not None:
+                self.recorder.record(message)
+            message = await self._parse_json_message(message=message)
+            if self.monitor is not None:
+                self.monitor.frame(message)
+            if self.backoff is not None:
+                self._track(message)
+            if self.dispatcher.waiters:
+                self.dispatcher.answer(message)
+            return message
+
+    def quote_book(self, service: str = 'OPTION') -> QuoteBook:
+        """A book of the latest quote per symbol, kept current by dispatch_stream.
+        Deltas are merged as frames are read, ahead of any handler queue.
+        Arguments:
+        ----
+        service {str} -- A Level One service, e.g. "OPTION" or "QUOTE".
+        Returns:
+        ----
+        QuoteBook -- The book, one per service; asking again returns the same one.
+        """
+
+        if service not in self.quote_books:
+            self.quote_books[service] = QuoteBook(service)
+            self.dispatcher.tap(service, self.quote_books[service].merge_entry)
+        return self.quote_books[service]
+
+    def auto_reconnect(self, backoff: Backoff = None, on_gap=None) -> None:
+        """Keeps the stream up: when the socket drops, _receive_message and
+        dispatch_stream reconnect with jittered exponential backoff, log in
+        again and send every request in data_requests again, then carry on.
+        While it is on, the "seq" of every content entry is checked and gaps
+        are reported, and the time from each disconnect to the first data
+        frame after it is kept in recovery_times.
+        Keyword Arguments:
+        ----
+        backoff {Backoff} -- The retry schedule, Backoff() if None.
+        on_gap {callable} -- on_gap(service, key, last, seq), see SequenceGaps.
+        """
+
+        self.backoff = backoff or Backoff()
+        self.sequences = SequenceGaps(on_gap)
+
+    def monitor_feed(self, stall_after: float = STALL_AFTER, data_deadline: float = None,
+                     interval: float = HEARTBEAT_INTERVAL, ping_timeout: float = PING_TIMEOUT) -> FeedMonitor:
+        """Watches the feed: dispatch_stream (or stream()) runs heartbeat(),
+        which pings the server every `interval` seconds and keeps the round
+        trips, and every frame read is noted with its lag behind the server's
+        timestamp. Check monitor.check() or monitor.healthy() before acting
+        on the data, e.g. before sending an order.
+        Keyword Arguments:
+        ----
+        stall_after {float} -- Seconds of silence before the feed is stalled. (default: {STALL_AFTER})
+        data_deadline {float} -- Seconds without a data frame before the feed
+            is stalled, None to only require frames or pongs.
+        interval {float} -- Seconds between two pings. (default: {HEARTBEAT_INTERVAL})
+        ping_timeout {float} -- Seconds to wait for a pong. (default: {PING_TIMEOUT})
+        Returns:
+        ----
+        FeedMonitor -- The monitor, also self.monitor.
+        """
+
+        self.monitor = FeedMonitor(stall_after, data_deadline, interval, ping_timeout)
+        return self.monitor
+
+    def _track(self, message: dict) -> None:
+        if self._disconnected_at is not None and 'data' in message:
+            self.recovery_times.append(time.monotonic() - self._disconnected_at)
+            self._disconnected_at = None
+        self.sequences.check(message)
+
+    async def _reconnect(self) -> None:
+        """Connects and logs in again until it works, then replays data_requests.
+        Raises:
+        ----
+        ConnectionError: If the backoff gives up.
+        ValueError: If the login is refused.
+        """
+
+        self.disconnects += 1
+        self._disconnected_at = time.monotonic()
+        self.backoff.reset()
+        self._reconnecting = True
+        try:
+            while True:
+                delay = self.backoff.next()
+                print(f"************ STREAM DISCONNECTED, RECONNECTING IN {delay:.2f}s "
+                      f"(ATTEMPT {self.backoff.attempt}) ************")
+                await asyncio.sleep(delay)
+                try:
+                    if await self._connect() is None:
+                        raise ConnectionError("CONNECTION CLOSED BEFORE LOGIN")
+                    await self._replay_requests()
+                except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException) as e:
+                    print(f"************ RECONNECT FAILED: {e!r} ************")
+                    continue
+                self.reconnects += 1
+                return
+        finally:
+            self._reconnecting = False
+
+    async def _replay_requests(self) -> int:
+        """Sends every request in data_requests again, e.g. on a new connection.
+        Returns:
+        ----
+        int -- The number of requests sent.
+        """
+
+        requests = self.data_requests['requests']
+        self._sent_requests = len(requests)
+        if requests:
+            await self._send_message(self.codec.dumps(self.data_requests))
+        return len(requests)
+
+    def stream_metrics(self) -> dict:
+        """Disconnects, reconnects, recovery times and sequence gaps."""
+
+        metrics = {'disconnects': self.disconnects, 'reconnects': self.reconnects,
+                   'recovery_times': list(self.recovery_times)}
+        if self.sequences is not None:
+            metrics.update(self.sequences.metrics())
+        if self.monitor is not None:
+            metrics['feed'] = self.monitor.metrics()
+        return metrics
+
+    def record(self, path: str, **kwargs) -> FrameRecorder:
+        """Starts writing every frame received, as it came off the socket and
+        with its monotonic receive time, to a compressed log. The writing is
+        done by a worker thread, the receive loop only buffers the frame.
+        Read it back with recorder.FrameReader, replay.py takes it as quotes.
+        Arguments:
+        ----
+        path {str} -- The log file, e.g. "2022-12-16.tdrec". Overwritten.
+        Keyword Arguments:
+        ----
+        **kwargs -- Passed to FrameRecorder (block_size, level, max_pending).
+        Returns:
+        ----
+        FrameRecorder -- The recorder, for its metrics.
+        """
+
+        self.stop_recording()
+        self.recorder = FrameRecorder(path, **kwargs)
+        return self.recorder
+
+    def stop_recording(self) -> None:
+        """Writes out the frames still buffered and closes the log."""
+
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def queue_metrics(self) -> dict:
+        """Depth, high water mark and delivered/dropped/coalesced counts of
+        every handler queue."""
+
+        return self.dispatcher.metrics()
+
+    async def _parse_json_message(self, message: Union[str, bytes]) -> dict:
         """Parses incoming messages from the stream
         Arguments:
         ----
-        message {str} -- The JSON string needing to be parsed.
+        message {Union[str, bytes]} -- The JSON string needing to be parsed.
         Returns:
         ----
         dict -- A python dictionary containing the original values.
         """
 
-        try:
-            message_decoded = json.loads(message)
-        except:
-            message = message.encode('utf-8').replace(b'\xef\xbf\xbd', bytes('"None"','utf-8')).decode('utf-8')
-            message_decoded = json.loads(message)
+        # bad values are repaired by the codec, see codec.repair
+        return self.codec.loads(message)
 
-        return message_decoded
 
+    def translate(self, message: dict) -> list:
+        """Turns the numeric field keys of a data message into named records.
+        Arguments:
+        ----
+        message {dict} -- A decoded message from the stream.
+        Returns:
+        ----
+        list -- (service, records) for each entry in message['data'], e.g.
+            records[0].bid_price for OPTION. Empty for responses and notifies.
+        """
+
+        return translate_data(message.get('data', []))
+
+    def translate_columns(self, messages: List[dict]) -> dict:
+        """Decodes the data of many messages at once into column buffers.
+        Arguments:
+        ----
+        messages {List[dict]} -- Decoded messages from the stream.
+        Returns:
+        ----
+        dict -- service -> {field name -> column}, see translate.decode_columns.
+        """
+
+        return decode_columns([entry for message in messages for entry in message.get('data', [])])
 
     async def heartbeat(self) -> None:
-        """Sending heartbeat to server every 5 seconds."""
+        """Pings the server every monitor.interval seconds, at the protocol
+        level, and notes the round trip in self.monitor. Runs until it is
+        cancelled or the connection closes for good; the receive loop is the
+        one that closes the stream or reconnects."""
 
+        monitor = self.monitor
         while True:
             try:
-                await self.connection.send('ping')
-                await asyncio.sleep(5)
+                pong = await self.connection.ping()
+                sent = monitor.ping()
+                try:
+                    await asyncio.wait_for(pong, monitor.ping_timeout)
+                    # timed from its own ping, not one whose pong was lost
+                    monitor.pong(sent)
+                except asyncio.TimeoutError:
+                    monitor.timeout()
             except websockets.exceptions.ConnectionClosed:
-                self.close_stream()
-                break
+                monitor.lost()
+                if self.backoff is None:
+                    break
+            monitor.update()
+            await asyncio.sleep(monitor.interval)
 
     def _new_request_template(self) -> dict:
         """Serves as a template to build new service requests.
@@ -284,7 +704,7 @@ class TdStreamerClient:
             "service": None,
             "requestid": service_count,
             "command": None,
-            "account": self.principal_data['accounts'][0]['accountId'],
+            "account": self.account_id,
             "source": self.principal_data['streamerInfo']['appId'],
             "parameters": {
                 "keys": None,
@@ -306,39 +726,37 @@ class TdStreamerClient:
         Returns:
         ----
         Union[List[str], str] -- The field or fields that have been validated.
+            Unknown fields are left out of a list, a single one returns None.
+            Use validate_fields to have them reported.
         """
 
-        # initalize a new list.
-        arg_list = []
-
         # see if the argument is a list or not.
         if isinstance(argument, list):
 
-            for arg in argument:
-
-                arg_str = str(arg)
-                key_list = list(self.fields_ids_dictionary[endpoint].keys())
-                val_list = list(self.fields_ids_dictionary[endpoint].values())
-
-                if arg_str in key_list:
-                    arg_list.append(arg_str)
-                elif arg_str in val_list:
-                    key_value = key_list[val_list.index(arg_str)]
-                    arg_list.append(key_value)
-
-            return arg_list
+            # id or name -> id, both looked up in the precomputed indexes
+            arg_list = [field_id(arg, endpoint) for arg in argument]
+            return [arg for arg in arg_list if arg is not None]
 
         else:
 
-            arg_str = str(argument)
-            key_list = list(self.fields_ids_dictionary[endpoint].keys())
-            val_list = list(self.fields_ids_dictionary[endpoint].values())
+            return field_id(argument, endpoint)
+
+    def validate_fields(self, fields: List[Union[str, int]], endpoint: str) -> List[str]:
+        """Validates a whole field list for one service.
+        Arguments:
+        ----
+        fields {List[Union[str, int]]} -- Field ids or names, for example
+            ["bid-price", "ask-price", 41].
+        endpoint {str} -- The subscription service, for example "level_one_option".
+        Raises:
+        ----
+        UnknownFieldError: Listing every field the service doesn't have.
+        Returns:
+        ----
+        List[str] -- The field ids, in order and without duplicates.
+        """
 
-            if arg_str in key_list:
-                return arg_str
-            elif arg_str in val_list:
-                key_value = key_list[val_list.index(arg_str)]
-                return key_value
+        return validate_fields(fields, endpoint)
 
     def quality_of_service(self, qos_level: str) -> None:
         """Quality of Service Subscription.
@@ -396,37 +814,186 @@ class TdStreamerClient:
 
         self.data_requests['requests'].append(request)
 
-    async def unsubscribe(self, service: str) -> dict:
-        """Unsubscribe from a service.
+    def _subscribe(self, service: str, symbols: List[str], fields: List[Union[str, int]] = None) -> int:
+        """Queues the requests that subscribe `symbols` on `service`.
+        Symbol lists longer than chunk_size are split over several requests.
+        Symbols already subscribed with the same fields are skipped and new
+        ones go out as ADD commands, so growing a subscription never resends
+        it. Asking for different fields resubscribes every symbol; leaving
+        them out keeps the ones the service is subscribed with.
+        Arguments:
+        ----
+        service {str} -- The stream service, e.g. "OPTION".
+        symbols {List[str]} -- The symbols to subscribe.
+        fields {List[Union[str, int]]} -- Field ids or names. If None, the service's
+            current fields, or all fields on a new subscription.
+        Raises:
+        ----
+        UnknownFieldError: If a field isn't one of the service's.
+        Returns:
+        ----
+        int -- The number of requests queued.
+        """
+
+        endpoint = SERVICE_ENDPOINTS[service]
+        current = self.subscriptions.get(service)
+        if fields is None:
+            # adding symbols, e.g. PaperT.watch, must not widen a custom field list to every field
+            fields = current.fields.split(",") if current is not None else list(self.fields_ids_dictionary[endpoint])
+        field_ids = validate_fields(fields, endpoint)
+
+        subscription, commands = plan_subscription(
+            current, service, [symbol.upper() for symbol in symbols], field_ids, self.chunk_size
+        )
+        self.subscriptions[service] = subscription
+
+        for command, keys in commands:
+            request = self._new_request_template()
+            request['service'] = service
+            request['command'] = command
+            request['parameters']['keys'] = ','.join(keys)
+            request['parameters']['fields'] = subscription.fields
+            self.data_requests['requests'].append(request)
+
+        return len(commands)
+
+    def subscribe(self, service: str, symbols: List[str], fields: List[Union[str, int]] = None) -> int:
+        """Subscribes to any stream service by name, e.g. "TIMESALE_OPTIONS". See _subscribe.
+        Raises:
+        ----
+        ValueError: If the service is unknown.
+        """
+
+        return self._subscribe(self._check_service(service, SERVICE_ENDPOINTS), symbols, fields)
+
+    def level_one_quotes(self, symbols: List[str], fields: List[Union[str, int]] = None) -> int:
+        """Subscribes to the QUOTE service, Level One equity quotes. See _subscribe."""
+
+        return self._subscribe('QUOTE', symbols, fields)
+
+    def level_one_options(self, symbols: List[str], fields: List[Union[str, int]] = None) -> int:
+        """Subscribes to the OPTION service, Level One option quotes. See _subscribe."""
+
+        return self._subscribe('OPTION', symbols, fields)
+
+    def level_one(self, service: str, symbols: List[str], fields: List[Union[str, int]] = None) -> int:
+        """Subscribes to any Level One service: QUOTE, OPTION, LEVELONE_FUTURES,
+        LEVELONE_FUTURES_OPTIONS or LEVELONE_FOREX. See _subscribe."""
+
+        return self._subscribe(self._check_service(service, LEVEL_ONE_SERVICES), symbols, fields)
+
+    def timesale(self, symbols: List[str], fields: List[Union[str, int]] = None,
+                 service: str = 'TIMESALE_EQUITY') -> int:
+        """Subscribes to Time & Sales: TIMESALE_EQUITY, TIMESALE_OPTIONS,
+        TIMESALE_FUTURES or TIMESALE_FOREX. See _subscribe."""
+
+        return self._subscribe(self._check_service(service, TIMESALE_SERVICES), symbols, fields)
+
+    def chart(self, symbols: List[str], fields: List[Union[str, int]] = None, service: str = 'CHART_EQUITY') -> int:
+        """Subscribes to minute candles: CHART_EQUITY, CHART_OPTIONS or
+        CHART_FUTURES. See _subscribe."""
+
+        return self._subscribe(self._check_service(service, CHART_SERVICES), symbols, fields)
+
+    def level_two(self, symbols: List[str], fields: List[Union[str, int]] = None, service: str = 'LISTED_BOOK') -> int:
+        """Subscribes to an order book: LISTED_BOOK, NYSE_BOOK, NASDAQ_BOOK,
+        OPTIONS_BOOK, FUTURES_BOOK or FOREX_BOOK. See _subscribe."""
+
+        return self._subscribe(self._check_service(service, BOOK_SERVICES), symbols, fields)
+
+    def _check_service(self, service: str, services: dict) -> str:
+        service = service.upper()
+        if service not in services:
+            raise ValueError(f"Unknown service {service!r}, expected one of {list(services)}")
+        return service
+
+    async def send_subscriptions(self) -> int:
+        """Sends the requests queued since the last send, e.g. symbols added
+        with level_one_options once the stream is running.
+        Returns:
+        ----
+        int -- The number of requests sent, 0 if nothing was queued.
+        """
+
+        pending = self.data_requests['requests'][self._sent_requests:]
+        if not pending:
+            return 0
+        self._sent_requests = len(self.data_requests['requests'])
+        await self._send_message(self.codec.dumps({'requests': pending}))
+        return len(pending)
+
+    def send_subscriptions_soon(self) -> asyncio.Task:
+        """send_subscriptions in a task of the client's own, for sync code
+        running on the loop, e.g. a handler. The client holds the task until
+        it is done and close_stream cancels it.
+        Returns:
+        ----
+        asyncio.Task -- The send, its result is send_subscriptions'.
+        """
+
+        return self._spawn(self.send_subscriptions())
+
+    async def unsubscribe(self, service: str, timeout: float = 10.0) -> dict:
+        """Unsubscribe from a service. The answer is picked out of the stream
+        by the dispatcher, so this can be awaited while start() or
+        dispatch_stream receives; without a receive loop, frames are read
+        and dispatched here until the answer comes.
         Arguments:
         ----
         service {str} -- The name of the service, to unsubscribe from. For example,
             "LEVELONE_FUTURES" or "QUOTES".
+        Keyword Arguments:
+        ----
+        timeout {float} -- Seconds to wait for the answer. (default: {10.0})
+        Raises:
+        ----
+        asyncio.TimeoutError: If the server doesn't answer in time.
+        ConnectionError: If the connection closes first.
         Returns:
         ----
         dict -- A message from the websocket specifiying whether the unsubscribe command
-            was successful.
+            was successful, {"response": [entry]}.
         """
 
         self.unsubscribe_count += 1
+        self.subscriptions.pop(service.upper(), None)
 
         service_count = len(self.data_requests['requests']) + self.unsubscribe_count
 
+        # a reconnect replays data_requests, which must not bring the service back
+        requests = self.data_requests['requests']
+        sent = sum(1 for request in requests[:self._sent_requests] if request['service'] != service.upper())
+        self.data_requests['requests'] = [request for request in requests if request['service'] != service.upper()]
+        self._sent_requests = sent
+
         request = {
             "requests": [
                 {
                     "service": service.upper(),
                     "requestid": service_count,
                     "command": 'UNSUBS',
-                    "account": self.principal_data['accounts'][0]['accountId'],
+                    "account": self.account_id,
                     "source": self.principal_data['streamerInfo']['appId']
                 }
             ]
         }
 
-        await self._send_message(json.dumps(request))
-
-        return await self._receive_message(return_value=True)
+        answer = self.dispatcher.expect(service_count)
+        try:
+            await self._send_message(self.codec.dumps(request))
+            if not self.reading:
+                # nobody else reads the socket, do it here and let the rest of the stream through
+                await asyncio.wait_for(self._dispatch_until(answer), timeout)
+            return {'response': [await asyncio.wait_for(answer, timeout)]}
+        finally:
+            self.dispatcher.waiters.pop(str(service_count), None)
+
+    async def _dispatch_until(self, answer: asyncio.Future) -> None:
+        while not answer.done():
+            message = await self.next_frame()
+            if message is None:
+                raise ConnectionError("The connection closed before the server answered")
+            await self.dispatcher.dispatch(message)
 
     def close_logic(self, logic_type: str) -> bool:
         """Defines how the stream should close.
@@ -445,10 +1012,25 @@ class TdStreamerClient:
         pass
 
     async def close_stream(self) -> None:
-        """Closes the connection to the streaming service."""
+        """Closes the connection to the streaming service.
+        Cancels the client's tasks (receive loop, heartbeat), waits for them
+        to finish, which stops the handler queues, then closes the socket and
+        writes out the recording. Leaves the event loop alone, so it can be
+        called from any task except a handler's and in a loop shared with
+        other clients.
+        """
+
+        # everything started by start() or dispatch_stream, except the caller itself
+        current = asyncio.current_task()
+        tasks = [task for task in self.tasks if task is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
         # close the connection.
-        await self.connection.close()
+        if self.connection is not None:
+            await self.connection.close()
+        self.stop_recording()
 
         # Define the Message.
         message = textwrap.dedent("""
@@ -456,37 +1038,8 @@ class TdStreamerClient:
         CLOSING PROCESS INITIATED:
         {lin_brk}
         WebSocket Closed: True
-        Event Loop Closed: True
+        Tasks Cancelled: {tasks}
         {lin_brk}
-        """).format(lin_brk="=" * 80)
-
-        # Shutdown all asynchronus generators.
-        await self.loop.shutdown_asyncgens()
-
-        # Stop the loop.
-        if self.loop.is_running():
-            self.loop.call_soon_threadsafe(self.loop.stop())
+        """).format(lin_brk="=" * 80, tasks=len(tasks))
+        if self.print_to_console:
             print(message)
-            await asyncio.sleep(3)
-
-        # # Once closed, verify it's closed.
-        # if self.loop.is_closed():
-        #     print('Event loop was closed.')
-        # else:
-        #     print('Event loop was not closed.')
-
-        # # cancel all the task.
-        # for index, task in enumerate(asyncio.Task.all_tasks()):
-
-        #     # let the user know which task is cancelled.
-        #     print("Cancelling Task: {}".format(index))
-
-        #     # cancel it.
-        #     task.cancel()
-
-        #     try:
-        #         await task
-        #     except asyncio.CancelledError:
-        #         print("main(): cancel_me is cancelled now")
-
-
@@ -0,0 +1,231 @@
+import asyncio
+import heapq
+import time
+
+from typing import List
+from typing import Union
+
+from liveness import RollingWindow, LAG_WINDOW
+from stream import TdStreamerClient
+from subscriptions import SERVICE_ENDPOINTS
+
+# POOL PARAMETERS
+MAX_DELAY = 0.05     # Seconds a frame waits for the other connections to catch up before it goes out anyway
+MAX_PENDING = 10000  # Frames held for ordering before the readers wait for the consumer
+
+
+def frame_time(message: dict) -> int:
+    """The server time of a decoded frame, epoch ms: the timestamp of its
+    first data or response entry, or its heartbeat. Now if it has none."""
+
+    for part in ('data', 'response'):
+        entries = message.get(part)
+        if entries:
+            timestamp = entries[0].get('timestamp')
+            if timestamp:
+                return timestamp
+    notify = message.get('notify')
+    if notify and notify[0].get('heartbeat'):
+        return int(notify[0]['heartbeat'])
+    return int(time.time() * 1000)
+
+
+class StreamPool:
+
+    def __init__(self, clients: List[TdStreamerClient], max_delay: float = MAX_DELAY,
+                 max_pending: int = MAX_PENDING, capacity: int = None):
+        """Streams over several TdStreamerClient sessions, e.g. one per
+        account (TdStreamerClient(..., account=n)) or several for the same
+        account when one socket can't carry every symbol. subscribe() spreads
+        the symbols over the sessions; frames() merges what they all receive
+        into one stream ordered by server time. A frame is held until every
+        other connection has sent something at least as recent, or for
+        max_delay at most. A connection that has gone quiet, e.g. one only
+        carrying ACCT_ACTIVITY, doesn't hold up the rest: whatever it sends
+        next can't be older than local time minus the worst lag seen on it
+        lately, so its watermark moves up to that as time passes. TD's
+        heartbeats move it too.
+        Arguments:
+        ----
+        clients {List[TdStreamerClient]} -- The sessions, not connected yet.
+        Keyword Arguments:
+        ----
+        max_delay {float} -- Seconds a frame is held for ordering, at most. (default: {MAX_DELAY})
+        max_pending {int} -- Frames held before the readers wait. (default: {MAX_PENDING})
+        capacity {int} -- Symbols per connection, over all services, None for no limit.
+        """
+
+        self.clients = list(clients)
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.capacity = capacity
+        # (service, symbol) -> index of the client it is subscribed on
+        self.owner = {}
+        self.load = [0] * len(self.clients)
+        # held frames: (server time, client index, arrival number, arrival time, frame)
+        self.heap = []
+        self.arrivals = 0
+        # per client, the latest server time received, and local time minus server time of its frames, ms
+        self.watermarks = [0] * len(self.clients)
+        self.lags = [RollingWindow(LAG_WINDOW) for _ in self.clients]
+        # the readers, one per client
+        self.tasks = set()
+        # clients whose readers are still running
+        self.live = set()
+        self.arrived = asyncio.Event()
+        self.space = asyncio.Event()
+        self.space.set()
+        self.last_out = 0
+        # frames sent on by max_delay before the others caught up, and frames older than one already out
+        self.forced = 0
+        self.late = 0
+
+    def subscribe(self, service: str, symbols: List[str], fields: List[Union[str, int]] = None) -> int:
+        """Subscribes `symbols` on `service`, each on the least loaded
+        connection. A symbol already subscribed stays on its connection;
+        new fields are asked on every connection carrying the service.
+        Arguments:
+        ----
+        service {str} -- A stream service, e.g. "OPTION" or "TIMESALE_EQUITY".
+        symbols {List[str]} -- The symbols to subscribe.
+        fields {List[Union[str, int]]} -- Field ids or names. If None, the fields the
+            service is subscribed with, or all fields on a new subscription.
+        Raises:
+        ----
+        ValueError: If the service is unknown or the connections are full.
+        Returns:
+        ----
+        int -- The number of requests queued, over all connections.
+        """
+
+        service = service.upper()
+        if service not in SERVICE_ENDPOINTS:
+            raise ValueError(f"Unknown service {service!r}, expected one of {list(SERVICE_ENDPOINTS)}")
+        groups = {}
+        for symbol in dict.fromkeys(symbol.upper() for symbol in symbols):
+            index = self.owner.get((service, symbol))
+            if index is None:
+                index = min(range(len(self.clients)), key=self.load.__getitem__)
+                if self.capacity is not None and self.load[index] >= self.capacity:
+                    raise ValueError(f"Every connection already carries {self.capacity} symbols")
+                self.owner[(service, symbol)] = index
+                self.load[index] += 1
+            groups.setdefault(index, []).append(symbol)
+        if fields is not None:
+            # a change of fields has to reach the connections that get no new symbol too
+            for index, client in enumerate(self.clients):
+                if service in client.subscriptions:
+                    groups.setdefault(index, [])
+        return sum(self.clients[index].subscribe(service, group, fields) for index, group in groups.items())
+
+    async def start(self) -> "StreamPool":
+        """Connects and logs in every session, sends their requests and
+        starts reading them."""
+
+        await asyncio.gather(*[client.start(receive=False) for client in self.clients])
+        for index in range(len(self.clients)):
+            self.live.add(index)
+            task = asyncio.ensure_future(self._read(index))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        return self
+
+    async def __aenter__(self) -> "StreamPool":
+        return await self.start()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def send_subscriptions(self) -> int:
+        """Sends what subscribe() queued since the start on every connection."""
+
+        return sum(await asyncio.gather(*[client.send_subscriptions() for client in self.clients]))
+
+    async def _read(self, index: int) -> None:
+        client = self.clients[index]
+        watermarks, heap, lags = self.watermarks, self.heap, self.lags[index]
+        client.reading = True
+        try:
+            while True:
+                message = await client.next_frame()
+                if message is None:
+                    return
+                timestamp = frame_time(message)
+                if timestamp > watermarks[index]:
+                    watermarks[index] = timestamp
+                lags.add(time.time() * 1000 - timestamp)
+                heapq.heappush(heap, (timestamp, index, self.arrivals, time.monotonic(), message))
+                self.arrivals += 1
+                self.arrived.set()
+                if len(heap) >= self.max_pending:
+                    self.space.clear()
+                    await self.space.wait()
+        finally:
+            client.reading = False
+            self.live.discard(index)
+            self.arrived.set()
+
+    def _floor(self, index: int, now: float) -> float:
+        """The oldest server time connection `index` can still send, ms: its
+        watermark, or local time minus its worst recent lag when that is
+        later, i.e. while it is quiet."""
+
+        lags = self.lags[index].samples
+        if not lags:
+            return self.watermarks[index]
+        return max(self.watermarks[index], now - max(lags))
+
+    async def frames(self):
+        """Yields (client index, frame) from every connection, in server
+        time order, until they have all closed."""
+
+        heap, watermarks, live = self.heap, self.watermarks, self.live
+        while True:
+            wait = None
+            if heap:
+                timestamp, index, _, arrival, message = heap[0]
+                ready = not live or timestamp <= min(watermarks[i] for i in live)
+                if not ready:
+                    # the connections behind this frame may just be quiet
+                    now = time.time() * 1000
+                    floor = min(self._floor(i, now) for i in live)
+                    ready = timestamp <= floor
+                if not ready:
+                    wait = self.max_delay - (time.monotonic() - arrival)
+                    if wait <= 0:
+                        self.forced += 1
+                        ready = True
+                    else:
+                        # until a quiet connection's floor passes the frame, if that comes first
+                        wait = min(wait, (timestamp - floor) / 1000)
+                if ready:
+                    heapq.heappop(heap)
+                    if timestamp < self.last_out:
+                        self.late += 1
+                    else:
+                        self.last_out = timestamp
+                    if len(heap) < self.max_pending:
+                        self.space.set()
+                    yield index, message
+                    continue
+            elif not live:
+                return
+            self.arrived.clear()
+            try:
+                await asyncio.wait_for(self.arrived.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def metrics(self) -> dict:
+        return {'connections': len(self.clients), 'live': len(self.live), 'symbols': list(self.load),
+                'held': len(self.heap), 'frames': self.arrivals, 'forced': self.forced, 'late': self.late}
+
+    async def close(self) -> None:
+        """Closes every session, see TdStreamerClient.close_stream, and stops the readers."""
+
+        await asyncio.gather(*[client.close_stream() for client in self.clients])
+        tasks = list(self.tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.live.clear()
@@ -0,0 +1,166 @@
+from typing import List, Union
+
+from fields import STREAM_FIELD_IDS
+
+# endpoint -> {field id: field name} and {field name: field id}, built once
+FIELD_NAMES = {endpoint: dict(ids) for endpoint, ids in STREAM_FIELD_IDS.items()}
+FIELD_IDS = {}
+for _endpoint, _ids in STREAM_FIELD_IDS.items():
+    FIELD_IDS[_endpoint] = {}
+    for _field_id, _name in _ids.items():
+        # first id wins if a name were listed twice, like list.index did
+        FIELD_IDS[_endpoint].setdefault(_name, _field_id)
+del _endpoint, _ids, _field_id, _name
+
+
+class UnknownFieldError(ValueError):
+    """Raised when fields requested for a service are not in STREAM_FIELD_IDS."""
+
+    def __init__(self, endpoint: str, fields: list):
+        self.endpoint = endpoint
+        self.fields = fields
+        super().__init__(f"Unknown {endpoint} fields: {', '.join(fields)}")
+
+
+def _indexes(endpoint: str) -> tuple:
+    try:
+        return FIELD_NAMES[endpoint], FIELD_IDS[endpoint]
+    except KeyError:
+        raise ValueError(f"Unknown endpoint {endpoint!r}, expected one of {list(STREAM_FIELD_IDS)}")
+
+
+def field_id(argument: Union[str, int], endpoint: str) -> str:
+    """The field id for an id or a name, e.g. 2 or "bid-price" -> "2".
+    Returns None if the endpoint has no such field."""
+
+    names, ids = _indexes(endpoint)
+    arg_str = str(argument)
+    if arg_str in names:
+        return arg_str
+    return ids.get(arg_str)
+
+
+def validate_fields(fields: List[Union[str, int]], endpoint: str) -> List[str]:
+    """Validates a whole field list for one service in one pass.
+    Arguments:
+    ----
+    fields {List[Union[str, int]]} -- Field ids or names, mixed freely.
+    endpoint {str} -- The STREAM_FIELD_IDS key, e.g. "level_one_option".
+    Raises:
+    ----
+    UnknownFieldError: Listing every field the endpoint doesn't have.
+    ValueError: If the endpoint itself is unknown.
+    Returns:
+    ----
+    List[str] -- The field ids in the order given, duplicates dropped.
+    """
+
+    names, ids = _indexes(endpoint)
+    valid, seen, unknown = [], set(), []
+    for field in fields:
+        arg_str = str(field)
+        if arg_str in names:
+            key = arg_str
+        else:
+            key = ids.get(arg_str)
+            if key is None:
+                unknown.append(arg_str)
+                continue
+        if key not in seen:
+            seen.add(key)
+            valid.append(key)
+    if unknown:
+        raise UnknownFieldError(endpoint, unknown)
+    return valid
+
+
+# symbols per SUBS/ADD request, larger lists are split
+MAX_KEYS_PER_REQUEST = 300
+
+# stream service -> its STREAM_FIELD_IDS endpoint
+LEVEL_ONE_SERVICES = {
+    "QUOTE": "level_one_quote",
+    "OPTION": "level_one_option",
+    "LEVELONE_FUTURES": "level_one_futures",
+    "LEVELONE_FUTURES_OPTIONS": "level_one_futures_options",
+    "LEVELONE_FOREX": "level_one_forex",
+}
+TIMESALE_SERVICES = {
+    "TIMESALE_EQUITY": "timesale",
+    "TIMESALE_OPTIONS": "timesale",
+    "TIMESALE_FUTURES": "timesale",
+    "TIMESALE_FOREX": "timesale",
+}
+CHART_SERVICES = {
+    "CHART_EQUITY": "chart_equity",
+    "CHART_OPTIONS": "chart_options",
+    "CHART_FUTURES": "chart_futures",
+}
+BOOK_SERVICES = {
+    "LISTED_BOOK": "level_two_quotes",
+    "NYSE_BOOK": "level_two_nyse",
+    "NASDAQ_BOOK": "level_two_nasdaq",
+    "OPTIONS_BOOK": "level_two_options",
+    "FUTURES_BOOK": "level_two_futures",
+    "FOREX_BOOK": "level_two_forex",
+}
+SERVICE_ENDPOINTS = {**LEVEL_ONE_SERVICES, **TIMESALE_SERVICES, **CHART_SERVICES, **BOOK_SERVICES}
+
+
+def chunks(symbols: list, size: int = MAX_KEYS_PER_REQUEST) -> list:
+    return [symbols[i:i + size] for i in range(0, len(symbols), size)]
+
+
+class Subscription:
+    """The fields and symbols currently subscribed on one service."""
+
+    __slots__ = ("service", "fields", "symbols")
+
+    def __init__(self, service: str, fields: str):
+        self.service = service
+        self.fields = fields
+        # dict as an ordered set, symbols stay in the order they were added
+        self.symbols = {}
+
+    def add(self, symbols: List[str]) -> List[str]:
+        """Adds symbols, returns the ones that weren't subscribed yet."""
+
+        new = []
+        for symbol in symbols:
+            if symbol not in self.symbols:
+                self.symbols[symbol] = None
+                new.append(symbol)
+        return new
+
+
+def plan_subscription(current: Subscription, service: str, symbols: List[str], fields: List[str],
+                      chunk_size: int = MAX_KEYS_PER_REQUEST) -> tuple:
+    """Works out the commands that bring a service to `symbols` x `fields`.
+    A new service, or a change of fields, is a SUBS of every symbol: SUBS
+    replaces the whole subscription, so only the first chunk is a SUBS and
+    the rest are ADDs. Otherwise only the symbols not subscribed yet go out,
+    as ADD commands.
+    Arguments:
+    ----
+    current {Subscription} -- The service's subscription, None if there is none.
+    service {str} -- The stream service, e.g. "OPTION".
+    symbols {List[str]} -- Symbols to subscribe.
+    fields {List[str]} -- Validated field ids.
+    Returns:
+    ----
+    tuple -- (subscription, [(command, keys), ...]). The commands are empty
+        if every symbol was already subscribed with these fields.
+    """
+
+    field_str = ",".join(fields)
+    if current is None or current.fields != field_str:
+        subscription = Subscription(service, field_str)
+        if current is not None:
+            subscription.add(list(current.symbols))
+        subscription.add(symbols)
+        keys = list(subscription.symbols)
+        commands = [("SUBS" if i == 0 else "ADD", chunk) for i, chunk in enumerate(chunks(keys, chunk_size))]
+        return subscription, commands
+
+    new = current.add(symbols)
+    return current, [("ADD", chunk) for chunk in chunks(new, chunk_size)]
@@ -0,0 +1,241 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+from cpus import available_cpus
+# the live bracket (bracket.py), always part of the default grid
+from bracket import STOP_PRICE as LIVE_STOP, SCALE as LIVE_SCALE, SIZE as LIVE_SIZE, BE_MOVE as LIVE_BE_MOVE
+
+CONTRACT_MULTIPLIER = 100
+
+# DEFAULT GRID
+STOPS = np.round(np.arange(.50, .951, .05), 2)
+LADDER_STRETCH = np.round(np.linspace(.6, 1.6, 11), 2)  # ladder targets as 1 + stretch * (LIVE_SCALE - 1)
+SIZES = range(1, len(LIVE_SCALE) + 1)
+BE_MOVES = (1.0, 1.2, 1.35, 1.43)
+
+# ranked table columns
+COLUMNS = ("stop", "ladder", "size", "be_move", "pnl", "avg", "max_drawdown", "hit_rate")
+
+
+def pad_paths(paths: list) -> np.ndarray:
+    """Stacks the price paths after each entry, the fill price first, into
+    one (trades, steps) array. Shorter paths hold their last price, which
+    is where a bracket that is still open at the end of its path is closed."""
+
+    steps = max(len(path) for path in paths)
+    out = np.empty((len(paths), steps))
+    for row, path in zip(out, paths):
+        row[:len(path)] = path
+        row[len(path):] = path[-1]
+    return out
+
+
+def ladder_grid(base: list = LIVE_SCALE, stretch=LADDER_STRETCH) -> np.ndarray:
+    """One target ladder per stretch factor, `base` with every gain scaled."""
+
+    base = np.asarray(base, dtype=float)
+    return np.round(1 + np.outer(stretch, base - 1), 4)
+
+
+class HitTables:
+
+    def __init__(self, paths: np.ndarray, entries: np.ndarray, stops, ladders, be_moves):
+        """When each trade of `paths` first reaches every price level the
+        grid can use, worked out once so a combination is only gathers and
+        arithmetic. Levels are multiples of the entry price, the step a
+        level is never reached at is `steps`.
+        Arguments:
+        ----
+        paths {np.ndarray} -- (trades, steps) prices, see pad_paths().
+        entries {np.ndarray} -- Entry price per trade, paths are divided by it.
+        stops {array} -- Stop levels.
+        ladders {np.ndarray} -- (ladders, targets) ascending target levels.
+        be_moves {array} -- Multiples of the stop the stops move to once the
+            first target fills.
+        """
+
+        entries = np.asarray(entries, dtype=float)
+        relative = paths / entries[:, None]
+        trades, steps = relative.shape
+        self.entries = entries
+        self.steps = steps
+        self.final = relative[:, -1]
+        self.stops = np.asarray(stops, dtype=float)
+        self.ladders = np.asarray(ladders, dtype=float)
+        self.be_moves = np.asarray(be_moves, dtype=float)
+
+        # running max/min are sorted, so first crossings are binary searches
+        highs = np.maximum.accumulate(relative, axis=1)
+        lows = np.minimum.accumulate(relative, axis=1)
+        self.targets, target_index = np.unique(self.ladders, return_inverse=True)
+        self.target_index = target_index.reshape(self.ladders.shape)
+        self.target_hits = np.array([np.searchsorted(high, self.targets) for high in highs])
+        self.stop_hits = np.array([np.searchsorted(-low, -self.stops) for low in lows])
+        self.stop_fills = self._fills(relative, self.stop_hits, self.stops)
+
+        # stops after the first target: first step at or after it at or under stop * be_move
+        self.first_targets, first_index = np.unique(self.ladders[:, 0], return_inverse=True)
+        self.first_index = first_index
+        moved = np.outer(self.stops, self.be_moves).ravel()
+        first_hits = self.target_hits[:, np.searchsorted(self.targets, self.first_targets)]
+        moved_hits = np.full((trades, len(self.first_targets), moved.size), steps)
+        for trade in range(trades):
+            for a, start in enumerate(first_hits[trade]):
+                if start < steps:
+                    low = np.minimum.accumulate(relative[trade, start:])
+                    moved_hits[trade, a] = start + np.searchsorted(-low, -moved)
+        moved_fills = self._fills(relative, moved_hits.reshape(trades, -1), np.tile(moved, len(self.first_targets)))
+        shape = (trades, len(self.first_targets), len(self.stops), len(self.be_moves))
+        self.moved_hits = moved_hits.reshape(shape)
+        self.moved_fills = moved_fills.reshape(shape)
+
+    @classmethod
+    def concat(cls, blocks: list):
+        """The tables of consecutive blocks of trades as one, for tables
+        built side by side."""
+
+        tables = cls.__new__(cls)
+        tables.__dict__.update(blocks[0].__dict__)
+        for name in ("entries", "final", "target_hits", "stop_hits", "stop_fills", "moved_hits", "moved_fills"):
+            setattr(tables, name, np.concatenate([getattr(block, name) for block in blocks]))
+        return tables
+
+    def _fills(self, relative: np.ndarray, hits: np.ndarray, levels: np.ndarray) -> np.ndarray:
+        # a stop fills at its level, or lower when the price gaps through it (or it's set above the price)
+        prices = np.take_along_axis(relative, np.minimum(hits, self.steps - 1), axis=1)
+        return np.minimum(prices, levels)
+
+    def evaluate(self, stop: int, be_move: int, sizes: np.ndarray) -> tuple:
+        """Every ladder x size for one stop and one BE move, by index.
+        Returns:
+        ----
+        tuple -- (pnl, max drawdown, hit rate), each (ladders, sizes).
+        """
+
+        steps = self.steps
+        targets = self.targets[self.target_index]                                   # (L, K)
+        target_hits = self.target_hits[:, self.target_index]                        # (n, L, K)
+        first_hits = target_hits[:, :, 0]                                           # (n, L)
+        stopped = self.stop_hits[:, stop, None] < first_hits                        # (n, L)
+        moved_hits = self.moved_hits[:, self.first_index, stop, be_move][:, :, None]  # (n, L, 1)
+        moved_fills = self.moved_fills[:, self.first_index, stop, be_move][:, :, None]
+
+        # after the first target every contract leaves at its target, the moved stop or the last price,
+        # a target reached on the step the moved stop triggers fills first
+        held = np.where(moved_hits < steps, moved_fills, self.final[:, None, None])
+        exits = np.where((target_hits <= moved_hits) & (target_hits < steps), targets, held)
+        exits = np.where(stopped[:, :, None], self.stop_fills[:, stop, None, None], exits)
+
+        per_contract = (exits - 1) * (self.entries * CONTRACT_MULTIPLIER)[:, None, None]
+        # one bracket of size z is the first z contracts of its ladder
+        per_trade = np.cumsum(per_contract, axis=2)[:, :, sizes - 1]               # (n, L, Z)
+
+        pnl = per_trade.sum(axis=0)
+        equity = np.cumsum(per_trade, axis=0)
+        peaks = np.maximum(np.maximum.accumulate(equity, axis=0), 0)
+        drawdown = (peaks - equity).max(axis=0)
+        hit_rate = (per_trade > 0).mean(axis=0)
+        return pnl, drawdown, hit_rate
+
+
+# each pool worker keeps the tables it was started with
+_tables = None
+
+
+def _init_worker(tables: HitTables) -> None:
+    global _tables
+    _tables = tables
+
+
+def _evaluate_pairs(pairs: list, sizes: np.ndarray) -> list:
+    return [(stop, be_move, _tables.evaluate(stop, be_move, sizes)) for stop, be_move in pairs]
+
+
+def sweep(paths: np.ndarray, entries, stops=STOPS, ladders=None, sizes=SIZES, be_moves=BE_MOVES,
+          workers: int = None) -> list:
+    """Simulates every (stop, ladder, size, BE move) bracket over every
+    trade, the way LiveT sends it: `size` contracts bought at the entry, one
+    limit sell each at its ladder target and a shared stop. A stop hit
+    before the first target closes them all, the first target fill moves
+    the remaining stops to stop * BE move. Brackets still open at the end of
+    their path close at the last price. Stops fill at the stop price, or
+    lower if the price gapped through it.
+    Arguments:
+    ----
+    paths {np.ndarray} -- (trades, steps) prices after each entry, in entry order.
+    entries {array} -- Entry price per trade.
+    Keyword Arguments:
+    ----
+    stops, sizes, be_moves {array} -- The grid. (defaults: {STOPS, SIZES, BE_MOVES})
+    ladders {np.ndarray} -- (ladders, targets), ladder_grid() if None.
+    workers {int} -- Processes, available_cpus() if None, 1 runs in this one.
+    Returns:
+    ----
+    list -- One row per combination in COLUMNS order, best PnL first.
+    Raises:
+    ----
+    ValueError: If a size needs more targets than the ladders have.
+    """
+
+    ladders = ladder_grid() if ladders is None else np.atleast_2d(np.asarray(ladders, dtype=float))
+    sizes = np.asarray(list(sizes))
+    if sizes.max() > ladders.shape[1]:
+        raise ValueError(f"SIZE {sizes.max()} needs {sizes.max()} SCALE targets, got {ladders.shape[1]}")
+    entries = np.asarray(entries, dtype=float)
+    pairs = [(stop, be_move) for stop in range(len(stops)) for be_move in range(len(be_moves))]
+
+    workers = available_cpus() if workers is None else workers
+    workers = min(workers, len(entries))
+    if workers <= 1:
+        tables = HitTables(paths, entries, stops, ladders, be_moves)
+        _init_worker(tables)
+        results = _evaluate_pairs(pairs, sizes)
+    else:
+        # tables by blocks of trades, then combinations by (stop, BE move) over all of them
+        blocks = np.array_split(np.arange(len(entries)), workers)
+        with ProcessPoolExecutor(workers) as pool:
+            tables = HitTables.concat(list(pool.map(HitTables, (paths[block] for block in blocks),
+                                                    (entries[block] for block in blocks), repeat(stops),
+                                                    repeat(ladders), repeat(be_moves))))
+        batch = max(1, -(-len(pairs) // (workers * 4)))
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(tables,)) as pool:
+            futures = [pool.submit(_evaluate_pairs, pairs[i:i + batch], sizes) for i in range(0, len(pairs), batch)]
+            results = [result for future in futures for result in future.result()]
+
+    trades = len(tables.entries)
+    rows = []
+    for stop, be_move, (pnl, drawdown, hit_rate) in results:
+        for ladder in range(len(ladders)):
+            for z, size in enumerate(sizes):
+                rows.append((float(tables.stops[stop]), tuple(ladders[ladder, :size].tolist()), int(size),
+                             float(tables.be_moves[be_move]), float(pnl[ladder, z]), float(pnl[ladder, z]) / trades,
+                             float(drawdown[ladder, z]), float(hit_rate[ladder, z])))
+    rows.sort(key=lambda row: (-row[4], row[6]))
+    return rows
+
+
+def format_table(rows: list, top: int = 20) -> str:
+    lines = [f"{'stop':>5} {'size':>4} {'be':>5} {'pnl':>11} {'avg':>9} {'max dd':>10} {'hit':>6}  ladder"]
+    for stop, ladder, size, be_move, pnl, avg, drawdown, hit_rate in rows[:top]:
+        lines.append(f"{stop:5.2f} {size:4d} {be_move:5.2f} {pnl:11.2f} {avg:9.2f} {drawdown:10.2f} "
+                     f"{hit_rate:6.1%}  {list(ladder)}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ranks bracket parameters over recorded price paths.")
+    parser.add_argument("paths", help=".npz with 'paths' (trades, steps) and 'entries', or a list of 1-D paths "
+                                      "saved as 'path_0', 'path_1', ...")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+    data = np.load(args.paths)
+    if "paths" in data:
+        price_paths = data["paths"]
+    else:
+        price_paths = pad_paths([data[f"path_{i}"] for i in range(sum(name.startswith("path_") for name in data.files))])
+    entry_prices = data["entries"] if "entries" in data else price_paths[:, 0]
+    print(format_table(sweep(price_paths, entry_prices, workers=args.workers), args.top))
@@ -0,0 +1,181 @@
+from array import array
+from collections import namedtuple
+from typing import List
+
+from fields import CSV_FIELD_KEYS
+
+# fields that aren't numbers, everything else goes in a float column
+TEXT_FIELDS = frozenset({
+    "symbol", "key", "description", "contract-type", "underlying", "deliverables", "security-status",
+    "uv-expiration-type", "cusip", "asset-main-type", "asset-sub-type", "ask-id", "bid-id", "last-id",
+    "bid-tick", "exchange-id", "exchange-name", "exhange-name", "product", "future-active-symbol",
+    "future-price-format", "future-trading-hours", "trading-hours", "market-maker", "headline", "headline-id",
+    "story-id", "story-source", "keyword-array", "data", "status", "error-code", "dividend-date",
+})
+BOOL_FIELDS = frozenset({
+    "delayed", "marginable", "shortable", "is-hot", "is-tradable", "future-is-active", "future-is-tradable",
+    "regular-market-quote", "regular-market-trade",
+})
+
+NAN = float("nan")
+
+# namedtuple's _make without the classmethod call
+_new_tuple = tuple.__new__
+
+
+def field_identifier(name: str) -> str:
+    """"bid-price" -> "bid_price", "52-week-high" -> "week_52_high"."""
+
+    parts = name.split("-")
+    if parts[0].isdigit():
+        parts = parts[1:2] + parts[:1] + parts[2:]
+    return "_".join(parts)
+
+
+class FieldTranslator:
+
+    def __init__(self, service: str, field_keys: dict):
+        """Turns the content entries of one service into named records.
+        Everything is worked out here, once per service at import: the slot
+        each raw key ("2", "key", "seq", ...) lands in, the record type, its
+        defaults and the kind of each column. Translating an entry is then a
+        pass over its items with one dict lookup each. The raw keys arrive as
+        str, so finding a slot takes a hash whatever the table; the slots dict
+        is the cheapest one measured, int(raw) into a tuple of slots was
+        slower. A record has every field of the service, so it costs more
+        than renaming the sent fields into a sparse dict (about 0.7-0.9x its
+        rate, see benchmarks/bench_translate.py); it buys a fixed layout and
+        attribute access.
+        Arguments:
+        ----
+        service {str} -- The service name as it appears in the stream, e.g. "OPTION".
+        field_keys {dict} -- Its CSV_FIELD_KEYS table, raw key -> field name.
+        """
+
+        # numeric ids in order, then the named keys in table order
+        raw_keys = sorted((k for k in field_keys if k.isdigit()), key=int)
+        raw_keys += [k for k in field_keys if not k.isdigit()]
+
+        names, seen = [], set()
+        for raw in raw_keys:
+            name = field_identifier(field_keys[raw])
+            if name in seen:
+                # fields.py lists some names twice (CHART_EQUITY "1" and "7"), keep both
+                name = f"{name}_{raw}"
+            seen.add(name)
+            names.append(name)
+
+        self.service = service
+        self.raw_keys = tuple(raw_keys)
+        self.fields = tuple(field_keys[raw] for raw in raw_keys)
+        self.names = tuple(names)
+        self.slots = {raw: slot for slot, raw in enumerate(raw_keys)}
+        self.numeric = tuple(field not in TEXT_FIELDS and field not in BOOL_FIELDS for field in self.fields)
+        # partial updates leave fields out: NaN in number columns, None elsewhere
+        self.defaults = tuple(NAN if numeric else None for numeric in self.numeric)
+        self.record_type = namedtuple(f"{service.title().replace('_', '')}Record", self.names)
+
+    def row(self, entry: dict) -> list:
+        """The values of one content entry in slot order. Keys the table
+        doesn't know are skipped."""
+
+        values = list(self.defaults)
+        slots = self.slots
+        for raw, value in entry.items():
+            slot = slots.get(raw)
+            if slot is not None:
+                values[slot] = value
+        return values
+
+    def record(self, entry: dict) -> tuple:
+        """One content entry as a named record, e.g. record.bid_price."""
+
+        return _new_tuple(self.record_type, self.row(entry))
+
+    def records(self, content: List[dict]) -> list:
+        # row() inlined, saves a method call per entry
+        record_type, defaults, slots = self.record_type, self.defaults, self.slots
+        out = []
+        for entry in content:
+            values = list(defaults)
+            for raw, value in entry.items():
+                slot = slots.get(raw)
+                if slot is not None:
+                    values[slot] = value
+            out.append(_new_tuple(record_type, values))
+        return out
+
+    def columns(self, content: List[dict]) -> dict:
+        """Decodes a whole content list into one buffer per field: an
+        array('d') for numbers (NaN where an update left the field out) and a
+        list for text and flags.
+        Returns:
+        ----
+        dict -- field name -> column, every column len(content) long.
+        """
+
+        # fill columns in place, so a partial update only costs the fields it carries
+        size = len(content)
+        columns = [[default] * size for default in self.defaults]
+        slots = self.slots
+        for i, entry in enumerate(content):
+            for raw, value in entry.items():
+                slot = slots.get(raw)
+                if slot is not None:
+                    columns[slot][i] = value
+        out = {}
+        for name, numeric, column in zip(self.names, self.numeric, columns):
+            if numeric:
+                try:
+                    out[name] = array("d", column)
+                except TypeError:
+                    # a "None" patched in for a bad value, or a number sent as text
+                    out[name] = array("d", map(_to_float, column))
+            else:
+                out[name] = list(column)
+        return out
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return NAN
+
+
+# built once, keyed by the "service" of each data entry
+TRANSLATORS = {service: FieldTranslator(service, field_keys) for service, field_keys in CSV_FIELD_KEYS.items()}
+
+
+def translate_data(data: List[dict]) -> list:
+    """Translates the "data" list of a stream message.
+    Returns:
+    ----
+    list -- (service, records) per data entry. Services without a
+        translator are passed through with their raw content.
+    """
+
+    out = []
+    for entry in data:
+        service = entry.get("service")
+        translator = TRANSLATORS.get(service)
+        content = entry.get("content", [])
+        out.append((service, translator.records(content) if translator else content))
+    return out
+
+
+def decode_columns(data: List[dict]) -> dict:
+    """Bulk mode: the "data" list of one or more messages decoded into
+    columnar buffers, one set per service.
+    Returns:
+    ----
+    dict -- service -> {field name -> column}. Entries of the same service
+        are concatenated in order, services without a translator are left out.
+    """
+
+    content_by_service = {}
+    for entry in data:
+        service = entry.get("service")
+        if service in TRANSLATORS:
+            content_by_service.setdefault(service, []).extend(entry.get("content", ()))
+    return {service: TRANSLATORS[service].columns(content) for service, content in content_by_service.items()}